@@ -1,14 +1,34 @@
+import asyncio
+import logging
+import threading
 import warnings
+from functools import partial
 import chainlit as cl
+from chainlit.server import app as chainlit_app
 
 # Importações dos módulos refatorados
 from src.config.settings import load_config
-from src.loaders.document_loaders import load_all_documents
-from src.processing.text_processor import process_documents, split_documents
+from src.ingestion.manifest import current_manifest_version
+from src.ingestion.versions import ActiveIndex
+from src.retrieval.embedding_cache import get_cached_embeddings
 from src.retrieval.embeddings import get_embeddings
-from src.retrieval.vector_store import initialize_vector_store
-from src.llm.prompts import get_prompt_template
-from src.llm.chain import get_memory, get_llm, setup_chain, ask_question
+from src.retrieval.reranker import get_reranker
+from src.retrieval.bm25 import get_bm25_index
+from src.retrieval.vector_store import warm_up_vector_store
+from src.llm.prompts import PROMPT_VERSION, get_prompt_template
+from src.llm.answer_cache import AnswerCache
+from src.llm.context import get_context_packer
+from src.llm.chain import get_llm, aask_question
+from src.llm.limiter import RequestLimiter
+from src.llm.memory_store import get_memory_store
+from src.processing.normalization import get_keyword_matcher
+from src.feedback.store import get_feedback_store
+from src.structured.engine import get_structured_engine
+from src.observability.instrumented import InstrumentedEmbeddings
+from src.observability.metrics import register_collector, stage
+from src.observability.setup import (
+    configure_logging, configure_opentelemetry, register_health_endpoints, register_metrics_endpoint
+)
 
 # Suprimir avisos
 warnings.filterwarnings('ignore')
@@ -16,62 +36,107 @@ warnings.filterwarnings('ignore')
 # Carregar configurações
 config = load_config()
 
-# Carregar e processar documentos
-documents = load_all_documents(config["docs_dir"])
-processed_docs = process_documents(documents)
-texts = split_documents(
-    processed_docs,
-    config["chunk_size"],
-    config["chunk_overlap"]
-)
+# Logging, métricas (/metrics), verificações de saúde (/healthz, /ready) e, se configurado, exportação OpenTelemetry
+configure_logging(config["log_level"])
+configure_opentelemetry()
+ready = threading.Event()
+register_metrics_endpoint(chainlit_app)
+register_health_endpoints(chainlit_app, ready.is_set)
 
-# Configurar embeddings
-embeddings = get_embeddings(
-    config["databricks_host"],
-    config["databricks_token"]
-)
+# Configurar embeddings (instrumentados: chamadas, textos e tokens enviados ao endpoint),
+# com cache compartilhado de perguntas e documentos na frente
+embeddings = get_cached_embeddings(InstrumentedEmbeddings(get_embeddings(config)), config)
+
+# Sincronizar o índice com a pasta de documentos (só arquivos novos ou modificados são carregados);
+# as mudanças vão para uma nova versão, promovida se aprovada, sem escrever na versão em uso
+if config["ingest_on_startup"]:
+    from src.ingestion.versions import sync_active_version
+    from src.structured.engine import build_structured_cache
+    sync_active_version(config, embeddings)
+    build_structured_cache(config)
 
-# Inicializar vector store
-db = initialize_vector_store(texts, embeddings, config["db_path"])
-retriever = db.as_retriever(search_kwargs={"k": len(documents)})
+# Versão do índice em uso: trocada na próxima pergunta após "python -m src.ingestion --rebuild/--promote/--rollback"
+active_index = ActiveIndex(config, embeddings)
 
-# Configurar LLM e chain
+# Recuperação em dois estágios: candidatos do ChromaDB e do índice BM25, reranqueados localmente
+reranker = get_reranker(config)
+
+# Configurar LLM e prompt
 prompt_template = get_prompt_template()
-memory = get_memory()
-llm = get_llm(
-    config["databricks_host"],
-    config["databricks_token"],
-    config["max_tokens"],
-    config["temperature"]
+memory_store = get_memory_store(config)
+feedback_store = get_feedback_store(config)
+llm = get_llm(config)
+keyword_matcher = get_keyword_matcher(config["keywords"])
+request_limiter = RequestLimiter(config["max_concurrent_requests"], config["max_queued_requests"])
+
+# Cache de respostas, invalidado quando o índice (manifesto) ou o prompt mudam
+answer_cache = None
+if config["answer_cache_enabled"]:
+    answer_cache = AnswerCache(
+        lambda: f"{current_manifest_version(active_index.get().manifest_path)}:{PROMPT_VERSION}",
+        max_entries=config["answer_cache_max_entries"],
+        ttl_seconds=config["answer_cache_ttl_seconds"],
+        similarity_threshold=config["answer_cache_similarity_threshold"],
+    )
+    register_collector(lambda: {f"answer_cache_{name}": value for name, value in answer_cache.stats().items()})
+if hasattr(embeddings, "stats"):
+    register_collector(lambda: {f"embedding_cache_{name}": value for name, value in embeddings.stats().items()})
+def warm_up():
+    """Carrega o índice HNSW e o BM25 antes de marcar o worker como pronto (/ready)."""
+    try:
+        with stage("startup_warmup") as timer:
+            index = active_index.get()
+            warm_up_vector_store(index.db)
+            get_bm25_index(index.bm25_index_path)
+        logging.getLogger(__name__).info("Worker pronto em %.2f s de aquecimento.", timer.elapsed)
+    except Exception:
+        logging.getLogger(__name__).exception("Falha no aquecimento dos índices")
+    ready.set()
+
+threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+ask_question_func = partial(
+    aask_question,
+    answer_cache=answer_cache,
+    reranker=reranker,
+    retrieval_budget_ms=config["retrieval_budget_ms"],
+    context_packer=get_context_packer(config),
+    structured_engine=get_structured_engine(config),
 )
-llm_chain = setup_chain(llm, prompt_template, memory)
 
 # Configurar handlers do Chainlit
 @cl.on_chat_start
 async def on_chat_start():
     # Armazena funções e objetos na sessão do usuário para uso nos callbacks
-    cl.user_session.set("ask_question_func", ask_question)
-    cl.user_session.set("retriever", retriever)
-    cl.user_session.set("llm_chain", llm_chain)
+    cl.user_session.set("ask_question_func", ask_question_func)
+    cl.user_session.set("active_index", active_index)
+    cl.user_session.set("llm", llm)
+    cl.user_session.set("prompt_template", prompt_template)
     cl.user_session.set("embeddings", embeddings)
-    cl.user_session.set("keywords", config["keywords"])
+    cl.user_session.set("keywords", keyword_matcher)
     cl.user_session.set("threshold", config["similarity_threshold"])
+    cl.user_session.set("feedback_store", feedback_store)
     cl.user_session.set("user_id", "anônimo")  # Você pode implementar identificação de usuário se necessário
 
     # Importa e inicia o chat
     from src.ui.chainlit_handlers import start_chat
-    await start_chat(memory)
+    await start_chat(memory_store)
 
 @cl.on_message
 async def on_message(msg):
     # Importa e processa a mensagem
     from src.ui.chainlit_handlers import handle_message
+    # Versão do índice em uso nesta pergunta (reaberta se outra versão foi promovida)
+    index = await asyncio.to_thread(active_index.get)
     await handle_message(
         msg,
-        ask_question,
-        retriever,
-        llm_chain,
+        partial(ask_question_func, bm25_index_path=index.bm25_index_path),
+        index.retriever,
+        llm,
+        prompt_template,
         embeddings,
-        config["keywords"],
-        config["similarity_threshold"]
+        keyword_matcher,
+        config["similarity_threshold"],
+        request_limiter,
+        memory_store
     )
\ No newline at end of file
@@ -9,12 +9,91 @@ def load_config():
         "databricks_host": os.getenv("DATABRICKS_HOST"),
         "databricks_token": os.getenv("DATABRICKS_TOKEN"),
         "db_path": "./chroma_db",
+        "log_level": os.getenv("COTIN_LOG_LEVEL", "INFO"),  # DEBUG mostra o contexto enviado ao LLM
+        "manifest_path": "./chroma_db/ingest_manifest.json",
+        "bm25_index_path": "./chroma_db/bm25_index.json",
+        # Reconstrução sem parada ("python -m src.ingestion --rebuild"): nova versão validada antes da promoção
+        "index_versions_keep": 3,  # versões antigas mantidas para rollback
+        "index_smoke_queries_path": "benchmarks/golden_set.json",
+        "index_smoke_min_pass_rate": 0.5,  # fração das consultas de verificação que precisam achar o alvo
+        "index_smoke_min_chunk_ratio": 0.5,  # chunks mínimos em relação à versão ativa
+        # Desative (COTIN_INGEST_ON_STARTUP=0) quando a ingestão rodar via "python -m src.ingestion"
+        "ingest_on_startup": os.getenv("COTIN_INGEST_ON_STARTUP", "1") == "1",
+        "ingest_workers": int(os.getenv("COTIN_INGEST_WORKERS", os.cpu_count() or 1)),
+        "ingest_max_pending": 2 * (os.cpu_count() or 1),  # arquivos em processamento simultâneo
+        "ingest_batch_size": 256,  # chunks enviados ao ChromaDB/embeddings por lote
+        # Backends de modelos: "databricks", "local" (embeddings na CPU) ou "llamacpp" (LLM GGUF quantizado),
+        # "ollama" e "fake" (determinísticos, para testes e uso offline)
+        "embedding_backend": os.getenv("COTIN_EMBEDDING_BACKEND", "databricks"),
+        "embedding_model": os.getenv("COTIN_EMBEDDING_MODEL"),  # vazio usa o modelo padrão do backend
+        "local_embedding_runtime": os.getenv("COTIN_LOCAL_EMBEDDING_RUNTIME", "onnx"),  # ou "sentence_transformers"
+        "local_embedding_batch_size": 32,
+        "local_embedding_threads": 0,  # 0 usa todos os núcleos; com vários workers, use núcleos / workers
+        "local_embedding_query_prefix": "query: ",  # prefixos esperados pelos modelos E5
+        "local_embedding_document_prefix": "passage: ",
+        "llm_backend": os.getenv("COTIN_LLM_BACKEND", "databricks"),
+        "llm_model": os.getenv("COTIN_LLM_MODEL"),  # vazio usa o modelo padrão do backend
+        "local_llm_n_ctx": 8192,  # com llamacpp, reduza também llm_context_window
+        "local_llm_threads": 0,
+        "ollama_base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+        "embedding_batch_size": 64,  # textos por requisição ao endpoint de embeddings
+        "embedding_max_concurrency": 4,
+        "embedding_requests_per_second": 10,
+        "embedding_max_retries": 5,
+        "embedding_checkpoint_path": "./chroma_db/embedding_checkpoint.db",
+        # Cache de embeddings de perguntas e documentos (memória + SQLite compartilhado entre workers)
+        "embedding_cache_enabled": True,
+        "embedding_cache_max_entries": 10000,
+        "embedding_cache_path": "./chroma_db/embedding_cache.db",  # vazio desativa a camada em disco
         "docs_dir": "docs",
         "chunk_size": 1500,
         "chunk_overlap": 200,
+        "tabular_chunking": True,  # CSV, XLSX e SQLite em blocos de linhas com cabeçalho, em vez de uma linha por documento
+        "tabular_rows_per_chunk": 50,
+        "tabular_index_rows": True,  # False indexa só o resumo das tabelas (as linhas ficam para as consultas SQL)
+        "structured_query_enabled": True,  # perguntas de contagem/total/ranking também consultam as tabelas via SQL
+        "structured_cache_path": "./chroma_db/structured.db",  # CSVs importados para consulta
+        "structured_query_timeout_ms": 2000,
+        "structured_query_max_rows": 50,
+        # Deduplicação na ingestão: chunks iguais ou quase iguais (MinHash/LSH) viram um único vetor com todas as fontes
+        "dedup_enabled": True,
+        "dedup_threshold": 0.9,  # similaridade de Jaccard estimada mínima entre os shingles
+        "dedup_num_perm": 64,  # tamanho da assinatura MinHash
+        "dedup_bands": 8,  # faixas LSH (linhas por faixa = dedup_num_perm / dedup_bands)
+        "dedup_index_path": "./chroma_db/dedup.db",
         "similarity_threshold": 0.65,
+        # Recuperação em dois estágios: candidatos do ChromaDB e reranking local
+        "retrieval_candidate_k": 30,
+        "retrieval_final_k": 5,
+        "retrieval_budget_ms": 500,  # acima disso o reranking usa apenas o modo rápido
+        "rerank_method": "mmr",  # "none", "mmr" ou "cross_encoder"
+        "rerank_mmr_lambda": 0.7,
+        "rerank_cross_encoder_model": "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1",
+        "rerank_budget_ms": 200,
         "max_tokens": 4096,
         "temperature": 0,
+        "llm_context_window": 128000,  # janela de contexto do modelo, em tokens
+        "context_max_tokens": 3000,  # limite de tokens dos documentos no prompt
+        "context_duplicate_threshold": 0.8,  # fração de trechos repetidos para descartar um chunk
+        # Modo de vários workers ("python -m src.serving"): um processo do Chainlit por porta
+        "serve_workers": int(os.getenv("COTIN_SERVE_WORKERS", os.cpu_count() or 1)),
+        "serve_host": os.getenv("COTIN_SERVE_HOST", "0.0.0.0"),
+        "serve_base_port": int(os.getenv("COTIN_SERVE_BASE_PORT", "8000")),
+        "max_concurrent_requests": 8,  # perguntas processadas simultaneamente por worker
+        "max_queued_requests": 32,  # perguntas aguardando vaga antes de serem recusadas
+        "answer_cache_enabled": True,
+        "answer_cache_max_entries": 500,
+        "answer_cache_ttl_seconds": 86400,
+        "answer_cache_similarity_threshold": 0.95,  # similaridade mínima entre perguntas para reaproveitar a resposta
+        "memory_backend": os.getenv("COTIN_MEMORY_BACKEND", "memory"),  # "memory" ou "sqlite"
+        "memory_sqlite_path": "./chat_history/chat_history.db",
+        "memory_window": 3,  # interações mantidas por sessão
+        "memory_max_sessions": 1000,
+        "memory_ttl_seconds": 3600,
+        "feedback_db_path": "./feedback/feedback.db",
+        "feedback_flush_interval_seconds": 2.0,  # intervalo máximo entre gravações em lote
+        "feedback_batch_size": 50,  # grava antes do intervalo se o buffer atingir este tamanho
+        "feedback_cluster_threshold": 0.85,  # similaridade mínima para agrupar perguntas nos relatórios
         "keywords": ["api", "módulos", "pncp", "painel", "catmat", "catser", "compras", "transparência"],
         "csv_options": {
             "default_delimiter": ",",
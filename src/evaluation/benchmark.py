@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import tempfile
+import time
+import warnings
+
+from src.config.settings import load_config
+from src.evaluation.fakes import FakeChatModel, FakeEmbeddings
+from src.feedback.store import FeedbackStore
+from src.ingestion.indexer import sync_vector_store
+from src.llm.chain import aask_question, ask_question
+from src.llm.context import get_context_packer
+from src.llm.prompts import get_prompt_template
+from src.observability.metrics import latency_summary, reset_latencies, token_summary
+from src.observability.setup import configure_logging
+from src.processing.dedup import document_sources
+from src.processing.normalization import fold_text, get_keyword_matcher
+from src.retrieval.reranker import get_reranker
+
+# Estágios medidos por ask_question (ver src.llm.chain)
+STAGES = ("retrieval_candidates", "retrieval_rerank", "prompt_build", "llm_generation", "ask_question_total")
+
+def load_feedback_questions(feedback_dir="feedback", feedback_db_path=None):
+    """Lê as perguntas (sem repetição) do armazenamento de feedback e dos arquivos legados."""
+    questions = []
+    if feedback_db_path and os.path.exists(feedback_db_path):
+        questions.extend(question.strip() for question in FeedbackStore(feedback_db_path).questions())
+    for path in sorted(glob.glob(os.path.join(feedback_dir, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            questions.append((json.load(f).get("question") or "").strip())
+    return [question for question in dict.fromkeys(questions) if question]
+
+def load_golden_set(path):
+    """Lê o conjunto de referência: perguntas com as fontes e/ou termos esperados."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _matches(doc, target):
+    """Indica se o documento satisfaz um alvo ("source:<trecho do caminho>" ou termo do conteúdo)."""
+    if target.startswith("source:"):
+        fragment = target[len("source:"):].lower()
+        return any(fragment in source.lower() for source in document_sources(doc))
+    return fold_text(target) in fold_text(doc.page_content)
+
+def retrieval_quality(item, documents):
+    """Calcula recall@k (alvos cobertos pelos k documentos) e o rank recíproco do primeiro acerto."""
+    targets = [f"source:{source}" for source in item.get("expected_sources", [])]
+    targets += item.get("expected_terms", [])
+    if not targets:
+        return None
+
+    covered = {target for target in targets for doc in documents if _matches(doc, target)}
+    reciprocal_rank = 0.0
+    for rank, doc in enumerate(documents, start=1):
+        if any(_matches(doc, target) for target in targets):
+            reciprocal_rank = 1.0 / rank
+            break
+    return len(covered) / len(targets), reciprocal_rank
+
+def build_pipeline(config, embeddings, llm):
+    """Indexa a pasta de documentos em um diretório temporário e monta o pipeline com os modelos locais."""
+    workdir = tempfile.mkdtemp(prefix="cotin-bench-")
+    config = dict(config)
+    config.update(
+        embedding_backend="fake",
+        llm_backend="fake",
+        db_path=os.path.join(workdir, "chroma_db"),
+        manifest_path=os.path.join(workdir, "chroma_db", "ingest_manifest.json"),
+        bm25_index_path=os.path.join(workdir, "chroma_db", "bm25_index.json"),
+        embedding_checkpoint_path=os.path.join(workdir, "chroma_db", "embedding_checkpoint.db"),
+        dedup_index_path=os.path.join(workdir, "chroma_db", "dedup.db"),
+    )
+    db, _ = sync_vector_store(config, embeddings)
+    return {
+        "retriever": db.as_retriever(search_kwargs={"k": config["retrieval_candidate_k"]}),
+        "llm": llm,
+        "prompt_template": get_prompt_template(),
+        "embeddings": embeddings,
+        "keywords": get_keyword_matcher(config["keywords"]),
+        "threshold": config["similarity_threshold"],
+        "reranker": get_reranker(config),
+        "retrieval_budget_ms": config["retrieval_budget_ms"],
+        "bm25_index_path": config["bm25_index_path"],
+        "context_packer": get_context_packer(config),
+    }
+
+def _ask(pipeline, question):
+    return ask_question(
+        question,
+        pipeline["retriever"],
+        pipeline["llm"],
+        pipeline["prompt_template"],
+        pipeline["embeddings"],
+        pipeline["keywords"],
+        pipeline["threshold"],
+        return_sources=True,
+        reranker=pipeline["reranker"],
+        retrieval_budget_ms=pipeline["retrieval_budget_ms"],
+        bm25_index_path=pipeline["bm25_index_path"],
+        context_packer=pipeline["context_packer"],
+    )
+
+async def measure_throughput(pipeline, questions, sessions):
+    """Simula "sessions" sessões simultâneas, cada uma fazendo todas as perguntas em sequência."""
+    async def session():
+        for question in questions:
+            await aask_question(
+                question,
+                pipeline["retriever"],
+                pipeline["llm"],
+                pipeline["prompt_template"],
+                pipeline["embeddings"],
+                pipeline["keywords"],
+                pipeline["threshold"],
+                reranker=pipeline["reranker"],
+                retrieval_budget_ms=pipeline["retrieval_budget_ms"],
+                bm25_index_path=pipeline["bm25_index_path"],
+                context_packer=pipeline["context_packer"],
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*[session() for _ in range(sessions)])
+    elapsed = time.perf_counter() - started
+    total = sessions * len(questions)
+    return {"sessions": sessions, "questions": total, "seconds": elapsed, "questions_per_second": total / elapsed}
+
+def run_benchmark(config, golden_set, feedback_questions, sessions=8, embedding_latency=0.0, llm_latency=0.0):
+    """Executa o benchmark completo e retorna o relatório."""
+    pipeline = build_pipeline(
+        config,
+        FakeEmbeddings(latency=embedding_latency),
+        FakeChatModel(latency=llm_latency),
+    )
+    questions = [item["question"] for item in golden_set]
+    questions += [question for question in feedback_questions if question not in questions]
+
+    # Latência por estágio: perguntas em sequência, sem concorrência
+    reset_latencies()
+    recalls = []
+    reciprocal_ranks = []
+    for question in questions:
+        _, documents = _ask(pipeline, question)
+        item = next((item for item in golden_set if item["question"] == question), None)
+        quality = retrieval_quality(item, documents) if item else None
+        if quality:
+            recalls.append(quality[0])
+            reciprocal_ranks.append(quality[1])
+    stages = {stage: latency_summary(stage) for stage in STAGES}
+    prompt_tokens = token_summary("prompt_tokens")
+
+    return {
+        "questions": len(questions),
+        "stages": stages,
+        "prompt_tokens": prompt_tokens,
+        "throughput": asyncio.run(measure_throughput(pipeline, questions, sessions)),
+        "retrieval": {
+            "k": config["retrieval_final_k"],
+            "evaluated": len(recalls),
+            "recall_at_k": sum(recalls) / len(recalls) if recalls else None,
+            "mrr": sum(reciprocal_ranks) / len(reciprocal_ranks) if reciprocal_ranks else None,
+        },
+    }
+
+def compare_with_baseline(report, baseline, max_regression=0.2):
+    """Lista as regressões em relação a um relatório anterior (latência p95 e qualidade)."""
+    regressions = []
+    for stage in STAGES:
+        current = report["stages"].get(stage, {}).get("p95")
+        previous = baseline["stages"].get(stage, {}).get("p95")
+        if current and previous and current > previous * (1 + max_regression):
+            regressions.append(f"{stage}: p95 {previous * 1000:.1f} ms -> {current * 1000:.1f} ms")
+    current = report.get("prompt_tokens", {}).get("p95")
+    previous = baseline.get("prompt_tokens", {}).get("p95")
+    if current and previous and current > previous * (1 + max_regression):
+        regressions.append(f"prompt_tokens: p95 {previous} -> {current}")
+    for metric in ("recall_at_k", "mrr"):
+        current = report["retrieval"].get(metric)
+        previous = baseline["retrieval"].get(metric)
+        if current is not None and previous is not None and current < previous * (1 - max_regression):
+            regressions.append(f"{metric}: {previous:.3f} -> {current:.3f}")
+    return regressions
+
+def print_report(report):
+    print(f"\nPerguntas: {report['questions']}")
+    print(f"{'Estágio':<24}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}")
+    for stage, summary in report["stages"].items():
+        if summary["count"]:
+            print(f"{stage:<24}{summary['p50'] * 1000:>10.1f}{summary['p95'] * 1000:>10.1f}{summary['p99'] * 1000:>10.1f}")
+    prompt_tokens = report.get("prompt_tokens", {})
+    if prompt_tokens.get("count"):
+        print(f"Tokens do prompt: p50 {prompt_tokens['p50']}  p95 {prompt_tokens['p95']}  máx. {prompt_tokens['max']}")
+    throughput = report["throughput"]
+    print(f"Vazão com {throughput['sessions']} sessões: {throughput['questions_per_second']:.1f} perguntas/s")
+    retrieval = report["retrieval"]
+    if retrieval["evaluated"]:
+        print(f"Recall@{retrieval['k']}: {retrieval['recall_at_k']:.3f}  MRR: {retrieval['mrr']:.3f} "
+              f"({retrieval['evaluated']} perguntas de referência)")
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando do benchmark."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.evaluation.benchmark",
+        description="Mede latência por estágio, vazão e qualidade da recuperação com modelos locais determinísticos.",
+    )
+    parser.add_argument("--docs-dir", help="pasta de documentos (padrão: docs_dir da configuração)")
+    parser.add_argument("--golden", default="benchmarks/golden_set.json", help="conjunto de referência")
+    parser.add_argument("--feedback-dir", default="feedback", help="pasta com os feedbacks legados a reproduzir")
+    parser.add_argument("--sessions", type=int, default=8, help="sessões simultâneas no teste de vazão")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="latência simulada do endpoint de embeddings (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="latência simulada do LLM (s)")
+    parser.add_argument("--output", help="grava o relatório em JSON")
+    parser.add_argument("--baseline", help="relatório JSON anterior para detectar regressões")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="piora relativa tolerada (padrão: 20%%)")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    config = load_config()
+    configure_logging(config["log_level"])
+    if args.docs_dir:
+        config["docs_dir"] = args.docs_dir
+
+    report = run_benchmark(
+        config,
+        load_golden_set(args.golden),
+        load_feedback_questions(args.feedback_dir, config["feedback_db_path"]),
+        sessions=args.sessions,
+        embedding_latency=args.embedding_latency,
+        llm_latency=args.llm_latency,
+    )
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(report, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressões em relação ao baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
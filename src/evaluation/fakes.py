@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.retrieval.bm25 import tokenize
+
+class FakeEmbeddings(Embeddings):
+    """Embeddings determinísticos e locais (bag of words com hashing) para testes e benchmarks.
+
+    Textos com palavras em comum ficam próximos, então a recuperação se comporta
+    de forma plausível sem chamar o endpoint do Databricks. "latency" simula o
+    tempo de cada chamada ao endpoint.
+    """
+
+    def __init__(self, size=256, latency=0.0):
+        self.size = size
+        self.latency = latency
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            bucket = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:4], "little")
+            vector[bucket % self.size] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+class FakeChatModel(BaseChatModel):
+    """Modelo de chat determinístico e local, com latência simulada, para testes e benchmarks."""
+
+    latency: float = 0.0  # tempo até o primeiro token, em segundos
+    token_latency: float = 0.0  # intervalo entre tokens no streaming
+
+    @property
+    def _llm_type(self):
+        return "cotin-fake-chat"
+
+    def _answer(self, messages):
+        prompt = "".join(str(message.content) for message in messages)
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"Resposta simulada {digest} para um prompt de {len(prompt)} caracteres."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        message = AIMessage(content=self._answer(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = AIMessage(content=self._answer(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for token in self._answer(messages).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+            time.sleep(self.token_latency)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for token in self._answer(messages).split(" "):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token + " "))
+            await asyncio.sleep(self.token_latency)
@@ -0,0 +1,57 @@
+import argparse
+import json
+import warnings
+
+from src.config.settings import load_config
+from src.feedback.store import get_feedback_store, load_legacy_feedback
+from src.observability.setup import configure_logging
+
+def _print_rates(title, rows):
+    print(f"\n{title}")
+    for row in rows:
+        print(f"  {row['helpfulness']:>6.1%}  {row['positive']:>4}/{row['total']:<4}  {row['key']}")
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando de feedback."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.feedback",
+        description="Migra o feedback legado e gera relatórios de utilidade das respostas.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="importa os arquivos feedback/feedback_*.json")
+    migrate.add_argument("--feedback-dir", default="feedback", help="pasta com os arquivos legados")
+    report = subparsers.add_parser("report", help="taxa de respostas úteis por fonte, grupo de perguntas e dia")
+    report.add_argument("--embed", action="store_true",
+                        help="agrupa perguntas por similaridade de embeddings (usa o endpoint configurado)")
+    report.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    config = load_config()
+    configure_logging(config["log_level"])
+    store = get_feedback_store(config)
+
+    if args.command == "migrate":
+        entries = load_legacy_feedback(args.feedback_dir)
+        inserted = store.import_legacy(entries)
+        print(f"{inserted} feedback(s) migrado(s) de {len(entries)} arquivo(s) em '{args.feedback_dir}'.")
+        return
+
+    embeddings = None
+    if args.embed:
+        from src.retrieval.embeddings import get_embeddings
+        embeddings = get_embeddings(config)
+    result = {
+        "by_source": store.helpfulness_by_source(),
+        "by_cluster": store.helpfulness_by_cluster(embeddings, config["feedback_cluster_threshold"]),
+        "by_day": store.helpfulness_by_day(),
+    }
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    _print_rates("Por fonte:", result["by_source"])
+    _print_rates("Por grupo de perguntas:", result["by_cluster"])
+    _print_rates("Por dia:", result["by_day"])
+
+if __name__ == "__main__":
+    main()
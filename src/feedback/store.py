@@ -0,0 +1,236 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import numpy as np
+
+from src.llm.answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+FEEDBACK_VALUES = ("positive", "negative")
+
+class FeedbackStore:
+    """Armazena o feedback dos usuários em uma tabela SQLite só de inserção.
+
+    record() apenas coloca o registro em um buffer em memória, sem I/O, e pode ser
+    chamado do event loop. Uma thread de fundo grava o buffer em lote a cada
+    "flush_interval" segundos, ou antes disso quando ele atinge "batch_size".
+    """
+
+    def __init__(self, path, flush_interval=2.0, batch_size=50):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at TEXT NOT NULL, day TEXT NOT NULL, "
+                "feedback TEXT NOT NULL, question TEXT NOT NULL, answer TEXT, user_id TEXT, session_id TEXT, "
+                "legacy_file TEXT UNIQUE)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback_sources ("
+                "feedback_id INTEGER NOT NULL REFERENCES feedback (id), source TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_day ON feedback (day)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_sources ON feedback_sources (source)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Erro ao gravar feedback")
+
+    def record(self, question, answer, feedback, user_id=None, session_id=None, sources=None, timestamp=None):
+        """Enfileira um feedback para gravação; não bloqueia."""
+        if feedback not in FEEDBACK_VALUES:
+            raise ValueError(f"Feedback inválido: {feedback}")
+        timestamp = timestamp or datetime.now().isoformat()
+        entry = (timestamp, question or "", answer, feedback, user_id, session_id, sorted(set(sources or [])), None)
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_writer()
+        if full:
+            self._wakeup.set()
+
+    def _insert(self, conn, entries):
+        inserted = 0
+        for timestamp, question, answer, feedback, user_id, session_id, sources, legacy_file in entries:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO feedback "
+                "(created_at, day, feedback, question, answer, user_id, session_id, legacy_file) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (timestamp, timestamp[:10], feedback, question, answer, user_id, session_id, legacy_file),
+            )
+            if cursor.rowcount:
+                inserted += 1
+                conn.executemany(
+                    "INSERT INTO feedback_sources (feedback_id, source) VALUES (?, ?)",
+                    [(cursor.lastrowid, source) for source in sources],
+                )
+        return inserted
+
+    def flush(self):
+        """Grava em uma única transação tudo o que está no buffer."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return 0
+            try:
+                with self._connect() as conn:
+                    return self._insert(conn, entries)
+            except Exception:
+                # Devolve os registros ao buffer para a próxima tentativa
+                with self._lock:
+                    self._buffer[:0] = entries
+                raise
+
+    def close(self):
+        """Interrompe a thread de gravação e grava o que restou no buffer."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def import_legacy(self, entries):
+        """Grava diretamente registros migrados; arquivos já importados são ignorados.
+
+        Cada entrada é um dict com question, answer, feedback, user_id, timestamp
+        e legacy_file. Retorna o número de registros novos.
+        """
+        rows = [
+            (entry["timestamp"], entry.get("question") or "", entry.get("answer"), entry["feedback"],
+             entry.get("user_id"), None, [], entry["legacy_file"])
+            for entry in entries
+        ]
+        with self._flush_lock, self._connect() as conn:
+            return self._insert(conn, rows)
+
+    def questions(self):
+        """Retorna as perguntas registradas, sem repetição, na ordem em que chegaram."""
+        self.flush()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT question FROM feedback WHERE question != '' GROUP BY question ORDER BY MIN(id)")
+            return [row[0] for row in rows]
+
+    def _rates(self, query, params=()):
+        self.flush()
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [
+            {"key": key, "total": total, "positive": positive, "helpfulness": positive / total if total else 0.0}
+            for key, total, positive in rows
+        ]
+
+    def helpfulness_by_day(self):
+        """Taxa de respostas úteis por dia."""
+        return self._rates(
+            "SELECT day, COUNT(*), SUM(feedback = 'positive') FROM feedback GROUP BY day ORDER BY day"
+        )
+
+    def helpfulness_by_source(self):
+        """Taxa de respostas úteis por documento usado como fonte da resposta."""
+        return self._rates(
+            "SELECT s.source, COUNT(*), SUM(f.feedback = 'positive') FROM feedback_sources s "
+            "JOIN feedback f ON f.id = s.feedback_id GROUP BY s.source ORDER BY COUNT(*) DESC, s.source"
+        )
+
+    def helpfulness_by_cluster(self, embeddings=None, threshold=0.85):
+        """Taxa de respostas úteis por grupo de perguntas parecidas.
+
+        Sem embeddings, agrupa pela pergunta normalizada. Com embeddings, cada
+        pergunta entra no primeiro grupo cuja pergunta representativa tenha
+        similaridade de cosseno >= threshold. A chave do grupo é a sua pergunta
+        representativa (a primeira registrada).
+        """
+        self.flush()
+        with self._connect() as conn:
+            rows = conn.execute("SELECT question, feedback FROM feedback WHERE question != '' ORDER BY id").fetchall()
+
+        normalized = list(dict.fromkeys(normalize_question(question) for question, _ in rows))
+        representative = {}
+        if embeddings is not None and normalized:
+            vectors = np.asarray(embeddings.embed_documents(normalized), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+            centers = []
+            for i, key in enumerate(normalized):
+                if centers:
+                    similarities = vectors[centers] @ vectors[i]
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= threshold:
+                        representative[key] = normalized[centers[best]]
+                        continue
+                centers.append(i)
+                representative[key] = key
+        else:
+            representative = {key: key for key in normalized}
+
+        labels = {}
+        clusters = {}
+        for question, feedback in rows:
+            center = representative[normalize_question(question)]
+            labels.setdefault(center, question)
+            total, positive = clusters.get(center, (0, 0))
+            clusters[center] = (total + 1, positive + (feedback == "positive"))
+        report = [
+            {"key": labels[center], "total": total, "positive": positive, "helpfulness": positive / total}
+            for center, (total, positive) in clusters.items()
+        ]
+        return sorted(report, key=lambda item: (-item["total"], item["key"]))
+
+def get_feedback_store(config):
+    """Cria o armazenamento de feedback conforme a configuração."""
+    return FeedbackStore(
+        config["feedback_db_path"],
+        flush_interval=config["feedback_flush_interval_seconds"],
+        batch_size=config["feedback_batch_size"],
+    )
+
+def load_legacy_feedback(feedback_dir="feedback"):
+    """Lê os arquivos feedback_*.json gravados pela versão anterior (um arquivo por clique)."""
+    entries = []
+    if not os.path.isdir(feedback_dir):
+        return entries
+    for filename in sorted(os.listdir(feedback_dir)):
+        if not (filename.startswith("feedback_") and filename.endswith(".json")):
+            continue
+        path = os.path.join(feedback_dir, filename)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("Arquivo de feedback ilegível ignorado: %s", path)
+            continue
+        if data.get("feedback") not in FEEDBACK_VALUES:
+            logger.warning("Arquivo de feedback sem avaliação válida ignorado: %s", path)
+            continue
+        timestamp = data.get("timestamp") or datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+        entries.append({**data, "timestamp": timestamp, "legacy_file": filename})
+    return entries
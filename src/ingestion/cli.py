@@ -0,0 +1,68 @@
+import argparse
+import logging
+import sys
+import warnings
+
+from src.config.settings import load_config
+from src.ingestion.versions import (
+    active_version, list_versions, promote, rebuild_version, rollback, sync_active_version
+)
+from src.observability.setup import configure_logging
+from src.retrieval.embedding_cache import get_cached_embeddings
+from src.retrieval.embeddings import get_embeddings
+from src.structured.engine import build_structured_cache
+
+logger = logging.getLogger(__name__)
+
+def _print_versions(config):
+    active = active_version(config)
+    for version, info in list_versions(config):
+        marker = "*" if version == active else " "
+        details = ", ".join(f"{key}={value}" for key, value in info.items() if key != "created_at")
+        print(f"{marker} {version}  {details}")
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando de ingestão."""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.ingestion",
+        description="Indexa incrementalmente a pasta de documentos no ChromaDB.",
+    )
+    parser.add_argument("--rebuild", action="store_true",
+                        help="reindexa tudo em uma nova versão do índice, valida e promove sem parar o serviço")
+    parser.add_argument("--no-promote", action="store_true",
+                        help="apenas constrói e valida a nova versão, sem passar a usá-la")
+    parser.add_argument("--versions", action="store_true", help="lista as versões do índice")
+    parser.add_argument("--promote", metavar="VERSÃO", help="passa a usar a versão informada")
+    parser.add_argument("--rollback", action="store_true", help="volta para a versão usada antes da atual")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    config = load_config()
+    configure_logging(config["log_level"])
+
+    if args.versions:
+        _print_versions(config)
+        return
+    if args.promote:
+        promote(config, args.promote)
+        return
+    if args.rollback:
+        rollback(config)
+        return
+
+    # Com o cache em disco, uma reconstrução reaproveita os vetores dos chunks que não mudaram
+    embeddings = get_cached_embeddings(get_embeddings(config), config)
+    if args.rebuild:
+        approved, version = rebuild_version(config, embeddings, promote_version=not args.no_promote)
+        if approved and args.no_promote:
+            print(f"Versão {version} pronta; promova com: python -m src.ingestion --promote {version}")
+    else:
+        # Mudanças são aplicadas em uma nova versão (cópia da ativa, ou do zero se os parâmetros mudaram)
+        approved = sync_active_version(config, embeddings, promote_version=not args.no_promote)
+    # Os servidores só leem este banco; a importação dos CSVs é feita aqui
+    build_structured_cache(config)
+    if not approved:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import numpy as np
+
+from src.processing.dedup import allows_near_duplicates, band_buckets, estimated_similarity
+
+class DedupIndex:
+    """Índice dos chunks canônicos usado para deduplicar a ingestão.
+
+    Guarda, em um SQLite ao lado do manifesto, o hash de conteúdo e a
+    assinatura MinHash de cada chunk armazenado no ChromaDB, as chaves LSH das
+    assinaturas e as referências (arquivo, fonte) de cada chunk. Um chunk igual
+    ou, se for texto corrido, quase igual (similaridade estimada >= threshold) a
+    um já indexado não é embedado de novo: o arquivo passa a referenciar o chunk existente, que
+    acumula as fontes. Um chunk só é apagado quando nenhum arquivo o referencia.
+    """
+
+    def __init__(self, path, threshold=0.9, bands=8):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.threshold = threshold
+        self.bands = bands
+        self.exact_matches = 0
+        self.near_matches = 0
+        self.new_chunks = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, signature BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS chunks_hash ON chunks (content_hash);
+            CREATE TABLE IF NOT EXISTS lsh (band INTEGER NOT NULL, bucket INTEGER NOT NULL, id TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS lsh_bucket ON lsh (band, bucket);
+            CREATE INDEX IF NOT EXISTS lsh_id ON lsh (id);
+            CREATE TABLE IF NOT EXISTS refs (id TEXT NOT NULL, file_key TEXT NOT NULL, source TEXT NOT NULL,
+                                             PRIMARY KEY (id, file_key));
+            CREATE INDEX IF NOT EXISTS refs_file ON refs (file_key);
+        """)
+
+    def _find(self, chunk_hash, signature, near):
+        """Retorna (id, "exact" | "near") do chunk canônico equivalente, ou None (near: aceita quase iguais)."""
+        row = self._conn.execute("SELECT id FROM chunks WHERE content_hash = ? LIMIT 1", (chunk_hash,)).fetchone()
+        if row:
+            return row[0], "exact"
+        if not near:
+            return None
+        candidates = set()
+        for band, bucket in enumerate(band_buckets(signature, self.bands)):
+            candidates.update(row[0] for row in self._conn.execute(
+                "SELECT id FROM lsh WHERE band = ? AND bucket = ?", (band, bucket)
+            ))
+        best, best_similarity = None, self.threshold
+        for chunk_id in sorted(candidates):
+            blob = self._conn.execute("SELECT signature FROM chunks WHERE id = ?", (chunk_id,)).fetchone()[0]
+            similarity = estimated_similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if similarity >= best_similarity:
+                best, best_similarity = chunk_id, similarity
+        return (best, "near") if best else None
+
+    def assign(self, file_key, chunks, chunk_ids, signatures):
+        """Associa os chunks de um arquivo a chunks canônicos.
+
+        Retorna (ids referenciados pelo arquivo, posições dos chunks novos, ids
+        de chunks já indexados que ganharam esta fonte).
+        """
+        referenced = []
+        new_positions = []
+        shared = set()
+        for position, (chunk, chunk_id) in enumerate(zip(chunks, chunk_ids)):
+            chunk_hash = chunk.metadata["content_hash"]
+            signature = signatures[position]
+            near = allows_near_duplicates(chunk)
+            match = self._find(chunk_hash, signature, near)
+            if match is None:
+                self._conn.execute("INSERT INTO chunks VALUES (?, ?, ?)", (chunk_id, chunk_hash, signature.tobytes()))
+                if near:
+                    # Só texto corrido entra no LSH, então blocos de tabela nunca são candidatos a quase iguais
+                    self._conn.executemany(
+                        "INSERT INTO lsh VALUES (?, ?, ?)",
+                        [(band, bucket, chunk_id) for band, bucket in enumerate(band_buckets(signature, self.bands))],
+                    )
+                canonical = chunk_id
+                chunk.metadata["sources"] = str(chunk.metadata.get("source", file_key))
+                new_positions.append(position)
+                self.new_chunks += 1
+            else:
+                canonical, kind = match
+                if kind == "exact":
+                    self.exact_matches += 1
+                else:
+                    self.near_matches += 1
+                shared.add(canonical)
+            self._conn.execute("INSERT OR IGNORE INTO refs VALUES (?, ?, ?)",
+                               (canonical, file_key, str(chunk.metadata.get("source", file_key))))
+            referenced.append(canonical)
+        new_ids = {chunk_ids[position] for position in new_positions}
+        return list(dict.fromkeys(referenced)), new_positions, shared - new_ids
+
+    def sources(self, chunk_id):
+        """Fontes (em ordem de indexação) que contêm o chunk."""
+        return [row[0] for row in self._conn.execute("SELECT source FROM refs WHERE id = ? ORDER BY rowid", (chunk_id,))]
+
+    def release(self, file_key, chunk_ids):
+        """Remove as referências de um arquivo; retorna (ids sem nenhuma referência, ids ainda referenciados)."""
+        self._conn.execute("DELETE FROM refs WHERE file_key = ?", (file_key,))
+        orphans = []
+        shared = []
+        for chunk_id in dict.fromkeys(chunk_ids):
+            if self._conn.execute("SELECT 1 FROM refs WHERE id = ? LIMIT 1", (chunk_id,)).fetchone():
+                shared.append(chunk_id)
+            else:
+                orphans.append(chunk_id)
+                self._conn.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+                self._conn.execute("DELETE FROM lsh WHERE id = ?", (chunk_id,))
+        return orphans, shared
+
+    def clear(self):
+        self._conn.executescript("DELETE FROM chunks; DELETE FROM lsh; DELETE FROM refs;")
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
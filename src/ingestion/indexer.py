@@ -0,0 +1,221 @@
+import logging
+import os
+from src.ingestion.dedup_index import DedupIndex
+from src.ingestion.manifest import (
+    chunk_ids_for, chunking_params, diff_files, load_manifest, new_manifest, save_manifest
+)
+from src.ingestion.pipeline import iter_chunk_batches
+from src.loaders.document_loaders import list_document_files
+from src.observability.metrics import increment, stage
+from src.processing.dedup import SOURCES_SEPARATOR
+from src.retrieval.bm25 import BM25Index, snapshot_path_for
+from src.retrieval.embedding_client import get_index_embeddings
+from src.retrieval.vector_store import initialize_vector_store
+
+logger = logging.getLogger(__name__)
+
+# Limite de chunks por chamada ao ChromaDB
+ADD_BATCH_SIZE = 500
+
+def _delete_chunks(db, bm25_index, chunk_ids):
+    """Remove chunks do ChromaDB (em lotes) e do índice BM25."""
+    for start in range(0, len(chunk_ids), ADD_BATCH_SIZE):
+        db.delete(ids=chunk_ids[start:start + ADD_BATCH_SIZE])
+    bm25_index.remove_many(chunk_ids)
+
+def _add_chunks(db, bm25_index, chunks, chunk_ids):
+    """Adiciona chunks ao ChromaDB (em lotes) e ao índice BM25."""
+    for start in range(0, len(chunks), ADD_BATCH_SIZE):
+        db.add_documents(
+            chunks[start:start + ADD_BATCH_SIZE],
+            ids=chunk_ids[start:start + ADD_BATCH_SIZE],
+        )
+    for chunk_id, chunk in zip(chunk_ids, chunks):
+        bm25_index.add(chunk_id, chunk.page_content)
+
+def _update_sources(db, dedup, chunk_ids):
+    """Atualiza nos metadados do ChromaDB as fontes de chunks compartilhados por vários arquivos."""
+    for start in range(0, len(chunk_ids), ADD_BATCH_SIZE):
+        ids = chunk_ids[start:start + ADD_BATCH_SIZE]
+        stored = db._collection.get(ids=ids, include=["metadatas"])
+        metadatas = []
+        for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+            sources = dedup.sources(chunk_id)
+            metadata = dict(metadata or {})
+            metadata["source"] = sources[0]
+            metadata["sources"] = SOURCES_SEPARATOR.join(sources)
+            metadatas.append(metadata)
+        if metadatas:
+            db._collection.update(ids=stored["ids"], metadatas=metadatas)
+
+def _release_file(db, bm25_index, dedup, key, chunk_ids):
+    """Remove os chunks de um arquivo; com deduplicação, só os que nenhum outro arquivo referencia."""
+    if dedup is None:
+        _delete_chunks(db, bm25_index, chunk_ids)
+        return
+    orphans, shared = dedup.release(key, chunk_ids)
+    _delete_chunks(db, bm25_index, orphans)
+    _update_sources(db, dedup, shared)
+
+def _rebuild_bm25_from_store(db, bm25_index, page_size=1000):
+    """Reconstrói o índice BM25 a partir dos chunks já armazenados no ChromaDB."""
+    bm25_index.clear()
+    total = db._collection.count()
+    for offset in range(0, total, page_size):
+        page = db._collection.get(include=["documents"], limit=page_size, offset=offset)
+        for chunk_id, text in zip(page["ids"], page["documents"]):
+            bm25_index.add(chunk_id, text or "")
+
+def sync_vector_store(config, embeddings, rebuild=False):
+    """Sincroniza o ChromaDB com a pasta de documentos usando o manifesto de ingestão.
+
+    Só arquivos novos ou modificados são carregados e indexados; os chunks de
+    arquivos removidos ou modificados são apagados. Os embeddings são calculados
+    pelo cliente em lotes de src.retrieval.embedding_client. O manifesto é gravado após
+    cada lote, de modo que uma ingestão interrompida continua de onde parou.
+    O índice léxico BM25 é atualizado em memória junto com o ChromaDB e gravado
+    uma única vez, no fim; se a ingestão for interrompida, o manifesto fica
+    marcado (bm25_stale) e o BM25 é reconstruído a partir do ChromaDB na próxima.
+
+    Com deduplicação, chunks iguais ou quase iguais a um já indexado (em
+    qualquer arquivo) não são embedados de novo: o arquivo referencia o chunk
+    canônico, cujos metadados acumulam as fontes (ver DedupIndex).
+    """
+    manifest_path = config["manifest_path"]
+    bm25_path = config["bm25_index_path"]
+    params = chunking_params(config)
+    index_embeddings = get_index_embeddings(embeddings, config)
+    db = initialize_vector_store(index_embeddings, config["db_path"])
+    bm25_index = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else None
+    dedup = None
+    if config["dedup_enabled"]:
+        dedup = DedupIndex(config["dedup_index_path"], config["dedup_threshold"], config["dedup_bands"])
+
+    manifest = load_manifest(manifest_path)
+    bm25_modified = False
+    if rebuild or manifest is None or manifest.get("params") != params:
+        bm25_index = BM25Index()
+        bm25_modified = True
+        if db._collection.count():
+            logger.info("Manifesto ausente ou parâmetros de chunking alterados: reconstruindo o índice...")
+            _delete_chunks(db, bm25_index, db._collection.get(include=[])["ids"])
+        if dedup is not None:
+            dedup.clear()
+            dedup.commit()
+        # Vetores de uma construção anterior interrompida não servem para os novos parâmetros
+        index_embeddings.checkpoint.clear()
+        manifest = new_manifest(params)
+        save_manifest(manifest, manifest_path)
+    elif bm25_index is None or manifest.get("bm25_stale"):
+        logger.info("Índice BM25 ausente ou desatualizado: reconstruindo a partir do ChromaDB...")
+        bm25_index = BM25Index()
+        bm25_modified = True
+        _rebuild_bm25_from_store(db, bm25_index)
+
+    file_paths = list_document_files(config["docs_dir"])
+    changed, removed = diff_files(manifest, config["docs_dir"], file_paths)
+    if changed or removed:
+        bm25_modified = True
+        manifest["bm25_stale"] = True
+
+    for key in removed:
+        logger.info("Removendo do índice: %s", key)
+        _release_file(db, bm25_index, dedup, key, manifest["files"].pop(key)["chunk_ids"])
+
+    for key, _, _ in changed:
+        previous = manifest["files"].pop(key, None)
+        if previous:
+            logger.info("Reindexando arquivo modificado: %s", key)
+            _release_file(db, bm25_index, dedup, key, previous["chunk_ids"])
+        else:
+            logger.info("Indexando novo arquivo: %s", key)
+    if dedup is not None:
+        dedup.commit()
+    save_manifest(manifest, manifest_path)
+
+    # Os arquivos são processados em paralelo e indexados em lotes à medida que ficam prontos
+    pending = {file_path: (key, sha256) for key, file_path, sha256 in changed}
+    total_chunks = 0
+    # Arquivos que ocupam mais de um lote: caminho -> (chunks já vistos, documentos, ids referenciados)
+    progress = {}
+    for chunks, segments, signatures in iter_chunk_batches(list(pending), config):
+        chunk_ids = []
+        entries = []
+        new_chunks = []
+        shared = set()
+        offset = 0
+        files_done = 0
+        for file_path, document_count, chunk_count, done in segments:
+            key, sha256 = pending[file_path]
+            start, documents, referenced = progress.pop(file_path, (0, 0, {}))
+            file_ids = chunk_ids_for(key, sha256, chunk_count, start)
+            file_chunks = chunks[offset:offset + chunk_count]
+            if dedup is None:
+                ids, new_positions = file_ids, range(chunk_count)
+            else:
+                ids, new_positions, file_shared = dedup.assign(
+                    key, file_chunks, file_ids, signatures[offset:offset + chunk_count]
+                )
+                shared.update(file_shared)
+            for position in new_positions:
+                new_chunks.append(file_chunks[position])
+                chunk_ids.append(file_ids[position])
+            offset += chunk_count
+            referenced.update(dict.fromkeys(ids))
+            documents += document_count
+            stat = os.stat(file_path)
+            entry = {
+                "sha256": sha256,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "documents": documents,
+                "chunk_ids": list(referenced),
+            }
+            if done:
+                files_done += 1
+            else:
+                # Se a ingestão parar antes do fim do arquivo, ele é reindexado do zero na próxima
+                entry["partial"] = True
+                progress[file_path] = (start + chunk_count, documents, referenced)
+            entries.append((key, entry))
+
+        with stage("ingest_index_batch"):
+            _add_chunks(db, bm25_index, new_chunks, chunk_ids)
+            if shared:
+                _update_sources(db, dedup, sorted(shared))
+        total_chunks += len(chunks)
+        increment("ingest_chunks_total", len(new_chunks))
+        increment("ingest_chunks_deduplicated_total", len(chunks) - len(new_chunks))
+        increment("ingest_files_total", files_done)
+        if dedup is not None:
+            dedup.commit()
+        manifest["files"].update(entries)
+        save_manifest(manifest, manifest_path)
+
+    # O BM25 é gravado uma vez por sincronização: regravá-lo a cada lote tornaria a ingestão quadrática.
+    # O snapshot binário é a cópia somente leitura aberta com mmap pelos workers (src.serving).
+    snapshot_path = snapshot_path_for(bm25_path)
+    if bm25_modified or not os.path.exists(bm25_path) or not os.path.exists(snapshot_path):
+        with stage("ingest_bm25_save"):
+            bm25_index.save(bm25_path)
+            bm25_index.save_snapshot(snapshot_path)
+    manifest.pop("bm25_stale", None)
+    # Persiste também os mtimes atualizados por diff_files quando só o timestamp mudou
+    save_manifest(manifest, manifest_path)
+    index_embeddings.checkpoint.clear()
+
+    if not manifest["files"]:
+        raise ValueError(f"Nenhum documento foi carregado na pasta '{config['docs_dir']}'.")
+
+    if dedup is not None:
+        if total_chunks:
+            reused = dedup.exact_matches + dedup.near_matches
+            logger.info(
+                "Deduplicação: %d de %d chunks reaproveitados (%d idênticos, %d quase idênticos); "
+                "%d texto(s) a menos enviados ao endpoint de embeddings.",
+                reused, total_chunks, dedup.exact_matches, dedup.near_matches, reused,
+            )
+        dedup.close()
+    logger.info("Ingestão concluída: %d arquivo(s) indexado(s), %d removido(s), %d chunks no ChromaDB.",
+                len(changed), len(removed), db._collection.count())
+    return db, manifest
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+
+from src.retrieval.embeddings import embedding_model_name
+
+# Incrementar quando o pipeline de processamento mudar de forma a exigir reindexação completa
+INGESTION_VERSION = 4
+
+def file_sha256(file_path, block_size=1 << 20):
+    """Calcula o hash SHA-256 do conteúdo de um arquivo."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunking_params(config):
+    """Retorna os parâmetros que, se alterados, invalidam todo o índice."""
+    return {
+        "ingestion_version": INGESTION_VERSION,
+        "chunk_size": config["chunk_size"],
+        "chunk_overlap": config["chunk_overlap"],
+        "tabular_chunking": config["tabular_chunking"],
+        "tabular_rows_per_chunk": config["tabular_rows_per_chunk"],
+        "tabular_index_rows": config["tabular_index_rows"],
+        # As palavras-chave encontradas em cada chunk são gravadas nos metadados
+        "keywords": sorted(config["keywords"]),
+        # Vetores de modelos diferentes não são comparáveis
+        "embedding_model": embedding_model_name(config),
+        "dedup": [config["dedup_threshold"], config["dedup_num_perm"], config["dedup_bands"]]
+        if config["dedup_enabled"] else None,
+    }
+
+def new_manifest(params):
+    """Cria um manifesto vazio para os parâmetros de chunking informados."""
+    return {"params": params, "files": {}}
+
+def load_manifest(manifest_path):
+    """Carrega o manifesto de ingestão, ou None se ainda não existir."""
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path):
+    """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def manifest_version(manifest):
+    """Identificador do conteúdo indexado: muda sempre que algum arquivo ou parâmetro muda."""
+    if not manifest:
+        return ""
+    state = {
+        "params": manifest["params"],
+        "files": {key: entry["sha256"] for key, entry in manifest["files"].items()},
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+_version_cache = {}
+
+def current_manifest_version(manifest_path):
+    """Versão do manifesto em disco, relida apenas quando o arquivo muda (ex.: após python -m src.ingestion)."""
+    try:
+        mtime_ns = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return ""
+    cached = _version_cache.get(manifest_path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    version = manifest_version(load_manifest(manifest_path))
+    _version_cache[manifest_path] = (mtime_ns, version)
+    return version
+
+def diff_files(manifest, docs_dir, file_paths):
+    """Compara os arquivos atuais com o manifesto.
+
+    Retorna (alterados, removidos), onde alterados é uma lista de
+    (chave, caminho, sha256) de arquivos novos ou modificados e removidos é a
+    lista de chaves que não existem mais. Arquivos com mesmo tamanho e mtime
+    não são relidos; se só o mtime mudou, o hash evita a reindexação. Arquivos
+    cuja ingestão foi interrompida no meio (entrada "partial") são sempre reindexados.
+    """
+    known = manifest["files"]
+    changed = []
+    seen = set()
+
+    for file_path in file_paths:
+        key = os.path.relpath(file_path, docs_dir).replace(os.sep, "/")
+        seen.add(key)
+        stat = os.stat(file_path)
+        entry = known.get(key)
+
+        complete = entry and not entry.get("partial")
+        if complete and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            continue
+
+        sha256 = file_sha256(file_path)
+        if complete and entry["sha256"] == sha256:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            continue
+        changed.append((key, file_path, sha256))
+
+    removed = [key for key in known if key not in seen]
+    return changed, removed
+
+def chunk_ids_for(key, sha256, count, start=0):
+    """Gera ids determinísticos para os chunks de um arquivo, a partir da posição start."""
+    prefix = hashlib.sha1(f"{key}:{sha256}".encode("utf-8")).hexdigest()[:16]
+    return [f"{prefix}-{i}" for i in range(start, start + count)]
@@ -0,0 +1,232 @@
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+import numpy as np
+
+from src.loaders.document_loaders import iter_file_documents
+from src.observability.metrics import increment, record_latency
+from src.processing.dedup import allows_near_duplicates, content_hash, minhash_signatures
+from src.processing.normalization import annotate_keywords
+from src.processing.text_processor import process_documents, split_documents
+
+logger = logging.getLogger(__name__)
+
+# Etapas medidas por arquivo
+STAGES = ("ingest_load", "ingest_normalize", "ingest_split", "ingest_keywords", "ingest_fingerprint")
+
+def _iter_parts(file_path, chunk_size, chunk_overlap, tabular, keywords, num_perm, part_size, timings):
+    """Carrega, normaliza e divide um arquivo em partes de até part_size documentos.
+
+    Gera (nº de documentos, chunks, assinaturas) por parte, de modo que uma tabela
+    grande nunca fica inteira em memória. Com num_perm, também calcula a impressão
+    digital de cada chunk para a deduplicação (hash de conteúdo nos metadados e
+    assinatura MinHash). O tempo de cada etapa é somado em timings.
+    """
+    started = time.perf_counter()
+    documents = iter(iter_file_documents(file_path, tabular))
+    while True:
+        raw_documents = list(islice(documents, part_size))
+        loaded = time.perf_counter()
+        timings["ingest_load"] += loaded - started
+        if not raw_documents:
+            return
+        part = process_documents(raw_documents)
+        normalized = time.perf_counter()
+        chunks = split_documents(part, chunk_size, chunk_overlap)
+        split = time.perf_counter()
+        # As palavras-chave de cada chunk ficam nos metadados, e as consultas não reprocessam o texto
+        annotate_keywords(chunks, keywords)
+        annotated = time.perf_counter()
+        signatures = None
+        if num_perm:
+            for chunk in chunks:
+                chunk.metadata["content_hash"] = content_hash(chunk.page_content)
+            # Blocos de tabela só são deduplicados pelo hash; a assinatura deles fica zerada
+            signatures = np.zeros((len(chunks), num_perm), dtype=np.uint32)
+            prose = [i for i, chunk in enumerate(chunks) if allows_near_duplicates(chunk)]
+            if prose:
+                signatures[prose] = minhash_signatures([chunks[i].page_content for i in prose], num_perm)
+        timings["ingest_normalize"] += normalized - loaded
+        timings["ingest_split"] += split - normalized
+        timings["ingest_keywords"] += annotated - split
+        timings["ingest_fingerprint"] += time.perf_counter() - annotated
+        yield len(part), chunks, signatures
+        started = time.perf_counter()
+
+def load_and_split_file(file_path, chunk_size=1500, chunk_overlap=200, tabular=None, keywords=(), num_perm=0,
+                        part_size=256, spill_dir=None):
+    """Processa um único arquivo nos processos do pool (ver _iter_parts).
+
+    Retorna (caminho, partes, tempos). Um arquivo que cabe em uma parte volta na
+    própria resposta; nos demais, cada parte é gravada em um arquivo temporário
+    em spill_dir assim que fica pronta, e partes é o caminho desse arquivo. Assim
+    nem o worker nem a resposta enviada ao processo principal crescem com o
+    tamanho do arquivo. Os tempos são devolvidos junto, pois as métricas dos
+    processos do pool não chegam ao processo principal.
+    """
+    timings = dict.fromkeys(STAGES, 0.0)
+    parts = []
+    spill = None
+    try:
+        for part in _iter_parts(file_path, chunk_size, chunk_overlap, tabular, keywords, num_perm, part_size, timings):
+            parts.append(part)
+            if spill is None and len(parts) > 1:
+                spill = tempfile.NamedTemporaryFile(dir=spill_dir, suffix=".pkl", delete=False)
+            if spill is not None:
+                for item in parts:
+                    pickle.dump(item, spill, protocol=pickle.HIGHEST_PROTOCOL)
+                parts = []
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.remove(spill.name)
+        raise
+    if spill is None:
+        return file_path, parts, timings
+    spill.close()
+    return file_path, spill.name, timings
+
+def _read_parts(parts):
+    """Lê as partes devolvidas por load_and_split_file, uma por vez, apagando o arquivo temporário no fim."""
+    if not isinstance(parts, str):
+        yield from parts
+        return
+    try:
+        with open(parts, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+    finally:
+        os.remove(parts)
+
+def _segments(file_path, parts, num_perm=0):
+    """Gera (caminho, nº de documentos, chunks, assinaturas, concluído) para cada parte de um arquivo.
+
+    Só a última parte é marcada como concluída; um arquivo sem documentos gera um
+    único segmento vazio, com assinaturas vazias quando há deduplicação (num_perm).
+    """
+    previous = None
+    for part in parts:
+        if previous is not None:
+            yield (file_path, *previous, False)
+        previous = part
+    if previous is None:
+        previous = (0, [], np.zeros((0, num_perm), dtype=np.uint32) if num_perm else None)
+    yield (file_path, *previous, True)
+
+def tabular_options(config):
+    """Opções do modo tabular para iter_file_documents, ou None se ele estiver desativado."""
+    if not config["tabular_chunking"]:
+        return None
+    return {
+        "rows_per_chunk": config["tabular_rows_per_chunk"],
+        "max_chunk_chars": config["chunk_size"],
+        "include_rows": config["tabular_index_rows"],
+    }
+
+def _record_file_timings(timings):
+    """Registra no processo principal os tempos medidos por load_and_split_file."""
+    for stage_name, seconds in timings.items():
+        record_latency(stage_name, seconds)
+
+def iter_file_chunks(file_paths, config):
+    """Gera os segmentos (ver _segments) de cada arquivo, à medida que ficam prontos.
+
+    O parsing (PyMuPDF, unstructured) é CPU-bound, então cada arquivo vai para um
+    pool de processos. No máximo "ingest_max_pending" arquivos ficam em voo: novos
+    arquivos só são submetidos quando o consumidor pede o próximo resultado, o que
+    limita a memória mesmo em corpora com milhares de arquivos. Cada arquivo é
+    processado em partes de até "ingest_batch_size" documentos, e as partes de
+    arquivos grandes passam por arquivos temporários em vez de voltarem todas de
+    uma vez. Arquivos que falham são registrados e ignorados, para serem tentados
+    novamente na próxima ingestão.
+    """
+    workers = config["ingest_workers"]
+    num_perm = config["dedup_num_perm"] if config["dedup_enabled"] else 0
+    options = (
+        config["chunk_size"],
+        config["chunk_overlap"],
+        tabular_options(config),
+        tuple(config["keywords"]),
+        num_perm,
+        config["ingest_batch_size"],
+    )
+
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            timings = dict.fromkeys(STAGES, 0.0)
+            try:
+                yield from _segments(file_path, _iter_parts(file_path, *options, timings), num_perm)
+            except Exception:
+                logger.exception("Erro ao carregar %s", file_path)
+                increment("ingest_errors_total")
+            _record_file_timings(timings)
+        return
+
+    max_pending = max(workers, config["ingest_max_pending"])
+    remaining = iter(file_paths)
+    spill_dir = tempfile.mkdtemp(prefix="ingest-")
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def submit_next():
+                for file_path in remaining:
+                    future = executor.submit(load_and_split_file, file_path, *options, spill_dir)
+                    pending[future] = file_path
+                    return True
+                return False
+
+            while len(pending) < max_pending and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        file_path, parts, timings = future.result()
+                    except Exception:
+                        logger.exception("Erro ao carregar %s", file_path)
+                        increment("ingest_errors_total")
+                    else:
+                        _record_file_timings(timings)
+                        yield from _segments(file_path, _read_parts(parts), num_perm)
+                    submit_next()
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+def iter_chunk_batches(file_paths, config):
+    """Agrupa os chunks produzidos por iter_file_chunks em lotes de ~"ingest_batch_size".
+
+    Cada lote é uma tupla (chunks, segmentos, assinaturas), onde segmentos lista
+    (caminho, nº de documentos, nº de chunks, concluído) das partes de arquivo
+    contidas neste lote, na ordem dos chunks; um arquivo grande ocupa vários lotes
+    e só o seu último segmento vem marcado como concluído. assinaturas tem as
+    assinaturas MinHash dos chunks, na mesma ordem (None sem deduplicação).
+    """
+    batch_size = config["ingest_batch_size"]
+    batch = []
+    segments = []
+    signatures = []
+
+    def stacked():
+        return np.vstack(signatures) if signatures else None
+
+    for file_path, document_count, chunks, file_signatures, done in iter_file_chunks(file_paths, config):
+        batch.extend(chunks)
+        segments.append((file_path, document_count, len(chunks), done))
+        if file_signatures is not None:
+            signatures.append(file_signatures)
+        if len(batch) >= batch_size:
+            yield batch, segments, stacked()
+            batch, segments, signatures = [], [], []
+    if batch or segments:
+        yield batch, segments, stacked()
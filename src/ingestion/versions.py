@@ -0,0 +1,379 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Versões do índice ficam em <db_path>/versions/<id>; CURRENT aponta a versão em uso
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+VERSION_INFO_FILE = "version.json"
+# Índice criado antes das versões, diretamente em <db_path>
+LEGACY_VERSION = "legacy"
+# Arquivo criado pelo ChromaDB no diretório persistido
+CHROMA_DB_FILE = "chroma.sqlite3"
+
+def _versions_root(config):
+    return os.path.join(config["db_path"], VERSIONS_DIR)
+
+def version_dir(config, version):
+    """Diretório de uma versão do índice (o próprio db_path para a versão legada)."""
+    if version == LEGACY_VERSION:
+        return config["db_path"]
+    return os.path.join(_versions_root(config), version)
+
+def _write_json(path, data):
+    """Grava JSON de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def read_current(config):
+    """Conteúdo do ponteiro CURRENT ({"version", "promoted_at", "history"}), ou None."""
+    return _read_json(os.path.join(config["db_path"], CURRENT_FILE))
+
+def active_version(config):
+    """Versão do índice em uso; sem ponteiro, o índice legado em db_path."""
+    current = read_current(config)
+    return current["version"] if current else LEGACY_VERSION
+
+def index_config(config, version=None):
+    """Cópia da configuração com os caminhos do índice (ChromaDB, manifesto, BM25) de uma versão.
+
+    Sem version, usa a versão ativa. O índice de deduplicação e o checkpoint de
+    embeddings também são separados por versão, pois descrevem o ChromaDB dela.
+    """
+    version = version or active_version(config)
+    if version == LEGACY_VERSION:
+        return dict(config)
+    directory = version_dir(config, version)
+    versioned = dict(config)
+    versioned.update(
+        db_path=directory,
+        manifest_path=os.path.join(directory, os.path.basename(config["manifest_path"])),
+        bm25_index_path=os.path.join(directory, os.path.basename(config["bm25_index_path"])),
+        embedding_checkpoint_path=os.path.join(directory, os.path.basename(config["embedding_checkpoint_path"])),
+        dedup_index_path=os.path.join(directory, os.path.basename(config["dedup_index_path"])),
+    )
+    return versioned
+
+def has_vector_store(config, version):
+    """Indica se a versão tem um ChromaDB gravado (sem abri-lo, o que criaria um vazio)."""
+    return os.path.exists(os.path.join(version_dir(config, version), CHROMA_DB_FILE))
+
+def list_versions(config):
+    """Versões existentes, da mais antiga para a mais recente, com as informações gravadas na construção."""
+    versions = []
+    if os.path.exists(os.path.join(config["db_path"], os.path.basename(config["manifest_path"]))):
+        versions.append((LEGACY_VERSION, {}))
+    root = _versions_root(config)
+    if os.path.isdir(root):
+        for version in sorted(os.listdir(root)):
+            info = _read_json(os.path.join(root, version, VERSION_INFO_FILE))
+            if info is not None:
+                versions.append((version, info))
+    return versions
+
+def _new_version_id(config):
+    version = time.strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    candidate = version
+    while os.path.exists(version_dir(config, candidate)):
+        suffix += 1
+        candidate = f"{version}-{suffix}"
+    return candidate
+
+def build_version(config, embeddings):
+    """Constrói uma nova versão do índice do zero, sem tocar na versão em uso.
+
+    Retorna (versão, db). A versão só passa a ser usada depois de promote().
+    """
+    from src.ingestion.indexer import sync_vector_store
+
+    version = _new_version_id(config)
+    versioned = index_config(config, version)
+    logger.info("Construindo a versão %s do índice em %s...", version, versioned["db_path"])
+    _write_json(os.path.join(versioned["db_path"], VERSION_INFO_FILE),
+                {"created_at": time.time(), "status": "building"})
+    try:
+        db, manifest = sync_vector_store(versioned, embeddings, rebuild=True)
+    except Exception:
+        _update_info(config, version, status="failed")
+        raise
+    _update_info(config, version, status="built", files=len(manifest["files"]), chunks=db._collection.count())
+    return version, db
+
+def _update_info(config, version, **values):
+    if version == LEGACY_VERSION:
+        return
+    path = os.path.join(version_dir(config, version), VERSION_INFO_FILE)
+    info = _read_json(path) or {}
+    info.update(values)
+    _write_json(path, info)
+
+def validate_version(config, version, embeddings, db=None):
+    """Executa as consultas de verificação (smoke) contra uma versão do índice.
+
+    A versão é aprovada se tiver pelo menos index_smoke_min_chunk_ratio dos
+    chunks da versão ativa e se, para pelo menos index_smoke_min_pass_rate das
+    perguntas do conjunto de verificação (mesmo formato do conjunto de
+    referência do benchmark), algum alvo esperado aparecer entre os candidatos
+    da recuperação híbrida. Retorna (aprovada, detalhes).
+    """
+    from src.evaluation.benchmark import load_golden_set, retrieval_quality
+    from src.retrieval.bm25 import get_bm25_index
+    from src.retrieval.hybrid import hybrid_search_with_vectors
+    from src.retrieval.vector_store import initialize_vector_store
+
+    versioned = index_config(config, version)
+    if db is None:
+        db = initialize_vector_store(embeddings, versioned["db_path"])
+    chunks = db._collection.count()
+    details = {"chunks": chunks, "failed_queries": []}
+
+    current = active_version(config)
+    if current != version and has_vector_store(config, current):
+        baseline = initialize_vector_store(embeddings, index_config(config, current)["db_path"])._collection.count()
+        details["baseline_chunks"] = baseline
+        if chunks < baseline * config["index_smoke_min_chunk_ratio"]:
+            details["reason"] = f"{chunks} chunks, contra {baseline} na versão ativa {current}"
+            _update_info(config, version, status="rejected")
+            return False, details
+    if not chunks:
+        details["reason"] = "índice vazio"
+        _update_info(config, version, status="rejected")
+        return False, details
+
+    queries_path = config["index_smoke_queries_path"]
+    items = load_golden_set(queries_path) if os.path.exists(queries_path) else []
+    bm25_index = get_bm25_index(versioned["bm25_index_path"])
+    checked = 0
+    for item in items:
+        question = item["question"]
+        documents, _, _ = hybrid_search_with_vectors(
+            db, bm25_index, question, embeddings.embed_query(question),
+            config["retrieval_candidate_k"], config["retrieval_candidate_k"],
+        )
+        quality = retrieval_quality(item, documents)
+        if quality is None:
+            continue
+        checked += 1
+        if quality[0] == 0:
+            details["failed_queries"].append(question)
+    details["queries"] = checked
+    pass_rate = 1.0 - len(details["failed_queries"]) / checked if checked else 1.0
+    details["pass_rate"] = pass_rate
+    if pass_rate < config["index_smoke_min_pass_rate"]:
+        details["reason"] = f"{len(details['failed_queries'])} de {checked} consultas de verificação sem resultado esperado"
+        _update_info(config, version, status="rejected")
+        return False, details
+    _update_info(config, version, status="validated")
+    return True, details
+
+def _finish_version(config, version, embeddings, db, promote_version):
+    """Valida uma versão recém-construída e, se aprovada, promove. Retorna (aprovada, versão)."""
+    approved, details = validate_version(config, version, embeddings, db)
+    if not approved:
+        logger.error("Versão %s reprovada na verificação: %s", version, details.get("reason"))
+        for question in details["failed_queries"]:
+            logger.error("  sem resultado esperado: %s", question)
+        return False, version
+    logger.info("Versão %s aprovada: %d chunks, %d consulta(s) de verificação.",
+                version, details["chunks"], details.get("queries", 0))
+    if promote_version:
+        promote(config, version)
+        prune_versions(config, config["index_versions_keep"])
+    return True, version
+
+def rebuild_version(config, embeddings, promote_version=True):
+    """Constrói uma nova versão em segundo plano, valida e, se aprovada, promove.
+
+    Retorna (aprovada, versão). A versão em uso não é alterada se a nova for reprovada.
+    """
+    version, db = build_version(config, embeddings)
+    return _finish_version(config, version, embeddings, db, promote_version)
+
+def _copy_ignore(config, source):
+    """Ignora, ao copiar a versão legada (o próprio db_path), as outras versões, o ponteiro e os caches compartilhados."""
+    if source != LEGACY_VERSION:
+        return None
+    root = os.path.abspath(config["db_path"])
+    shared = {os.path.basename(config[key]) for key in ("embedding_cache_path", "structured_cache_path")}
+    skipped = {VERSIONS_DIR, CURRENT_FILE} | shared | {f"{name}{suffix}" for name in shared for suffix in ("-wal", "-shm")}
+
+    def ignore(directory, names):
+        return [name for name in names if name in skipped] if os.path.abspath(directory) == root else []
+
+    return ignore
+
+def update_version(config, embeddings, promote_version=True):
+    """Aplica as mudanças da pasta de documentos em uma cópia da versão ativa, valida e promove.
+
+    A versão em uso não é escrita: os servidores continuam lendo o ChromaDB e o
+    BM25 dela até a troca do ponteiro CURRENT. Retorna (aprovada, versão).
+    """
+    from src.ingestion.indexer import sync_vector_store
+
+    current = active_version(config)
+    version = _new_version_id(config)
+    versioned = index_config(config, version)
+    logger.info("Atualizando o índice na versão %s, a partir da versão %s...", version, current)
+    shutil.copytree(version_dir(config, current), versioned["db_path"], ignore=_copy_ignore(config, current))
+    _write_json(os.path.join(versioned["db_path"], VERSION_INFO_FILE),
+                {"created_at": time.time(), "status": "building", "based_on": current})
+    try:
+        db, manifest = sync_vector_store(versioned, embeddings)
+    except Exception:
+        _update_info(config, version, status="failed")
+        raise
+    _update_info(config, version, status="built", files=len(manifest["files"]), chunks=db._collection.count())
+    return _finish_version(config, version, embeddings, db, promote_version)
+
+def sync_active_version(config, embeddings, promote_version=True):
+    """Sincroniza o índice com a pasta de documentos sem escrever na versão em uso.
+
+    Sem mudanças, não faz nada. Arquivos novos, alterados ou removidos são
+    aplicados em uma cópia da versão ativa (update_version); se os parâmetros
+    do índice mudaram (chunking, palavras-chave, modelo de embeddings), ou se
+    ainda não há índice, tudo é reindexado em uma nova versão (rebuild_version).
+    Em ambos os casos a nova versão só é usada se for aprovada na verificação;
+    retorna False se for reprovada, e a versão atual continua em uso.
+    """
+    from src.ingestion.manifest import chunking_params, diff_files, load_manifest
+    from src.loaders.document_loaders import list_document_files
+
+    current = active_version(config)
+    manifest = load_manifest(index_config(config, current)["manifest_path"])
+    if manifest is None or manifest.get("params") != chunking_params(config):
+        if manifest is None and not has_vector_store(config, current):
+            logger.info("Nenhum índice encontrado: construindo a primeira versão.")
+        else:
+            logger.warning("Parâmetros do índice alterados: reconstruindo em uma nova versão "
+                           "(a versão %s segue em uso).", current)
+        approved, _ = rebuild_version(config, embeddings, promote_version)
+    else:
+        changed, removed = diff_files(manifest, config["docs_dir"], list_document_files(config["docs_dir"]))
+        if not changed and not removed and not manifest.get("bm25_stale"):
+            logger.info("Índice em dia com a pasta de documentos (versão %s).", current)
+            return True
+        logger.info("%d arquivo(s) novo(s) ou alterado(s) e %d removido(s): atualizando em uma nova versão.",
+                    len(changed), len(removed))
+        approved, _ = update_version(config, embeddings, promote_version)
+    if not approved:
+        logger.error("Mantendo a versão %s do índice.", current)
+    return approved
+
+def promote(config, version):
+    """Torna a versão ativa, trocando o ponteiro CURRENT de forma atômica.
+
+    Os servidores passam a usar a nova versão na próxima pergunta (ver
+    ActiveIndex). A versão anterior fica no histórico para rollback().
+    """
+    if version != LEGACY_VERSION and not os.path.exists(os.path.join(version_dir(config, version), VERSION_INFO_FILE)):
+        raise ValueError(f"Versão do índice inexistente: {version}")
+    current = read_current(config)
+    history = list(current["history"]) if current else []
+    previous = current["version"] if current else LEGACY_VERSION
+    if previous != version:
+        history.append(previous)
+        _update_info(config, previous, status="previous")
+    _write_json(os.path.join(config["db_path"], CURRENT_FILE), {
+        "version": version,
+        "promoted_at": time.time(),
+        "history": [entry for entry in history if entry != version][-20:],
+    })
+    _update_info(config, version, status="active")
+    logger.info("Versão %s do índice promovida (anterior: %s).", version, previous)
+
+def rollback(config):
+    """Volta para a versão promovida antes da atual; retorna a versão restaurada."""
+    current = read_current(config)
+    history = [entry for entry in (current or {}).get("history", [])
+               if os.path.isdir(version_dir(config, entry))]
+    if not history:
+        raise ValueError("Não há versão anterior do índice para restaurar.")
+    version = history[-1]
+    _write_json(os.path.join(config["db_path"], CURRENT_FILE), {
+        "version": version,
+        "promoted_at": time.time(),
+        "history": history[:-1],
+    })
+    _update_info(config, current["version"], status="rolled_back")
+    _update_info(config, version, status="active")
+    logger.info("Rollback do índice: %s -> %s.", current["version"], version)
+    return version
+
+def prune_versions(config, keep):
+    """Apaga as versões mais antigas, mantendo a ativa e as keep mais recentes (a legada nunca é apagada)."""
+    active = active_version(config)
+    versions = [version for version, _ in list_versions(config) if version != LEGACY_VERSION]
+    removed = []
+    for version in versions[:-keep] if keep else versions:
+        if version == active:
+            continue
+        shutil.rmtree(version_dir(config, version), ignore_errors=True)
+        removed.append(version)
+    if removed:
+        logger.info("Versões antigas do índice removidas: %s", ", ".join(removed))
+    return removed
+
+IndexState = namedtuple("IndexState", "version db retriever bm25_index_path manifest_path")
+
+class ActiveIndex:
+    """Índice em uso pelo servidor, reaberto quando o ponteiro CURRENT muda.
+
+    get() custa um stat enquanto a versão não muda; depois de uma promoção ou
+    rollback, a próxima pergunta abre a nova versão e as seguintes já a usam.
+    """
+
+    def __init__(self, config, embeddings):
+        self.config = config
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._state = None
+
+    def _pointer_stamp(self):
+        try:
+            return os.stat(os.path.join(self.config["db_path"], CURRENT_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def get(self):
+        stamp = self._pointer_stamp()
+        state = self._state
+        if state is not None and stamp == self._stamp:
+            return state
+        with self._lock:
+            if self._state is None or stamp != self._stamp:
+                self._state = self._open()
+                self._stamp = stamp
+            return self._state
+
+    def _open(self):
+        from src.retrieval.vector_store import initialize_vector_store
+
+        version = active_version(self.config)
+        versioned = index_config(self.config, version)
+        db = initialize_vector_store(self.embeddings, versioned["db_path"])
+        logger.info("Usando a versão %s do índice.", version)
+        return IndexState(
+            version=version,
+            db=db,
+            retriever=db.as_retriever(search_kwargs={"k": self.config["retrieval_candidate_k"]}),
+            bm25_index_path=versioned["bm25_index_path"],
+            manifest_path=versioned["manifest_path"],
+        )
@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+from src.processing.normalization import fold_text, normalize_whitespace
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.;:]+$")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+def normalize_question(question):
+    """Normaliza a pergunta para comparação exata: caixa, acentos, espaços e pontuação final."""
+    return _TRAILING_PUNCTUATION.sub("", normalize_whitespace(fold_text(question)))
+
+def question_numbers(question):
+    """Números citados na pergunta (anos, valores, códigos), sem separadores de milhar ou decimais."""
+    return frozenset(re.sub(r"[.,]", "", number) for number in _NUMBER.findall(question))
+
+class AnswerCache:
+    """Cache de respostas para perguntas repetidas, na frente de ask_question.
+
+    A busca tenta primeiro a pergunta normalizada exata e depois a pergunta mais
+    similar por embedding, acima de "similarity_threshold", entre as que citam
+    os mesmos números: "... em 2023?" e "... em 2024?" têm embeddings quase
+    iguais, mas respostas diferentes. As entradas expiram
+    por TTL, o tamanho é limitado com despejo LRU e tudo é descartado quando a
+    versão (manifesto do índice + versão do prompt) informada por version_func muda.
+    """
+
+    def __init__(self, version_func, max_entries=500, ttl_seconds=86400, similarity_threshold=0.95):
+        self.version_func = version_func
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()  # pergunta normalizada -> (criação, vetor, resposta, fontes, números)
+        self._version = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _check_version(self):
+        version = self.version_func()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _evict_expired(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry[0] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def record_bypass(self):
+        """Contabiliza uma pergunta que não usou o cache (ex.: depende do histórico da conversa)."""
+        with self._lock:
+            self.bypassed += 1
+
+    def record_miss(self):
+        """Contabiliza uma pergunta sem resposta exata para a qual a busca por similaridade não se aplica."""
+        with self._lock:
+            self.misses += 1
+
+    def get_exact(self, question):
+        """Busca a resposta pela pergunta normalizada; retorna (resposta, fontes) ou None."""
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[2], entry[3]
+
+    def get_similar(self, question, question_embedding):
+        """Busca a resposta da pergunta mais similar com os mesmos números; retorna (resposta, fontes) ou None."""
+        numbers = question_numbers(question)
+        with self._lock:
+            self._check_version()
+            self._evict_expired(time.monotonic())
+            keys = [key for key, entry in self._entries.items() if entry[4] == numbers]
+            if not keys:
+                self.misses += 1
+                return None
+
+            matrix = np.vstack([self._entries[key][1] for key in keys])
+            query = np.asarray(question_embedding, dtype=np.float32)
+            norms = np.maximum(np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12)
+            similarities = (matrix @ query) / norms
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            entry = self._entries[keys[best]]
+            return entry[2], entry[3]
+
+    def put(self, question, question_embedding, answer, sources):
+        """Armazena a resposta (e as fontes) gerada para a pergunta."""
+        key = normalize_question(question)
+        vector = np.asarray(question_embedding, dtype=np.float32)
+        with self._lock:
+            self._check_version()
+            self._entries[key] = (time.monotonic(), vector, answer, list(sources), question_numbers(question))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Retorna os contadores de acerto do cache."""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
@@ -1,53 +1,336 @@
-from langchain.chains import LLMChain
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_community.chat_models import ChatDatabricks
-
-def get_memory(k=3):
-    """Configura a memória de conversação."""
-    return ConversationBufferWindowMemory(
-        k=k,
-        memory_key="chat_history",
-        return_messages=True,
-        input_key="question"
-    )
+import asyncio
+import logging
+import time
+
+from src.llm.context import ContextPacker
+from src.observability.metrics import increment, record_latency, record_tokens, stage
+from src.observability.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+def _databricks_llm(config, model):
+    from langchain_community.chat_models import ChatDatabricks
 
-def get_llm(host, token, max_tokens=4096, temperature=0):
-    """Configura o modelo de linguagem."""
     return ChatDatabricks(
-        host=host,
-        api_token=token,
-        endpoint="databricks-llama-4-maverick",
-        max_tokens=max_tokens,
-        temperature=temperature,
+        host=config["databricks_host"],
+        api_token=config["databricks_token"],
+        endpoint=model,
+        max_tokens=config["max_tokens"],
+        temperature=config["temperature"],
+    )
+
+def _llamacpp_llm(config, model):
+    from langchain_community.chat_models import ChatLlamaCpp
+
+    return ChatLlamaCpp(
+        model_path=model,
+        n_ctx=config["local_llm_n_ctx"],
+        n_threads=config["local_llm_threads"] or None,
+        max_tokens=config["max_tokens"],
+        temperature=config["temperature"],
+        verbose=False,
+    )
+
+def _ollama_llm(config, model):
+    from langchain_community.chat_models import ChatOllama
+
+    return ChatOllama(
+        model=model,
+        base_url=config["ollama_base_url"],
+        num_predict=config["max_tokens"],
+        temperature=config["temperature"],
     )
 
-def setup_chain(llm, prompt_template, memory):
-    """Configura a cadeia de processamento LLM."""
-    return LLMChain(
-        llm=llm,
-        prompt=prompt_template,
-        memory=memory,
-        verbose=False
+def _fake_llm(config, model):
+    from src.evaluation.fakes import FakeChatModel
+
+    return FakeChatModel()
+
+# Backend -> (fábrica, modelo padrão); para llamacpp o modelo é o caminho do arquivo GGUF quantizado
+LLM_BACKENDS = {
+    "databricks": (_databricks_llm, "databricks-llama-4-maverick"),
+    "llamacpp": (_llamacpp_llm, "./models/qwen2.5-3b-instruct-q4_k_m.gguf"),
+    "ollama": (_ollama_llm, "llama3.1:8b"),
+    "fake": (_fake_llm, "fake"),
+}
+
+def get_llm(config):
+    """Configura o modelo de linguagem do backend escolhido em llm_backend."""
+    backend = config["llm_backend"]
+    if backend not in LLM_BACKENDS:
+        raise ValueError(f"Backend de LLM desconhecido: {backend} (opções: {', '.join(LLM_BACKENDS)})")
+    factory, default_model = LLM_BACKENDS[backend]
+    return factory(config, config["llm_model"] or default_model)
+
+def _uses_stored_vectors(retriever):
+    """Indica se o retriever é do ChromaDB, permitindo reutilizar os vetores armazenados."""
+    vectorstore = getattr(retriever, "vectorstore", None)
+    return vectorstore is not None and hasattr(vectorstore, "_collection")
+
+def _retrieve(question, retriever, embeddings, bm25_index_path=None):
+    """Recupera os chunks candidatos e, quando disponíveis, seus vetores e ranks BM25."""
+    from src.retrieval.bm25 import get_bm25_index
+    from src.retrieval.hybrid import hybrid_search_with_vectors
+
+    if _uses_stored_vectors(retriever):
+        # Reutiliza os vetores armazenados no ChromaDB em vez de recalculá-los
+        question_embedding = embeddings.embed_query(question)
+        k = retriever.search_kwargs.get("k", 4)
+        bm25_index = get_bm25_index(bm25_index_path) if bm25_index_path else None
+        docs, doc_embeddings, lexical_ranks = hybrid_search_with_vectors(
+            retriever.vectorstore, bm25_index, question, question_embedding, k, k
+        )
+        return docs, question_embedding, doc_embeddings, lexical_ranks
+    return retriever.get_relevant_documents(question), None, None, None
+
+async def _aretrieve(question, retriever, embeddings, question_embedding=None, bm25_index_path=None):
+    """Versão assíncrona de _retrieve, que não bloqueia o event loop."""
+    from src.retrieval.bm25 import get_bm25_index
+    from src.retrieval.hybrid import hybrid_search_with_vectors
+
+    if _uses_stored_vectors(retriever):
+        if question_embedding is None:
+            question_embedding = await embeddings.aembed_query(question)
+        k = retriever.search_kwargs.get("k", 4)
+
+        def search():
+            # A (re)carga do índice BM25 também fica fora do event loop
+            bm25_index = get_bm25_index(bm25_index_path) if bm25_index_path else None
+            return hybrid_search_with_vectors(retriever.vectorstore, bm25_index, question, question_embedding, k, k)
+
+        docs, doc_embeddings, lexical_ranks = await asyncio.to_thread(search)
+        return docs, question_embedding, doc_embeddings, lexical_ranks
+
+    if question_embedding is not None:
+        return await retriever.ainvoke(question), question_embedding, None, None
+
+    # Sem vetores armazenados: embeda a pergunta enquanto a busca é executada
+    docs, question_embedding = await asyncio.gather(
+        retriever.ainvoke(question),
+        embeddings.aembed_query(question),
     )
+    return docs, question_embedding, None, None
+
+def _check_budget(stage_name, timer, budget_ms):
+    """Indica se um estágio excedeu o orçamento de latência configurado."""
+    if budget_ms is not None and timer.elapsed * 1000 > budget_ms:
+        logger.info("Estágio %s levou %.0f ms (orçamento: %s ms)", stage_name, timer.elapsed * 1000, budget_ms)
+        return True
+    return False
+
+def _message_text(message):
+    """Extrai o texto de uma resposta do LLM (mensagem de chat ou string)."""
+    return message.content if hasattr(message, "content") else str(message)
 
-def ask_question(question, retriever, llm_chain, embeddings, keywords, threshold=0.65, return_sources=False):
-    """Processa uma pergunta e retorna a resposta e opcionalmente os documentos fonte."""
+def _format_history(chat_history):
+    """Converte o histórico (mensagens do LangChain) em texto simples para o prompt."""
+    lines = []
+    for message in chat_history or []:
+        speaker = "Usuário" if message.type == "human" else "Cotin IA"
+        lines.append(f"{speaker}: {_message_text(message)}")
+    return "\n".join(lines)
+
+def _build_prompt(prompt_template, question, relevant_docs, chat_history, context_packer=None, query_result=None):
+    """Monta o prompt final (prompt_template preenchido) a partir dos documentos relevantes e do histórico.
+
+    O contexto é montado por context_packer (ver src.llm.context) dentro do
+    orçamento de tokens que sobra depois das instruções, do histórico, da
+    pergunta e do resultado da consulta estruturada (query_result, um Document).
+    Retorna (prompt, documentos usados, tokens do prompt).
+    """
+    context_packer = context_packer or ContextPacker()
+    with stage("prompt_build"):
+        prompt_args = {
+            "question": question,
+            "chat_history": _format_history(chat_history),
+            "query_result": query_result.page_content if query_result else "",
+        }
+        base_tokens = count_tokens(prompt_template.format(context="", **prompt_args))
+        context, used_docs, _ = context_packer.pack(relevant_docs, base_tokens)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Documentos filtrados (primeiros 1000 caracteres):\n%s", context[:1000])
+        prompt_value = prompt_template.format_prompt(context=context, **prompt_args)
+        prompt_tokens = count_tokens(prompt_value.to_string())
+    record_tokens("prompt_tokens", prompt_tokens)
+    logger.debug("Prompt com %d tokens (%d chunks no contexto)", prompt_tokens, len(used_docs))
+    if query_result:
+        used_docs = [query_result] + used_docs
+    return prompt_value, used_docs, prompt_tokens
+
+def _structured_query(question, llm, structured_engine):
+    """Executa a consulta estruturada se a pergunta for roteada para ela (ver src.structured)."""
+    if structured_engine is None or not structured_engine.should_route(question):
+        return None
+    with stage("structured_query"):
+        try:
+            return structured_engine.answer(question, llm)
+        except Exception:
+            logger.exception("Erro na consulta estruturada")
+            return None
+
+def _account_llm_call(prompt_tokens, answer):
+    """Contabiliza a chamada ao LLM e os tokens de entrada e saída."""
+    increment("llm_calls_total")
+    increment("llm_prompt_tokens_total", prompt_tokens)
+    increment("llm_completion_tokens_total", count_tokens(answer))
+
+def ask_question(question, retriever, llm, prompt_template, embeddings, keywords, threshold=0.65,
+                 return_sources=False, chat_history=None, reranker=None, retrieval_budget_ms=None,
+                 bm25_index_path=None, context_packer=None, structured_engine=None):
+    """Processa uma pergunta e retorna a resposta e opcionalmente os documentos fonte.
+
+    llm e prompt_template não guardam estado: o histórico de cada sessão é
+    passado em chat_history (ver src.llm.memory_store), então as mesmas
+    instâncias podem ser compartilhadas por todas as sessões.
+
+    A recuperação tem dois estágios: o retriever traz um conjunto pequeno de
+    candidatos (search_kwargs["k"]) e o reranker escolhe os finais. Se o primeiro
+    estágio exceder retrieval_budget_ms, o reranking usa apenas o modo rápido.
+    Com bm25_index_path, o primeiro estágio é híbrido (vetorial + BM25). Os
+    documentos retornados são os que couberam no contexto (ver context_packer).
+    Com structured_engine, perguntas tabulares (contagens, totais, rankings)
+    também são respondidas por uma consulta SQL, cujo resultado entra no prompt.
+    """
     from src.retrieval.embeddings import filter_relevant_documents
 
-    docs = retriever.get_relevant_documents(question)
-    print(f"[DEBUG] Documentos brutos recuperados: {len(docs)}")
+    with stage("ask_question_total"):
+        query_result = _structured_query(question, llm, structured_engine)
+
+        with stage("retrieval_candidates") as timer:
+            docs, question_embedding, doc_embeddings, lexical_ranks = _retrieve(
+                question, retriever, embeddings, bm25_index_path
+            )
+        fast = _check_budget("retrieval_candidates", timer, retrieval_budget_ms)
+        logger.debug("Documentos brutos recuperados: %d", len(docs))
+
+        with stage("retrieval_rerank"):
+            relevant_docs = filter_relevant_documents(
+                question, docs, embeddings, keywords, threshold,
+                question_embedding=question_embedding,
+                doc_embeddings=doc_embeddings,
+                reranker=reranker,
+                fast=fast,
+                lexical_ranks=lexical_ranks,
+            )
 
-    relevant_docs = filter_relevant_documents(question, docs, embeddings, keywords, threshold)
-    context = "\n".join(doc.page_content for doc in relevant_docs)
-    print(f"[DEBUG] Documentos filtrados (primeiros 1000 caracteres):\n{context[:1000]}\n")
+        prompt_value, relevant_docs, prompt_tokens = _build_prompt(
+            prompt_template, question, relevant_docs, chat_history, context_packer, query_result
+        )
 
-    result = llm_chain({
-        "question": question,
-        "context": context,
-    })
+        with stage("llm_generation"):
+            answer = _message_text(llm.invoke(prompt_value))
+        _account_llm_call(prompt_tokens, answer)
 
     # Retorna a resposta e opcionalmente os documentos relevantes
     if return_sources:
-        return result["text"], relevant_docs
+        return answer, relevant_docs
+    else:
+        return answer
+
+async def _astream_answer(llm, prompt_value, prompt_tokens, on_token):
+    """Gera a resposta token a token, repassando cada token para on_token.
+
+    Usa llm.astream para que o usuário veja a resposta assim que o primeiro
+    token chega. O tempo até o primeiro token é registrado como métrica.
+    """
+    with stage("llm_generation"):
+        started = time.perf_counter()
+        first_token_at = None
+        parts = []
+        async for chunk in llm.astream(prompt_value):
+            token = _message_text(chunk)
+            if not token:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                record_latency("llm_time_to_first_token", first_token_at - started)
+            parts.append(token)
+            await on_token(token)
+
+    answer = "".join(parts)
+    _account_llm_call(prompt_tokens, answer)
+    return answer
+
+async def aask_question(question, retriever, llm, prompt_template, embeddings, keywords, threshold=0.65,
+                        return_sources=False, on_token=None, chat_history=None, answer_cache=None,
+                        reranker=None, retrieval_budget_ms=None, bm25_index_path=None, context_packer=None,
+                        structured_engine=None):
+    """Versão assíncrona de ask_question, para uso nos handlers do Chainlit.
+
+    Recuperação, embeddings e geração rodam sem bloquear o event loop, de modo
+    que uma pergunta lenta não trava as demais sessões do mesmo worker. Se
+    on_token (corrotina) for informado, a resposta é transmitida token a token.
+    Com answer_cache, perguntas repetidas sem histórico de conversa são
+    respondidas do cache (ver src.llm.answer_cache).
+    """
+    from src.retrieval.embeddings import filter_relevant_documents
+
+    with stage("ask_question_total"):
+        question_embedding = None
+        use_cache = answer_cache is not None and not chat_history
+        if answer_cache is not None and chat_history:
+            # O histórico influencia a resposta, então ela não pode ser reaproveitada
+            answer_cache.record_bypass()
+        routed = None
+        if use_cache:
+            cached = answer_cache.get_exact(question)
+            if cached is None:
+                question_embedding = await embeddings.aembed_query(question)
+                # Respostas com resultado SQL dependem de filtros (órgão, ano) que o embedding mal distingue
+                if structured_engine is not None:
+                    routed = await asyncio.to_thread(structured_engine.should_route, question)
+                if routed:
+                    answer_cache.record_miss()
+                else:
+                    cached = answer_cache.get_similar(question, question_embedding)
+            if cached is not None:
+                answer, relevant_docs = cached
+                if on_token is not None:
+                    await on_token(answer)
+                return (answer, relevant_docs) if return_sources else answer
+
+        # A consulta estruturada (se a pergunta for roteada) roda em paralelo com a recuperação;
+        # o roteamento consulta o catálogo, por isso também fica fora do event loop
+        structured_task = None
+        if structured_engine is not None and routed is not False:
+            structured_task = asyncio.create_task(
+                asyncio.to_thread(_structured_query, question, llm, structured_engine)
+            )
+
+        with stage("retrieval_candidates") as timer:
+            docs, question_embedding, doc_embeddings, lexical_ranks = await _aretrieve(
+                question, retriever, embeddings, question_embedding, bm25_index_path
+            )
+        fast = _check_budget("retrieval_candidates", timer, retrieval_budget_ms)
+        logger.debug("Documentos brutos recuperados: %d", len(docs))
+
+        # Pode precisar embedar chunks ausentes do cache ou rodar o cross-encoder, por isso roda fora do event loop
+        with stage("retrieval_rerank"):
+            relevant_docs = await asyncio.to_thread(
+                filter_relevant_documents,
+                question, docs, embeddings, keywords, threshold,
+                question_embedding=question_embedding,
+                doc_embeddings=doc_embeddings,
+                reranker=reranker,
+                fast=fast,
+                lexical_ranks=lexical_ranks,
+            )
+
+        query_result = await structured_task if structured_task else None
+        prompt_value, relevant_docs, prompt_tokens = _build_prompt(
+            prompt_template, question, relevant_docs, chat_history, context_packer, query_result
+        )
+        if on_token is not None:
+            answer = await _astream_answer(llm, prompt_value, prompt_tokens, on_token)
+        else:
+            with stage("llm_generation"):
+                answer = _message_text(await llm.ainvoke(prompt_value))
+            _account_llm_call(prompt_tokens, answer)
+
+        if use_cache:
+            answer_cache.put(question, question_embedding, answer, relevant_docs)
+
+    if return_sources:
+        return answer, relevant_docs
     else:
-        return result["text"]
\ No newline at end of file
+        return answer
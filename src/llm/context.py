@@ -0,0 +1,110 @@
+import logging
+import re
+
+from src.observability.tokens import count_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+# Menor sobreposição (em caracteres) considerada repetição entre chunks vizinhos
+MIN_OVERLAP_CHARS = 20
+
+def _shingles(text, size=5):
+    """Conjunto de sequências de "size" palavras, usado para detectar chunks quase idênticos."""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _trim_overlap(text, previous, max_overlap):
+    """Remove do início de text o trecho que repete o final de previous (efeito do chunk_overlap)."""
+    limit = min(max_overlap, len(text), len(previous))
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+class ContextPacker:
+    """Monta o contexto do prompt dentro de um orçamento de tokens.
+
+    Os chunks chegam ordenados por relevância (saída do reranker). Chunks quase
+    idênticos a outro já escolhido são descartados, e a repetição causada pelo
+    chunk_overlap entre chunks do mesmo arquivo é cortada. Os chunks são então
+    incluídos em ordem de relevância enquanto couberem no orçamento, que é o
+    menor entre "max_context_tokens" e o espaço que sobra da janela do modelo
+    depois do restante do prompt (instruções, histórico e pergunta) e dos
+    "max_tokens" reservados para a resposta.
+    """
+
+    def __init__(self, max_context_tokens=3000, context_window=32000, max_tokens=4096,
+                 chunk_overlap=200, duplicate_threshold=0.8, separator="\n\n"):
+        self.max_context_tokens = max_context_tokens
+        self.context_window = context_window
+        self.max_tokens = max_tokens
+        self.chunk_overlap = chunk_overlap
+        self.duplicate_threshold = duplicate_threshold
+        self.separator = separator
+
+    def budget(self, base_prompt_tokens):
+        """Tokens disponíveis para o contexto, dado o tamanho do prompt sem contexto."""
+        available = self.context_window - self.max_tokens - base_prompt_tokens
+        return max(0, min(self.max_context_tokens, available))
+
+    def _deduplicate(self, documents):
+        """Retorna (documento, texto) sem quase-duplicatas e sem a sobreposição entre vizinhos."""
+        selected = []
+        seen_shingles = []
+        for doc in documents:
+            text = doc.page_content or ""
+            shingles = _shingles(text)
+            if shingles and any(
+                len(shingles & other) / len(shingles) >= self.duplicate_threshold for other in seen_shingles
+            ):
+                continue
+            source = doc.metadata.get("source")
+            for previous_doc, previous_text in selected:
+                if previous_doc.metadata.get("source") == source:
+                    text = _trim_overlap(text, previous_text, self.chunk_overlap)
+            if not text.strip():
+                continue
+            selected.append((doc, text))
+            seen_shingles.append(shingles)
+        return selected
+
+    def pack(self, documents, base_prompt_tokens=0):
+        """Retorna (texto do contexto, documentos usados, tokens do contexto)."""
+        budget = self.budget(base_prompt_tokens)
+        separator_tokens = count_tokens(self.separator)
+        parts = []
+        used = []
+        used_tokens = 0
+        for doc, text in self._deduplicate(documents):
+            tokens = count_tokens(text)
+            cost = tokens + (separator_tokens if parts else 0)
+            if used_tokens + cost > budget:
+                if parts:
+                    # Tenta os próximos: um chunk menor ainda pode caber
+                    continue
+                # Nem o chunk mais relevante cabe inteiro: usa o início dele
+                text = truncate_tokens(text, budget)
+                tokens = count_tokens(text)
+                cost = tokens
+                if not text:
+                    continue
+            parts.append(text)
+            used.append(doc)
+            used_tokens += cost
+        if len(used) < len(documents):
+            logger.debug("Contexto com %d de %d chunks (%d de %d tokens)", len(used), len(documents), used_tokens, budget)
+        return self.separator.join(parts), used, used_tokens
+
+def get_context_packer(config):
+    """Cria o montador de contexto conforme a configuração."""
+    return ContextPacker(
+        max_context_tokens=config["context_max_tokens"],
+        context_window=config["llm_context_window"],
+        max_tokens=config["max_tokens"],
+        chunk_overlap=config["chunk_overlap"],
+        duplicate_threshold=config["context_duplicate_threshold"],
+    )
@@ -0,0 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+class RequestQueueFullError(RuntimeError):
+    """Lançada quando a fila de espera do worker está cheia."""
+
+class RequestLimiter:
+    """Limita as perguntas processadas simultaneamente por worker, com fila de espera limitada."""
+
+    def __init__(self, max_concurrent=8, max_queued=32):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = None
+
+    @asynccontextmanager
+    async def slot(self):
+        """Aguarda uma vaga; lança RequestQueueFullError se a fila já estiver cheia."""
+        if self._semaphore is None:
+            # Criado sob demanda para ficar associado ao event loop do servidor
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self._semaphore.locked() and self.waiting >= self.max_queued:
+            raise RequestQueueFullError("Fila de perguntas cheia.")
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from langchain_core.messages import AIMessage, HumanMessage
+
+class InMemoryHistoryBackend:
+    """Histórico por sessão em memória, com despejo LRU e expiração por inatividade (TTL)."""
+
+    def __init__(self, max_sessions=1000, ttl_seconds=3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()  # session_id -> (último acesso, deque de turnos)
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def load(self, session_id, window):
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])[-window:]
+
+    def append(self, session_id, question, answer, window):
+        with self._lock:
+            now = time.monotonic()
+            _, turns = self._sessions.pop(session_id, (now, deque(maxlen=window)))
+            turns.append((question, answer))
+            self._sessions[session_id] = (now, turns)
+            self._evict_expired(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+class SQLiteHistoryBackend:
+    """Histórico por sessão em SQLite, compartilhável entre vários workers na mesma máquina."""
+
+    def __init__(self, path, ttl_seconds=3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "question TEXT NOT NULL, answer TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load(self, session_id, window):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT question, answer FROM chat_history WHERE session_id = ? AND created_at >= ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, time.time() - self.ttl_seconds, window),
+            ).fetchall()
+        return list(reversed(rows))
+
+    def append(self, session_id, question, answer, window):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO chat_history (session_id, question, answer, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, question, answer, now),
+            )
+            # Mantém apenas a janela de turnos da sessão e descarta sessões expiradas
+            conn.execute(
+                "DELETE FROM chat_history WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, window),
+            )
+            conn.execute("DELETE FROM chat_history WHERE created_at < ?", (now - self.ttl_seconds,))
+
+    def clear(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
+
+class SessionMemoryStore:
+    """Memória de conversação isolada por sessão do Chainlit.
+
+    Substitui a ConversationBufferWindowMemory global: cada sessão guarda apenas
+    as últimas "window" interações, e as cadeias LLM ficam sem estado.
+    """
+
+    def __init__(self, backend, window=3):
+        self.backend = backend
+        self.window = window
+
+    def get_messages(self, session_id):
+        """Retorna o histórico recente da sessão como mensagens do LangChain."""
+        messages = []
+        for question, answer in self.backend.load(session_id, self.window):
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        return messages
+
+    def append(self, session_id, question, answer):
+        self.backend.append(session_id, question, answer, self.window)
+
+    def clear(self, session_id):
+        self.backend.clear(session_id)
+
+def get_memory_store(config):
+    """Cria o armazenamento de memória por sessão conforme a configuração."""
+    if config["memory_backend"] == "sqlite":
+        backend = SQLiteHistoryBackend(config["memory_sqlite_path"], config["memory_ttl_seconds"])
+    elif config["memory_backend"] == "memory":
+        backend = InMemoryHistoryBackend(config["memory_max_sessions"], config["memory_ttl_seconds"])
+    else:
+        raise ValueError(f"Backend de memória desconhecido: {config['memory_backend']}")
+    return SessionMemoryStore(backend, window=config["memory_window"])
@@ -1,5 +1,8 @@
 from langchain.prompts import PromptTemplate
 
+# Incrementar a cada alteração do template (invalida o cache de respostas)
+PROMPT_VERSION = "3"
+
 def get_prompt_template():
     """Retorna o template de prompt para o assistente."""
     template = """
@@ -28,9 +31,14 @@ def get_prompt_template():
        • NUNCA utilize termos ou expressões da blacklist.
 
     Você é o Cotin IA, assistente especializado em dados abertos sobre compras públicas.
-    Responda à pergunta abaixo ({{ question }}) usando as informações extraídas da base de conhecimento (contexto).
+    Responda à pergunta do usuário usando as informações extraídas da base de conhecimento (contexto).
     Se não houver informações suficientes nos documentos, forneça uma resposta baseada no meu conhecimento interno sobre a API de Compras.
 
+    {% if query_result %}
+    Resultado exato de uma consulta às tabelas da base de conhecimento (use-o para contagens, totais e rankings):
+    {{ query_result }}
+    {% endif %}
+
     Informações relevantes encontradas nos documentos:
     {{ context }}
 
@@ -41,7 +49,32 @@ def get_prompt_template():
     """
 
     return PromptTemplate(
-        input_variables=["chat_history", "context", "question"],
+        input_variables=["chat_history", "context", "question", "query_result"],
+        template_format="jinja2",
+        template=template,
+    )
+
+def get_sql_prompt_template():
+    """Retorna o template de prompt que traduz a pergunta em uma consulta SQL (SQLite)."""
+    template = """
+    Você escreve consultas SQL (dialeto SQLite) sobre as tabelas abaixo para responder perguntas sobre compras públicas.
+
+    {{ schema }}
+
+    Regras:
+    • Escreva UMA única consulta SELECT, usando os nomes de tabela exatamente como aparecem acima (com o prefixo).
+    • Use agregações (COUNT, SUM, AVG, MIN, MAX, GROUP BY) quando a pergunta pedir totais, contagens ou rankings.
+    • Para comparar textos, use LIKE com '%' e não diferencie maiúsculas de minúsculas.
+    • Responda apenas com o SQL, sem explicações.
+    • Se nenhuma tabela puder responder à pergunta, responda exatamente: NENHUMA
+
+    Pergunta: {{ question }}
+
+    SQL:
+    """
+
+    return PromptTemplate(
+        input_variables=["schema", "question"],
         template_format="jinja2",
         template=template,
-    )
\ No newline at end of file
+    )
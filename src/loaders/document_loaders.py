@@ -1,39 +1,12 @@
+import logging
 import os
 import sqlite3
-from langchain_community.document_loaders import DirectoryLoader, PyMuPDFLoader, Docx2txtLoader
+from langchain_community.document_loaders import PyMuPDFLoader, Docx2txtLoader
 from langchain_community.document_loaders import UnstructuredExcelLoader, SQLDatabaseLoader
 from langchain_community.document_loaders import CSVLoader
+from src.loaders.tabular import TABULAR_LOADERS
 
-def load_pdf_documents(docs_dir="docs"):
-    """Carrega documentos PDF do diretório especificado."""
-    loader = DirectoryLoader(docs_dir, glob="**/*.pdf", loader_cls=PyMuPDFLoader)
-    documents = loader.load()
-    print(f"PDFs carregados: {len(documents)}")
-    return documents
-
-def load_docx_documents(docs_dir="docs"):
-    """Carrega documentos DOCX do diretório especificado."""
-    loader = DirectoryLoader(docs_dir, glob="**/*.docx", loader_cls=Docx2txtLoader)
-    documents = loader.load()
-    print(f"DOCXs carregados: {len(documents)}")
-    return documents
-
-def load_xlsx_documents(docs_dir="docs"):
-    """Carrega documentos XLSX do diretório especificado."""
-    loader = DirectoryLoader(docs_dir, glob="**/*.xlsx", loader_cls=UnstructuredExcelLoader)
-    documents = loader.load()
-    print(f"XLSXs carregados: {len(documents)}")
-    return documents
-
-def load_db_documents(docs_dir="docs"):
-    """Carrega documentos de bancos de dados SQLite."""
-    db_documents = []
-    for file in os.listdir(docs_dir):
-        if file.endswith(".db"):
-            db_path = os.path.join(docs_dir, file)
-            db_documents.extend(_load_single_db(db_path))
-    print(f"DBs carregados: {len(db_documents)}")
-    return db_documents
+logger = logging.getLogger(__name__)
 
 def _load_single_db(db_path, query=None):
     """Carrega dados de um único arquivo de banco de dados."""
@@ -58,54 +31,52 @@ def _load_single_db(db_path, query=None):
         loader = SQLDatabaseLoader(db_path, query)
         return loader.load()
 
-def load_csv_documents(docs_dir="docs"):
-    """Carrega documentos CSV do diretório especificado."""
-    import os
-    
-    csv_documents = []
-    for file in os.listdir(docs_dir):
-        if file.endswith(".csv"):
-            file_path = os.path.join(docs_dir, file)
-            loader = CSVLoader(
-                file_path=file_path,
-                csv_args={
-                    'delimiter': ',',
-                    'quotechar': '"',
-                    'fieldnames': None  # Detecta automaticamente os cabeçalhos
-                },
-                source_column=None  # Usa todas as colunas
-            )
-            documents = loader.load()
-            # Adiciona metadados para identificar a origem
-            for doc in documents:
-                doc.metadata["source_type"] = "csv"
-                doc.metadata["filename"] = file
-            
-            csv_documents.extend(documents)
-    
-    print(f"CSVs carregados: {len(csv_documents)}")
-    return csv_documents
-
-def load_all_documents(docs_dir="docs"):
-    """Carrega todos os tipos de documentos suportados."""
-    print("Carregando documentos...")
-
-    pdf_documents = load_pdf_documents(docs_dir)
-    docx_documents = load_docx_documents(docs_dir)
-    xlsx_documents = load_xlsx_documents(docs_dir)
-    db_documents = load_db_documents(docs_dir)
-    csv_documents = load_csv_documents(docs_dir)  # Nova linha
-
-    documents = pdf_documents + docx_documents + xlsx_documents + db_documents + csv_documents  # Atualizado
-
-    if not documents:
-        raise ValueError("Nenhum documento foi carregado na pasta 'docs'.")
-
-    print(f"Total de documentos carregados: {len(documents)} (PDFs: {len(pdf_documents)}, "
-          f"DOCX: {len(docx_documents)}, XLSX: {len(xlsx_documents)}, "
-          f"DB: {len(db_documents)}, CSV: {len(csv_documents)})")  # Atualizado
-
+def _load_single_csv(file_path):
+    """Carrega as linhas de um único arquivo CSV."""
+    loader = CSVLoader(
+        file_path=file_path,
+        csv_args={
+            'delimiter': ',',
+            'quotechar': '"',
+            'fieldnames': None  # Detecta automaticamente os cabeçalhos
+        },
+        source_column=None  # Usa todas as colunas
+    )
+    documents = loader.load()
+    # Adiciona metadados para identificar a origem
+    for doc in documents:
+        doc.metadata["source_type"] = "csv"
+        doc.metadata["filename"] = os.path.basename(file_path)
     return documents
 
-
-
+# Carregadores por extensão, usados na ingestão incremental arquivo a arquivo
+FILE_LOADERS = {
+    ".pdf": lambda path: PyMuPDFLoader(path).load(),
+    ".docx": lambda path: Docx2txtLoader(path).load(),
+    ".xlsx": lambda path: UnstructuredExcelLoader(path).load(),
+    ".db": _load_single_db,
+    ".csv": _load_single_csv,
+}
+
+def list_document_files(docs_dir="docs"):
+    """Lista, em ordem estável, os arquivos suportados presentes no diretório de documentos."""
+    files = []
+    for root, _, filenames in os.walk(docs_dir):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in FILE_LOADERS:
+                files.append(os.path.join(root, filename))
+    return sorted(files)
+
+def iter_file_documents(file_path, tabular=None):
+    """Carrega um único arquivo usando o carregador adequado à sua extensão.
+
+    Com tabular (dict com rows_per_chunk e max_chunk_chars), CSV, XLSX e SQLite
+    são lidos como tabelas, em blocos de linhas com cabeçalho (ver src.loaders.tabular),
+    e os blocos são gerados sob demanda; nos demais casos, retorna a lista de documentos.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in FILE_LOADERS:
+        raise ValueError(f"Formato de arquivo não suportado: {file_path}")
+    if tabular and extension in TABULAR_LOADERS:
+        return TABULAR_LOADERS[extension](file_path, **tabular)
+    return FILE_LOADERS[extension](file_path)
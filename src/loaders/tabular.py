@@ -0,0 +1,174 @@
+import csv
+import os
+import sqlite3
+from langchain_core.documents import Document
+
+# Valores distintos de exemplo guardados por coluna no resumo da tabela
+SUMMARY_SAMPLES = 5
+# Linhas lidas por vez do SQLite
+FETCH_SIZE = 500
+
+def _cell(value):
+    """Formata uma célula em uma única linha, sem quebras que desalinhariam a tabela."""
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
+
+class _ColumnStats:
+    """Estatísticas de uma coluna calculadas em uma passada, com memória limitada."""
+
+    def __init__(self):
+        self.filled = 0
+        self.samples = []
+        self.minimum = None
+        self.maximum = None
+        self.numeric = True
+
+    def add(self, value):
+        if value == "":
+            return
+        self.filled += 1
+        if len(self.samples) < SUMMARY_SAMPLES and value not in self.samples:
+            self.samples.append(value)
+        if self.numeric:
+            try:
+                number = float(value.replace(",", ".")) if isinstance(value, str) else float(value)
+            except ValueError:
+                self.numeric = False
+                return
+            self.minimum = number if self.minimum is None else min(self.minimum, number)
+            self.maximum = number if self.maximum is None else max(self.maximum, number)
+
+    def describe(self, name):
+        if not self.filled:
+            return f"- {name}: vazia"
+        if self.numeric and self.minimum is not None:
+            return f"- {name}: numérica, de {self.minimum:g} a {self.maximum:g}"
+        return f"- {name}: exemplos: {'; '.join(self.samples)}"
+
+def table_documents(rows, header, table, metadata, rows_per_chunk=50, max_chunk_chars=1500, include_rows=True):
+    """Agrupa as linhas de uma tabela em blocos, cada um com o cabeçalho das colunas.
+
+    "rows" pode ser qualquer iterável (lido sob demanda), então só um bloco fica
+    em memória por vez. Um bloco termina ao atingir "rows_per_chunk" linhas ou
+    "max_chunk_chars" caracteres; uma linha que sozinha passa desse limite é
+    dividida em vários blocos. Ao final é gerado um chunk de resumo da tabela
+    (colunas, nº de linhas e exemplos de valores por coluna). Com include_rows
+    falso, as linhas são apenas percorridas para o resumo, sem gerar blocos.
+    """
+    header = [_cell(name) or f"coluna_{i + 1}" for i, name in enumerate(header)]
+    title = f"Tabela: {table}\nColunas: {' | '.join(header)}\n"
+    stats = [_ColumnStats() for _ in header]
+    lines = []
+    size = len(title)
+    first_row = 1
+    row_count = 0
+
+    def block(last_row):
+        return Document(
+            page_content=title + "\n".join(lines),
+            metadata={**metadata, "table": table, "chunk_kind": "table_rows",
+                      "row_start": first_row, "row_end": last_row},
+        )
+
+    for row in rows:
+        cells = [_cell(value) for value in row]
+        if not any(cells):
+            continue
+        row_count += 1
+        for column, value in zip(stats, cells):
+            column.add(value)
+        if not include_rows:
+            continue
+        line = " | ".join(cells)
+        if lines and (len(lines) >= rows_per_chunk or size + len(line) + 1 > max_chunk_chars):
+            yield block(row_count - 1)
+            lines, size, first_row = [], len(title), row_count
+        if size + len(line) > max_chunk_chars:
+            # Linha maior que um bloco inteiro: vai em pedaços, cada um com o cabeçalho
+            room = max(max_chunk_chars - len(title), max_chunk_chars // 2, 1)
+            for start in range(0, len(line), room):
+                lines = [line[start:start + room]]
+                yield block(row_count)
+            lines, first_row = [], row_count + 1
+            continue
+        lines.append(line)
+        size += len(line) + 1
+    if lines:
+        yield block(row_count)
+
+    summary = [f"Resumo da tabela {table}: {row_count} linha(s), {len(header)} coluna(s)."]
+    summary += [column.describe(name) for name, column in zip(header, stats)]
+    yield Document(
+        page_content="\n".join(summary),
+        metadata={**metadata, "table": table, "chunk_kind": "table_summary", "rows": row_count},
+    )
+
+def sniff_csv_dialect(file_path, encoding="utf-8"):
+    """Detecta o delimitador de um CSV a partir do início do arquivo."""
+    with open(file_path, "r", encoding=encoding, errors="replace", newline="") as f:
+        sample = f.read(8192)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return csv.excel
+
+def load_csv_table(file_path, rows_per_chunk=50, max_chunk_chars=1500, include_rows=True, encoding="utf-8"):
+    """Lê um CSV linha a linha (delimitador detectado) e gera blocos de linhas e o resumo."""
+    dialect = sniff_csv_dialect(file_path, encoding)
+    metadata = {"source": file_path, "source_type": "csv", "filename": os.path.basename(file_path)}
+    with open(file_path, "r", encoding=encoding, errors="replace", newline="") as f:
+        reader = csv.reader(f, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        table = os.path.splitext(os.path.basename(file_path))[0]
+        yield from table_documents(reader, header, table, metadata, rows_per_chunk, max_chunk_chars, include_rows)
+
+def _quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _iter_cursor(cursor):
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+def load_sqlite_tables(file_path, rows_per_chunk=50, max_chunk_chars=1500, include_rows=True):
+    """Lê cada tabela de um banco SQLite com um cursor (sem carregar a tabela inteira)."""
+    metadata = {"source": file_path, "source_type": "db", "filename": os.path.basename(file_path)}
+    conn = sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        for table in tables:
+            cursor = conn.execute(f"SELECT * FROM {_quote_identifier(table)}")
+            header = [column[0] for column in cursor.description]
+            yield from table_documents(_iter_cursor(cursor), header, table, metadata, rows_per_chunk, max_chunk_chars, include_rows)
+    finally:
+        conn.close()
+
+def load_xlsx_tables(file_path, rows_per_chunk=50, max_chunk_chars=1500, include_rows=True):
+    """Lê cada planilha de um XLSX em modo somente leitura; a primeira linha é o cabeçalho."""
+    from openpyxl import load_workbook
+
+    metadata = {"source": file_path, "source_type": "xlsx", "filename": os.path.basename(file_path)}
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            yield from table_documents(rows, header, sheet.title, metadata, rows_per_chunk, max_chunk_chars, include_rows)
+    finally:
+        workbook.close()
+
+# Carregadores do modo tabular, por extensão
+TABULAR_LOADERS = {
+    ".csv": load_csv_table,
+    ".db": load_sqlite_tables,
+    ".xlsx": load_xlsx_tables,
+}
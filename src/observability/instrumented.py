@@ -0,0 +1,41 @@
+import time
+from langchain_core.embeddings import Embeddings
+
+from src.observability.metrics import increment, record_latency
+from src.observability.tokens import count_tokens
+
+class InstrumentedEmbeddings(Embeddings):
+    """Envolve um modelo de embeddings contando chamadas, textos e tokens e medindo a latência."""
+
+    def __init__(self, base):
+        self.base = base
+
+    def _account(self, texts, started):
+        record_latency("embedding_request", time.perf_counter() - started)
+        increment("embedding_calls_total")
+        increment("embedding_texts_total", len(texts))
+        increment("embedding_tokens_total", sum(count_tokens(text) for text in texts))
+
+    def embed_documents(self, texts):
+        started = time.perf_counter()
+        vectors = self.base.embed_documents(texts)
+        self._account(texts, started)
+        return vectors
+
+    def embed_query(self, text):
+        started = time.perf_counter()
+        vector = self.base.embed_query(text)
+        self._account([text], started)
+        return vector
+
+    async def aembed_documents(self, texts):
+        started = time.perf_counter()
+        vectors = await self.base.aembed_documents(texts)
+        self._account(texts, started)
+        return vectors
+
+    async def aembed_query(self, text):
+        started = time.perf_counter()
+        vector = await self.base.aembed_query(text)
+        self._account([text], started)
+        return vector
@@ -0,0 +1,177 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+# Últimas amostras de cada métrica de latência, em segundos (para percentis)
+MAX_SAMPLES = 1000
+
+# Limites (em segundos) dos buckets dos histogramas exportados no formato Prometheus
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Limites dos buckets dos histogramas de tamanho em tokens (ex.: prompt por pergunta)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+_lock = threading.Lock()
+_latencies = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_histograms = {}  # estágio -> [contagens por bucket, soma, total]
+_token_samples = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_token_histograms = {}  # nome -> [contagens por bucket, soma, total]
+_counters = defaultdict(float)
+_collectors = []
+
+# Instrumentos do OpenTelemetry, criados sob demanda quando o pacote está instalado
+try:
+    from opentelemetry import metrics as otel_metrics
+    from opentelemetry import trace as otel_trace
+
+    _meter = otel_metrics.get_meter("cotin-ia")
+    _tracer = otel_trace.get_tracer("cotin-ia")
+    _otel_histogram = _meter.create_histogram(
+        "cotin.stage.duration", unit="s", description="Duração de cada estágio do pipeline RAG"
+    )
+    _otel_token_histogram = _meter.create_histogram(
+        "cotin.tokens", description="Tamanho em tokens por pergunta (ex.: prompt enviado ao LLM)"
+    )
+    _otel_counters = {}
+except ImportError:
+    _tracer = None
+    _otel_histogram = None
+    _otel_token_histogram = None
+    _otel_counters = None
+
+def _observe(histograms, buckets, name, value):
+    histogram = histograms.setdefault(name, [[0] * len(buckets), 0.0, 0])
+    index = bisect_left(buckets, value)
+    if index < len(buckets):
+        histogram[0][index] += 1
+    histogram[1] += value
+    histogram[2] += 1
+
+def record_latency(name, seconds):
+    """Registra uma amostra de latência (em segundos) para o estágio informado."""
+    with _lock:
+        _latencies[name].append(seconds)
+        _observe(_histograms, BUCKETS, name, seconds)
+    if _otel_histogram is not None:
+        _otel_histogram.record(seconds, {"stage": name})
+
+def record_tokens(name, count):
+    """Registra um tamanho em tokens (ex.: "prompt_tokens" de cada pergunta)."""
+    with _lock:
+        _token_samples[name].append(count)
+        _observe(_token_histograms, TOKEN_BUCKETS, name, count)
+    if _otel_token_histogram is not None:
+        _otel_token_histogram.record(count, {"kind": name})
+
+def increment(name, value=1):
+    """Incrementa um contador (ex.: chamadas e tokens de embeddings e do LLM)."""
+    with _lock:
+        _counters[name] += value
+    if _otel_counters is not None:
+        counter = _otel_counters.get(name)
+        if counter is None:
+            counter = _otel_counters.setdefault(name, _meter.create_counter(f"cotin.{name}"))
+        counter.add(value)
+
+def register_collector(collector):
+    """Registra uma função que retorna {nome: valor} para exportar como gauge (ex.: cache de respostas)."""
+    _collectors.append(collector)
+
+class _Timer:
+    elapsed = 0.0
+
+@contextmanager
+def stage(name, **attributes):
+    """Mede um estágio do pipeline: registra a latência e, com OpenTelemetry, abre um span.
+
+    O objeto retornado expõe "elapsed" (segundos) após o fim do bloco.
+    """
+    timer = _Timer()
+    with ExitStack() as stack:
+        if _tracer is not None:
+            stack.enter_context(_tracer.start_as_current_span(name, attributes=attributes))
+        started = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            timer.elapsed = time.perf_counter() - started
+            record_latency(name, timer.elapsed)
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _summary(samples, name):
+    with _lock:
+        values = sorted(samples.get(name, ()))
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": _percentile(values, 0.50),
+        "p95": _percentile(values, 0.95),
+        "p99": _percentile(values, 0.99),
+        "max": values[-1],
+    }
+
+def latency_summary(name):
+    """Retorna contagem, p50, p95, p99 e máximo das amostras recentes de uma métrica."""
+    return _summary(_latencies, name)
+
+def token_summary(name):
+    """Como latency_summary, para as amostras registradas com record_tokens."""
+    return _summary(_token_samples, name)
+
+def get_counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+def reset_latencies():
+    """Descarta todas as amostras registradas (usado entre rodadas de benchmark)."""
+    with _lock:
+        _latencies.clear()
+        _histograms.clear()
+        _token_samples.clear()
+        _token_histograms.clear()
+
+def _render_histogram(lines, family, label, buckets, histograms):
+    for name, (counts, total_sum, total_count) in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            lines.append(f'{family}_bucket{{{label}="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{family}_bucket{{{label}="{name}",le="+Inf"}} {total_count}')
+        lines.append(f'{family}_sum{{{label}="{name}"}} {total_sum}')
+        lines.append(f'{family}_count{{{label}="{name}"}} {total_count}')
+
+def render_prometheus():
+    """Exporta histogramas, contadores e gauges no formato texto do Prometheus."""
+    with _lock:
+        histograms = {name: (list(data[0]), data[1], data[2]) for name, data in _histograms.items()}
+        token_histograms = {name: (list(data[0]), data[1], data[2]) for name, data in _token_histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP cotin_stage_duration_seconds Duração de cada estágio do pipeline RAG.",
+        "# TYPE cotin_stage_duration_seconds histogram",
+    ]
+    _render_histogram(lines, "cotin_stage_duration_seconds", "stage", BUCKETS, histograms)
+    lines += [
+        "# HELP cotin_tokens Tamanho em tokens por pergunta.",
+        "# TYPE cotin_tokens histogram",
+    ]
+    _render_histogram(lines, "cotin_tokens", "kind", TOKEN_BUCKETS, token_histograms)
+
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE cotin_{name} counter")
+        lines.append(f"cotin_{name} {value}")
+
+    for collector in _collectors:
+        for name, value in sorted(collector().items()):
+            if value is None:
+                continue
+            lines.append(f"# TYPE cotin_{name} gauge")
+            lines.append(f"cotin_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,85 @@
+import logging
+import os
+
+def configure_logging(level="INFO"):
+    """Configura o logging da aplicação.
+
+    No nível INFO (padrão) só aparecem mensagens de inicialização e ingestão; os
+    detalhes por pergunta e por documento (amostras de texto, contexto enviado ao
+    LLM) só são gerados em DEBUG.
+    """
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+def configure_opentelemetry(service_name="cotin-ia"):
+    """Ativa a exportação OTLP de métricas e traces quando OTEL_EXPORTER_OTLP_ENDPOINT está definido.
+
+    Sem essa variável (ou sem o SDK instalado) a instrumentação continua
+    disponível apenas no endpoint /metrics.
+    """
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return False
+    try:
+        from opentelemetry import metrics, trace
+        from opentelemetry.exporter.otlp.proto.http.metric_exporter import OTLPMetricExporter
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.metrics import MeterProvider
+        from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logging.getLogger(__name__).warning("SDK do OpenTelemetry não instalado; exportação OTLP desativada.")
+        return False
+
+    resource = Resource.create({"service.name": service_name})
+    tracer_provider = TracerProvider(resource=resource)
+    tracer_provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(tracer_provider)
+    metrics.set_meter_provider(MeterProvider(
+        resource=resource,
+        metric_readers=[PeriodicExportingMetricReader(OTLPMetricExporter())],
+    ))
+    return True
+
+def register_metrics_endpoint(app, path="/metrics"):
+    """Adiciona ao servidor FastAPI do Chainlit um endpoint de métricas no formato Prometheus."""
+    from fastapi.responses import PlainTextResponse
+    from src.observability.metrics import render_prometheus
+
+    @app.get(path, include_in_schema=False)
+    async def metrics_endpoint():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    _move_before_catch_all(app, 1)
+
+def register_health_endpoints(app, is_ready):
+    """Adiciona /healthz (processo no ar) e /ready (índices abertos e aquecidos) ao servidor do Chainlit.
+
+    /ready responde 503 até is_ready() retornar True, para que o balanceador
+    só envie perguntas a um worker depois do aquecimento.
+    """
+    from fastapi.responses import PlainTextResponse
+
+    @app.get("/healthz", include_in_schema=False)
+    async def health_endpoint():
+        return PlainTextResponse("ok")
+
+    @app.get("/ready", include_in_schema=False)
+    async def ready_endpoint():
+        if is_ready():
+            return PlainTextResponse("ready")
+        return PlainTextResponse("warming up", status_code=503)
+
+    _move_before_catch_all(app, 2)
+
+def _move_before_catch_all(app, count):
+    """Move as últimas rotas registradas para o início da lista.
+
+    O Chainlit registra uma rota "catch-all" para o frontend; as rotas
+    operacionais precisam vir antes dela.
+    """
+    routes = app.router.routes
+    routes[:0] = [routes.pop() for _ in range(count)][::-1]
@@ -0,0 +1,34 @@
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """Carrega o tokenizador do tiktoken na primeira chamada, se disponível."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # tiktoken ausente ou sem acesso ao vocabulário: usa a estimativa por caracteres
+            _encoding = None
+    return _encoding
+
+def count_tokens(text):
+    """Conta (ou, sem tiktoken, estima em ~4 caracteres por token) os tokens de um texto."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+def truncate_tokens(text, max_tokens):
+    """Corta o texto para no máximo max_tokens tokens (mesma contagem de count_tokens)."""
+    if max_tokens <= 0 or not text:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
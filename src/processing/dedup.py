@@ -0,0 +1,80 @@
+import hashlib
+import re
+import zlib
+import numpy as np
+
+from src.processing.normalization import fold_text, normalize_whitespace
+
+# Primo de Mersenne 2^31 - 1: (a * x + b) cabe em 64 bits sem estouro
+_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+# Palavras por shingle
+SHINGLE_SIZE = 5
+# Separador das fontes de um chunk compartilhado no metadado "sources"
+SOURCES_SEPARATOR = " | "
+
+def allows_near_duplicates(chunk):
+    """Indica se o chunk pode ser unido a um quase igual.
+
+    Só texto corrido: blocos de tabela (metadado "chunk_kind") que diferem em
+    poucas linhas, como exportações mensais consecutivas, têm dados distintos e
+    só são unidos quando idênticos.
+    """
+    return not chunk.metadata.get("chunk_kind")
+
+def content_hash(text):
+    """Hash do conteúdo do chunk, ignorando diferenças de espaços e quebras de linha."""
+    return hashlib.sha1(normalize_whitespace(text).encode("utf-8")).hexdigest()
+
+def _permutations(num_perm):
+    # Semente fixa: as assinaturas precisam ser iguais em todos os processos e execuções
+    rng = np.random.RandomState(20240601)
+    a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+    b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+def _shingles(text):
+    """Hashes (crc32) das sequências de SHINGLE_SIZE palavras do texto, sem acentos nem maiúsculas."""
+    words = _WORD.findall(fold_text(text))
+    if len(words) <= SHINGLE_SIZE:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in set(grams)), dtype=np.uint64)
+
+def minhash_signatures(texts, num_perm=64):
+    """Assinaturas MinHash (uma linha uint32 por texto) para estimar a similaridade de Jaccard dos shingles.
+
+    A fração de posições iguais entre duas assinaturas estima a fração de
+    shingles em comum entre os textos.
+    """
+    a, b = _permutations(num_perm)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for i, text in enumerate(texts):
+        hashes = _shingles(text) % np.uint64(_PRIME)
+        signatures[i] = ((np.outer(hashes, a) + b) % np.uint64(_PRIME)).min(axis=0)
+    return signatures
+
+def band_buckets(signature, bands):
+    """Chaves LSH da assinatura: um hash por faixa de linhas.
+
+    Textos com similaridade alta coincidem em pelo menos uma faixa com alta
+    probabilidade, então só esses candidatos precisam ser comparados.
+    """
+    rows = len(signature) // bands
+    return [
+        int.from_bytes(hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+                       "little", signed=True)
+        for band in range(bands)
+    ]
+
+def estimated_similarity(signature, other):
+    """Similaridade de Jaccard estimada a partir de duas assinaturas MinHash."""
+    return float(np.mean(signature == other))
+
+def document_sources(doc):
+    """Fontes de um documento recuperado: todas as de um chunk deduplicado ou só a sua."""
+    sources = doc.metadata.get("sources")
+    if sources:
+        return str(sources).split(SOURCES_SEPARATOR)
+    return [str(doc.metadata.get("source", "Desconhecido"))]
@@ -0,0 +1,97 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Tabela de fold para os acentos do português (caminho rápido, sem decompor o texto)
+_FOLD_TABLE = str.maketrans(
+    "áàâãäéèêëíìîïóòôõöúùûüçñ",
+    "aaaaaeeeeiiiiooooouuuucn",
+)
+
+def fold_text(text):
+    """Converte para minúsculas e remove acentos (ex.: "Licitação" -> "licitacao")."""
+    text = text.lower().translate(_FOLD_TABLE)
+    if text.isascii():
+        return text
+    # Outros caracteres acentuados: decomposição Unicode completa
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def normalize_whitespace(text):
+    """Substitui sequências de espaços, tabs e quebras de linha por um único espaço."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+def _trie_pattern(words):
+    """Monta uma expressão regular a partir da árvore de prefixos das palavras.
+
+    Palavras com prefixo comum compartilham o mesmo ramo ("compra|compras" vira
+    "compras?"), então o texto é percorrido uma única vez, sem retrocesso entre
+    alternativas, e as palavras mais longas têm prioridade.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if end else body
+
+    return build(trie)
+
+class KeywordMatcher:
+    """Localiza várias palavras-chave em uma única passada sobre o texto.
+
+    As palavras-chave e o texto são comparados sem acentos e sem diferenciar
+    maiúsculas ("transparência" encontra "TRANSPARENCIA"). Uma ocorrência só
+    conta se começa no início de uma palavra ("api" encontra "APIs", mas não
+    "capital").
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(dict.fromkeys(fold_text(keyword) for keyword in keywords if keyword))
+        self._pattern = re.compile(r"(?<!\w)" + _trie_pattern(self.keywords)) if self.keywords else None
+        # A ocorrência mais longa também conta as palavras-chave que são prefixo dela ("painel de precos" -> "painel")
+        self._implied = {
+            keyword: [other for other in self.keywords if keyword.startswith(other)] for keyword in self.keywords
+        }
+
+    def matches(self, text, folded=False):
+        """Retorna, em ordem de configuração, as palavras-chave presentes no texto."""
+        if self._pattern is None or not text:
+            return []
+        found = set()
+        for match in set(self._pattern.findall(text if folded else fold_text(text))):
+            found.update(self._implied[match])
+        return [keyword for keyword in self.keywords if keyword in found]
+
+    def count(self, text, folded=False):
+        """Número de palavras-chave distintas presentes no texto."""
+        return len(self.matches(text, folded))
+
+@lru_cache(maxsize=16)
+def _matcher_for(keywords):
+    return KeywordMatcher(keywords)
+
+def get_keyword_matcher(keywords):
+    """Retorna o matcher (compilado uma vez por lista) para uma lista de palavras-chave ou um matcher pronto."""
+    if isinstance(keywords, KeywordMatcher):
+        return keywords
+    return _matcher_for(tuple(keywords or ()))
+
+def annotate_keywords(documents, keywords):
+    """Grava nos metadados de cada chunk as palavras-chave encontradas, para não reprocessar o texto nas consultas."""
+    matcher = get_keyword_matcher(keywords)
+    for doc in documents:
+        found = matcher.matches(doc.page_content or "")
+        doc.metadata["keyword_hits"] = len(found)
+        doc.metadata["keywords"] = ",".join(found)
+    return documents
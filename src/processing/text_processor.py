@@ -1,33 +1,44 @@
-import re
+import json
+import logging
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from src.processing.normalization import normalize_whitespace
+
+logger = logging.getLogger(__name__)
+
 def normalize_text(text: str) -> str:
     """Normaliza o texto removendo espaços extras."""
-    text = re.sub(r'\s+', ' ', text)
-    text = text.strip()
-    return text
+    return normalize_whitespace(text)
+
+def _format_json_row(content):
+    """Formata uma linha serializada em JSON como pares chave-valor; outros textos voltam inalterados."""
+    if not (content.startswith('{') and content.endswith('}')):
+        return content
+    try:
+        data = json.loads(content)
+    except ValueError:
+        # Se não for JSON válido, mantém como está
+        return content
+    return "\n".join(f"{k}: {v}" for k, v in data.items()) if isinstance(data, dict) else content
 
 def process_documents(documents):
-    """Processa e normaliza o conteúdo dos documentos."""
+    """Processa e normaliza o conteúdo dos documentos, em uma única passada pelo lote."""
+    debug = logger.isEnabledFor(logging.DEBUG)
     for i, doc in enumerate(documents):
         if not doc.page_content:
             doc.page_content = ""
             continue
 
+        # Blocos de tabela já vêm formatados; normalizar os espaços desfaria as linhas
+        if doc.metadata.get("chunk_kind"):
+            continue
+
         # Processamento específico por tipo de documento
         source_type = doc.metadata.get("source_type", "")
 
         if source_type == "csv":
             # Processamento específico para CSV
-            if doc.page_content.startswith('{') and doc.page_content.endswith('}'):
-                try:
-                    import json
-                    data = json.loads(doc.page_content)
-                    # Formata como pares chave-valor
-                    doc.page_content = "\n".join([f"{k}: {v}" for k, v in data.items()])
-                except:
-                    # Se não for JSON válido, mantém como está
-                    pass
+            doc.page_content = _format_json_row(doc.page_content)
         elif source_type == "xlsx":
             # Processamento específico para Excel
             # Pode adicionar formatação específica para dados tabulares
@@ -40,19 +51,24 @@ def process_documents(documents):
         # Normalização comum para todos os tipos de documentos
         doc.page_content = normalize_text(doc.page_content)
 
-        # Log de depuração
-        print(f"[DEBUG] Amostra do documento {i+1} ({source_type}): {doc.page_content[:500]}")
+        # Log de depuração (só monta a amostra se o nível DEBUG estiver ativo)
+        if debug:
+            logger.debug("Amostra do documento %d (%s): %s", i + 1, source_type, doc.page_content[:500])
 
     return documents
 
 def split_documents(documents, chunk_size=1500, chunk_overlap=200):
-    """Divide os documentos em chunks menores."""
+    """Divide os documentos em chunks menores.
+
+    Blocos de tabela (metadado "chunk_kind") já têm o tamanho certo e são mantidos inteiros.
+    """
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
-    texts = text_splitter.split_documents(documents)
-    print(f"Total de textos (chunks): {len(texts)}")
+    texts = text_splitter.split_documents([doc for doc in documents if not doc.metadata.get("chunk_kind")])
+    texts += [doc for doc in documents if doc.metadata.get("chunk_kind")]
+    logger.debug("Total de textos (chunks): %d", len(texts))
     return texts
 
 def process_csv_document(doc):
@@ -60,19 +76,7 @@ def process_csv_document(doc):
     # Verifica se é um documento CSV
     if doc.metadata.get("source_type") == "csv":
         # Formata o conteúdo para ser mais legível e útil para o RAG
-        content = doc.page_content
-
-        # Se o conteúdo for um dicionário ou objeto JSON, formata-o melhor
-        if content.startswith('{') and content.endswith('}'):
-            import json
-            try:
-                data = json.loads(content)
-                # Formata como pares chave-valor
-                formatted_content = "\n".join([f"{k}: {v}" for k, v in data.items()])
-                doc.page_content = formatted_content
-            except:
-                # Se não for JSON válido, mantém como está
-                pass
+        doc.page_content = _format_json_row(doc.page_content)
 
         # Normaliza o texto
         doc.page_content = normalize_text(doc.page_content)
@@ -0,0 +1,294 @@
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import numpy as np
+
+from src.processing.normalization import fold_text
+
+# Stopwords do português (sem acentos, pois são comparadas após o fold)
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele do dos e ela ele em entre era essa esse esta este eu foi
+for ha isso isto ja la mais mas me mesmo na nas nao nem no nos num numa o os ou para pela pelas pelo
+pelos por qual quando que quem se sem ser seu sua suas seus so sobre tambem te tem um uma umas uns
+""".split())
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text):
+    """Tokeniza texto em português para o índice léxico: fold de acentos, sem stopwords."""
+    return [token for token in _TOKEN.findall(fold_text(text)) if token not in STOPWORDS]
+
+class BM25Index:
+    """Índice invertido BM25 dos chunks, construído na ingestão e persistido ao lado do ChromaDB.
+
+    A busca percorre apenas as listas de postings dos termos da pergunta, então
+    termos exatos como "catmat" ou números de artigos são encontrados sem
+    varrer os chunks.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # termo -> {id do chunk: frequência}
+        self.doc_len = {}  # id do chunk -> nº de tokens
+        self._doc_terms = {}  # id do chunk -> termos (para remover sem varrer as postings)
+        self._total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, doc_id, text):
+        """Indexa (ou reindexa) um chunk."""
+        if doc_id in self.doc_len:
+            self.remove_many([doc_id])
+        tokens = tokenize(text)
+        frequencies = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        for token, count in frequencies.items():
+            self.postings.setdefault(token, {})[doc_id] = count
+        self.doc_len[doc_id] = len(tokens)
+        self._total_len += len(tokens)
+        if self._doc_terms is not None:
+            self._doc_terms[doc_id] = list(frequencies)
+
+    def _terms_by_doc(self):
+        """Mapa id do chunk -> termos, montado uma vez a partir das postings de um índice carregado."""
+        if self._doc_terms is None:
+            doc_terms = {doc_id: [] for doc_id in self.doc_len}
+            for token, docs in self.postings.items():
+                for doc_id in docs:
+                    doc_terms[doc_id].append(token)
+            self._doc_terms = doc_terms
+        return self._doc_terms
+
+    def remove_many(self, doc_ids):
+        """Remove vários chunks, visitando só as postings dos termos de cada um."""
+        doc_terms = self._terms_by_doc()
+        for doc_id in set(doc_ids):
+            if doc_id not in self.doc_len:
+                continue
+            self._total_len -= self.doc_len.pop(doc_id)
+            for token in doc_terms.pop(doc_id, ()):
+                docs = self.postings[token]
+                del docs[doc_id]
+                if not docs:
+                    del self.postings[token]
+
+    def clear(self):
+        self.postings.clear()
+        self.doc_len.clear()
+        self._doc_terms = {}
+        self._total_len = 0
+
+    def search(self, query, k=10):
+        """Retorna até k pares (id do chunk, score BM25), em ordem decrescente de score."""
+        if not self.doc_len:
+            return []
+        total = len(self.doc_len)
+        avg_len = self._total_len / total or 1.0
+        scores = {}
+        for token in set(tokenize(query)):
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, freq in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path):
+        """Grava o índice de forma atômica."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_len": self.doc_len, "postings": self.postings}, f)
+        os.replace(tmp_path, path)
+
+    def save_snapshot(self, path):
+        """Grava uma cópia somente leitura do índice em formato binário, para abrir com mmap.
+
+        Os termos ficam ordenados e as postings em arrays contíguos, de modo que
+        vários workers compartilham as mesmas páginas do arquivo (ver FrozenBM25Index).
+        """
+        doc_ids = sorted(self.doc_len)
+        position = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        terms = sorted(self.postings)
+        posting_offsets = [0]
+        posting_docs = []
+        posting_freqs = []
+        for term in terms:
+            docs = sorted((position[doc_id], freq) for doc_id, freq in self.postings[term].items())
+            posting_docs.extend(doc for doc, _ in docs)
+            posting_freqs.extend(freq for _, freq in docs)
+            posting_offsets.append(len(posting_docs))
+        term_blob, term_offsets = _pack_strings(terms)
+        id_blob, id_offsets = _pack_strings(doc_ids)
+        arrays = {
+            "term_offsets": np.asarray(term_offsets, dtype=np.int64),
+            "posting_offsets": np.asarray(posting_offsets, dtype=np.int64),
+            "posting_docs": np.asarray(posting_docs, dtype=np.int32),
+            "posting_freqs": np.asarray(posting_freqs, dtype=np.int32),
+            "doc_len": np.asarray([self.doc_len[doc_id] for doc_id in doc_ids], dtype=np.int32),
+            "id_offsets": np.asarray(id_offsets, dtype=np.int64),
+            "terms": np.frombuffer(term_blob, dtype=np.uint8),
+            "ids": np.frombuffer(id_blob, dtype=np.uint8),
+        }
+        _write_arrays(path, {"k1": self.k1, "b": self.b, "total_len": self._total_len}, arrays)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(data["k1"], data["b"])
+        index.postings = data["postings"]
+        index.doc_len = data["doc_len"]
+        index._doc_terms = None  # montado só se algum chunk for removido
+        index._total_len = sum(index.doc_len.values())
+        return index
+
+_SNAPSHOT_MAGIC = b"COTBM25\x01"
+
+def _pack_strings(values):
+    """Concatena strings em um único bloco UTF-8 e retorna (bloco, deslocamentos)."""
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return b"".join(encoded), offsets
+
+def _write_arrays(path, header, arrays):
+    """Grava de forma atômica um cabeçalho JSON seguido de arrays alinhados em 8 bytes."""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+    header_bytes = json.dumps({**header, "arrays": layout}).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_SNAPSHOT_MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for array in arrays.values():
+            data = array.tobytes()
+            f.write(data)
+            f.write(b"\0" * (-len(data) % 8))
+    os.replace(tmp_path, path)
+
+class FrozenBM25Index:
+    """Índice BM25 somente leitura, mapeado em memória a partir de um snapshot (save_snapshot).
+
+    Os arrays são vistas sobre o arquivo mapeado (mmap), sem cópia: processos
+    que abrem o mesmo snapshot compartilham as páginas do cache do sistema
+    operacional, e abrir o índice não depende do tamanho do corpus.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:8] != _SNAPSHOT_MAGIC:
+            raise ValueError(f"Snapshot BM25 inválido: {path}")
+        header_len = int.from_bytes(self._mmap[8:16], "little")
+        header = json.loads(self._mmap[16:16 + header_len])
+        base = 16 + header_len
+        self.k1 = header["k1"]
+        self.b = header["b"]
+        self._total_len = header["total_len"]
+        arrays = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=base + offset)
+            for name, (dtype, offset, count) in header["arrays"].items()
+        }
+        self._term_offsets = arrays["term_offsets"]
+        self._posting_offsets = arrays["posting_offsets"]
+        self._posting_docs = arrays["posting_docs"]
+        self._posting_freqs = arrays["posting_freqs"]
+        self._doc_len = arrays["doc_len"]
+        self._id_offsets = arrays["id_offsets"]
+        self._terms = arrays["terms"]
+        self._ids = arrays["ids"]
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def _string(self, blob, offsets, i):
+        return blob[offsets[i]:offsets[i + 1]].tobytes()
+
+    def _find_term(self, term):
+        key = term.encode("utf-8")
+        count = len(self._term_offsets) - 1
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._string(self._terms, self._term_offsets, mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < count and self._string(self._terms, self._term_offsets, lo) == key:
+            return lo
+        return None
+
+    def search(self, query, k=10):
+        """Retorna até k pares (id do chunk, score BM25), em ordem decrescente de score."""
+        total = len(self._doc_len)
+        if not total:
+            return []
+        avg_len = self._total_len / total or 1.0
+        doc_parts = []
+        score_parts = []
+        for token in set(tokenize(query)):
+            term = self._find_term(token)
+            if term is None:
+                continue
+            start, end = self._posting_offsets[term], self._posting_offsets[term + 1]
+            docs = self._posting_docs[start:end]
+            freqs = self._posting_freqs[start:end].astype(np.float64)
+            idf = math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[docs] / avg_len)
+            doc_parts.append(docs)
+            score_parts.append(idf * freqs * (self.k1 + 1) / (freqs + norm))
+        if not doc_parts:
+            return []
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [
+            (self._string(self._ids, self._id_offsets, docs[i]).decode("utf-8"), float(scores[i]))
+            for i in top
+        ]
+
+def snapshot_path_for(path):
+    """Caminho do snapshot binário correspondente ao índice BM25 em JSON."""
+    return os.path.splitext(path)[0] + ".bin"
+
+_loaded = {}
+
+def get_bm25_index(path):
+    """Retorna o índice BM25 em disco, recarregando-o apenas quando o arquivo muda.
+
+    Se houver snapshot binário, ele é sempre o usado, aberto com mmap
+    (FrozenBM25Index): a ingestão o regrava ao fim de cada sincronização, e até
+    lá as perguntas continuam com o snapshot anterior. O JSON só é carregado
+    quando ainda não existe snapshot. Pode levar segundos na primeira carga,
+    então não deve ser chamado no event loop.
+    """
+    for chosen, loader in ((snapshot_path_for(path), FrozenBM25Index), (path, BM25Index.load)):
+        try:
+            mtime_ns = os.stat(chosen).st_mtime_ns
+            break
+        except FileNotFoundError:
+            continue
+    else:
+        return None
+    cached = _loaded.get(path)
+    if cached and cached[:2] == (chosen, mtime_ns):
+        return cached[2]
+    index = loader(chosen)
+    _loaded[path] = (chosen, mtime_ns, index)
+    return index
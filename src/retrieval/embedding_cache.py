@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.observability.metrics import increment
+from src.processing.normalization import normalize_whitespace
+
+# Limite de variáveis por consulta ao SQLite
+_SQLITE_BATCH = 500
+
+def embedding_model_id(embeddings):
+    """Identifica o modelo (endpoint) por trás de um objeto de embeddings, atravessando os wrappers."""
+    while True:
+        for attribute in ("endpoint", "model", "model_name"):
+            value = getattr(embeddings, attribute, None)
+            if isinstance(value, str) and value:
+                return value
+        base = getattr(embeddings, "base", None)
+        if base is None:
+            return type(embeddings).__name__
+        embeddings = base
+
+class SQLiteVectorStore:
+    """Camada em disco do cache de embeddings: vetores float32 em uma tabela SQLite (WAL)."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[start:start + _SQLITE_BATCH]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(batch))})", batch
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                ((key, vector.tobytes()) for key, vector in items),
+            )
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class CachedEmbeddings(Embeddings):
+    """Cache compartilhado de embeddings de perguntas e documentos.
+
+    A chave é o modelo (endpoint), o tipo (pergunta ou documento) e o texto com
+    espaços normalizados. Os vetores ficam em memória com despejo LRU e,
+    opcionalmente, em um banco SQLite compartilhado entre workers e reinícios.
+    Pedidos simultâneos do mesmo texto ausente do cache geram uma única chamada
+    ao modelo: os demais aguardam o resultado da primeira.
+    """
+
+    def __init__(self, base, max_entries=10000, path=None, model_id=None):
+        self.base = base
+        self.model_id = model_id or embedding_model_id(base)
+        self.max_entries = max_entries
+        self._store = SQLiteVectorStore(path) if path else None
+        self._memory = OrderedDict()
+        self._pending = {}  # chave -> Future da chamada em andamento
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _key(self, kind, text):
+        payload = f"{self.model_id}\0{kind}\0{normalize_whitespace(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, items):
+        """Guarda vetores em memória e libera quem aguardava por eles (chamado com o lock)."""
+        for key, vector in items:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            future = self._pending.pop(key, None)
+            if future is not None:
+                future.set_result(vector)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _embed(self, kind, texts, compute):
+        """Retorna os vetores dos textos, chamando compute só para os ausentes do cache."""
+        keys = [self._key(kind, text) for text in texts]
+        vectors = {}
+        owned = {}  # chaves que esta chamada vai calcular -> texto
+        waiting = {}  # chaves já em cálculo por outra chamada -> Future
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in vectors or key in owned or key in waiting:
+                    continue
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[key] = vector
+                    self.hits += 1
+                elif key in self._pending:
+                    waiting[key] = self._pending[key]
+                    self.coalesced += 1
+                else:
+                    self._pending[key] = Future()
+                    owned[key] = text
+
+        try:
+            if owned and self._store is not None:
+                stored = self._store.get_many(list(owned))
+                if stored:
+                    with self._lock:
+                        self._remember(stored.items())
+                        self.disk_hits += len(stored)
+                    vectors.update(stored)
+                    owned = {key: text for key, text in owned.items() if key not in stored}
+            if owned:
+                computed = [np.asarray(vector, dtype=np.float32) for vector in compute(list(owned.values()))]
+                items = list(zip(owned, computed))
+                if self._store is not None:
+                    self._store.put_many(items)
+                with self._lock:
+                    self._remember(items)
+                    self.misses += len(items)
+                vectors.update(items)
+        except BaseException as e:
+            with self._lock:
+                for key in owned:
+                    future = self._pending.pop(key, None)
+                    if future is not None:
+                        future.set_exception(e)
+            raise
+
+        for key, future in waiting.items():
+            vectors[key] = future.result()
+        increment("embedding_cache_hits_total", sum(1 for key in keys if key not in owned))
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed("document", texts, self.base.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed("query", [text], lambda texts: [self.base.embed_query(texts[0])])[0]
+
+    def _cached(self, kind, text):
+        """Consulta apenas a camada em memória (sem bloquear o event loop)."""
+        key = self._key(kind, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is None:
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+        increment("embedding_cache_hits_total")
+        return vector.tolist()
+
+    async def aembed_query(self, text):
+        vector = self._cached("query", text)
+        if vector is not None:
+            return vector
+        return await asyncio.to_thread(self.embed_query, text)
+
+    async def aembed_documents(self, texts):
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    def stats(self):
+        """Retorna os contadores de acerto do cache."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.coalesced + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_rate": (lookups - self.misses) / lookups if lookups else 0.0,
+            }
+
+def get_cached_embeddings(embeddings, config):
+    """Envolve o modelo de embeddings com o cache compartilhado, se estiver ativado."""
+    from src.retrieval.embeddings import embedding_model_name
+
+    if not config["embedding_cache_enabled"]:
+        return embeddings
+    return CachedEmbeddings(
+        embeddings,
+        max_entries=config["embedding_cache_max_entries"],
+        path=config["embedding_cache_path"] or None,
+        model_id=embedding_model_name(config),
+    )
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.observability.metrics import increment
+from src.retrieval.embedding_cache import SQLiteVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Marcadores de erros transitórios quando a exceção não expõe o status HTTP
+_TRANSIENT_MARKERS = ("429", "500", "502", "503", "504", "RATE_LIMIT", "TEMPORARILY_UNAVAILABLE", "timed out")
+
+def _status_code(exc):
+    """Extrai o status HTTP de uma exceção, se houver."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+def is_transient_error(exc):
+    """Indica se o erro justifica uma nova tentativa (429, 5xx, falhas de rede)."""
+    status = _status_code(exc)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(exc, (OSError, TimeoutError)):
+        return True
+    message = str(exc)
+    return any(marker in message for marker in _TRANSIENT_MARKERS)
+
+def _retry_after(exc):
+    """Lê o cabeçalho Retry-After da resposta, quando presente."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Limitador de taxa do tipo token bucket, seguro para threads e corrotinas."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Reserva um token e retorna quantos segundos esperar até poder usá-lo."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+class EmbeddingCheckpoint:
+    """Registro em disco (SQLite) dos vetores já calculados durante a construção do índice.
+
+    Se a indexação for interrompida, os lotes já embedados são reaproveitados na
+    próxima execução em vez de serem enviados novamente ao endpoint. A chave
+    inclui o modelo de embeddings (model_id), então vetores de outro modelo
+    nunca são reaproveitados, e os vetores são consultados por chave, sem
+    carregar o arquivo em memória.
+    """
+
+    def __init__(self, path, model_id=""):
+        self.path = path
+        self.model_id = model_id
+        self._store = None
+        self._lock = threading.Lock()
+
+    def _get_store(self, create):
+        with self._lock:
+            if self._store is None and (create or os.path.exists(self.path)):
+                self._store = SQLiteVectorStore(self.path)
+            return self._store
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """Vetores já calculados, na ordem dos textos (None para os ausentes)."""
+        store = self._get_store(create=False)
+        if store is None:
+            return [None] * len(texts)
+        keys = [self.key(text) for text in texts]
+        found = store.get_many(keys)
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def add(self, texts, vectors):
+        self._get_store(create=True).put_many(
+            (self.key(text), np.asarray(vector, dtype=np.float32)) for text, vector in zip(texts, vectors)
+        )
+
+    def clear(self):
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+            for path in (self.path, f"{self.path}-wal", f"{self.path}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+class BatchedEmbeddings(Embeddings):
+    """Envolve um modelo de embeddings com lotes, concorrência limitada, rate limit e retentativas.
+
+    embed_documents divide os textos em lotes de "batch_size", envia até
+    "max_concurrency" lotes simultâneos respeitando "requests_per_second" e repete
+    erros transitórios (429, 5xx, rede) com backoff exponencial e jitter.
+    """
+
+    def __init__(self, base, batch_size=64, max_concurrency=4, requests_per_second=None,
+                 max_retries=5, backoff_base=1.0, backoff_max=30.0, checkpoint=None):
+        self.base = base
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self.checkpoint = checkpoint
+
+    def _backoff(self, attempt, exc):
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = min(self.backoff_max, self.backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+        return delay
+
+    def _call_with_retry(self, func, *args):
+        """Executa uma chamada síncrona ao endpoint com rate limit e retentativas."""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire_sync()
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient_error(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning("Erro transitório no endpoint de embeddings (%s); nova tentativa em %.1fs", e, delay)
+                increment("embedding_retries_total")
+                time.sleep(delay)
+
+    async def _aembed_batch(self, batch, semaphore):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire()
+                try:
+                    vectors = await asyncio.to_thread(self.base.embed_documents, batch)
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_transient_error(e):
+                        raise
+                    delay = self._backoff(attempt, e)
+                    logger.warning("Erro transitório no endpoint de embeddings (%s); nova tentativa em %.1fs", e, delay)
+                    increment("embedding_retries_total")
+                    await asyncio.sleep(delay)
+        if self.checkpoint:
+            self.checkpoint.add(batch, vectors)
+        return vectors
+
+    async def aembed_documents(self, texts):
+        results = self.checkpoint.get_many(texts) if self.checkpoint else [None] * len(texts)
+        missing = [i for i, vector in enumerate(results) if vector is None]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [missing[start:start + self.batch_size] for start in range(0, len(missing), self.batch_size)]
+        batch_vectors = await asyncio.gather(*[
+            self._aembed_batch([texts[i] for i in batch], semaphore) for batch in batches
+        ])
+        for batch, vectors in zip(batches, batch_vectors):
+            for i, vector in zip(batch, vectors):
+                results[i] = vector
+        return results
+
+    def embed_documents(self, texts):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.aembed_documents(texts))
+        # Já existe um event loop nesta thread: executa em uma thread própria
+        result = {}
+
+        def run():
+            try:
+                result["value"] = asyncio.run(self.aembed_documents(texts))
+            except BaseException as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    def embed_query(self, text):
+        return self._call_with_retry(self.base.embed_query, text)
+
+    async def aembed_query(self, text):
+        return await asyncio.to_thread(self.embed_query, text)
+
+def get_index_embeddings(embeddings, config):
+    """Envolve o modelo retornado por get_embeddings com o cliente em lotes usado na indexação."""
+    from src.retrieval.embeddings import embedding_model_name
+
+    return BatchedEmbeddings(
+        embeddings,
+        batch_size=config["embedding_batch_size"],
+        max_concurrency=config["embedding_max_concurrency"],
+        requests_per_second=config["embedding_requests_per_second"],
+        max_retries=config["embedding_max_retries"],
+        checkpoint=EmbeddingCheckpoint(config["embedding_checkpoint_path"], embedding_model_name(config)),
+    )
@@ -1,34 +1,149 @@
-from langchain_community.embeddings import DatabricksEmbeddings
+import numpy as np
+from src.processing.normalization import get_keyword_matcher
+from src.retrieval.hybrid import reciprocal_rank_fusion
+
+def _databricks_embeddings(config, model):
+    from langchain_community.embeddings import DatabricksEmbeddings
 
-def get_embeddings(host, token):
-    """Configura e retorna o modelo de embeddings."""
     return DatabricksEmbeddings(
-        host=host,
-        api_token=token,
-        endpoint="databricks-bge-large-en"
+        host=config["databricks_host"],
+        api_token=config["databricks_token"],
+        endpoint=model
+    )
+
+def _local_embeddings(config, model):
+    from src.retrieval.local_embeddings import LocalEmbeddings
+
+    return LocalEmbeddings(
+        model,
+        runtime=config["local_embedding_runtime"],
+        batch_size=config["local_embedding_batch_size"],
+        query_prefix=config["local_embedding_query_prefix"],
+        document_prefix=config["local_embedding_document_prefix"],
+        threads=config["local_embedding_threads"],
     )
 
-def filter_relevant_documents(question, documents, embeddings, keywords, threshold=0.65):
-    """Filtra documentos relevantes com base na similaridade e palavras-chave."""
-    import numpy as np
-    from sklearn.metrics.pairwise import cosine_similarity
-
-    question_embedding = np.array(embeddings.embed_query(question)).reshape(1, -1)
-    doc_embeddings = np.array([
-        np.array(embeddings.embed_query(doc.page_content))
-        for doc in documents
-    ])
-    similarities = cosine_similarity(question_embedding, doc_embeddings)[0]
-
-    question_lower = question.lower()
-    filtered_docs = []
-    for doc, sim in zip(documents, similarities):
-        doc_lower = doc.page_content.lower()
-        keyword_score = sum(1 for kw in keywords if kw in doc_lower)
-        final_score = sim + (keyword_score * 0.1)
-        if final_score >= threshold:
-            filtered_docs.append((doc, final_score))
-
-    filtered_docs = sorted(filtered_docs, key=lambda x: x[1], reverse=True)
-    relevant_docs = [doc for doc, _ in filtered_docs[:5]]
-    return relevant_docs if relevant_docs else documents[:5]
\ No newline at end of file
+def _ollama_embeddings(config, model):
+    from langchain_community.embeddings import OllamaEmbeddings
+
+    return OllamaEmbeddings(model=model, base_url=config["ollama_base_url"])
+
+def _fake_embeddings(config, model):
+    from src.evaluation.fakes import FakeEmbeddings
+
+    return FakeEmbeddings()
+
+# Backend -> (fábrica, modelo padrão)
+EMBEDDING_BACKENDS = {
+    "databricks": (_databricks_embeddings, "databricks-bge-large-en"),
+    "local": (_local_embeddings, "intfloat/multilingual-e5-small"),
+    "ollama": (_ollama_embeddings, "nomic-embed-text"),
+    "fake": (_fake_embeddings, "fake"),
+}
+
+def _embedding_backend(config):
+    backend = config["embedding_backend"]
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Backend de embeddings desconhecido: {backend} (opções: {', '.join(EMBEDDING_BACKENDS)})")
+    factory, default_model = EMBEDDING_BACKENDS[backend]
+    return backend, factory, config["embedding_model"] or default_model
+
+def embedding_model_name(config):
+    """Backend e modelo de embeddings configurados (ex.: "databricks:databricks-bge-large-en")."""
+    backend, _, model = _embedding_backend(config)
+    return f"{backend}:{model}"
+
+def get_embeddings(config):
+    """Configura e retorna o modelo de embeddings do backend escolhido em embedding_backend."""
+    _, factory, model = _embedding_backend(config)
+    return factory(config, model)
+
+def get_document_embeddings(documents, embeddings):
+    """Retorna a matriz de vetores dos documentos, calculados em um único lote.
+
+    Com o cache compartilhado (src.retrieval.embedding_cache), só os textos
+    ausentes do cache são enviados ao modelo.
+    """
+    vectors = embeddings.embed_documents([doc.page_content for doc in documents])
+    return np.asarray(vectors, dtype=np.float32).reshape(len(documents), -1)
+
+def _cosine_similarities(query_vector, matrix):
+    """Calcula a similaridade de cosseno entre a pergunta e todas as linhas da matriz de uma só vez."""
+    query_norm = np.linalg.norm(query_vector)
+    row_norms = np.linalg.norm(matrix, axis=1)
+    denominator = np.maximum(row_norms * query_norm, 1e-12)
+    return (matrix @ query_vector) / denominator
+
+def _keyword_hits(doc, matcher):
+    """Palavras-chave do chunk: calculadas na ingestão (metadados) ou, para chunks antigos, no texto."""
+    hits = doc.metadata.get("keyword_hits")
+    return hits if hits is not None else matcher.count(doc.page_content)
+
+def filter_relevant_documents(question, documents, embeddings, keywords, threshold=0.65,
+                              question_embedding=None, doc_embeddings=None, top_k=5,
+                              reranker=None, fast=False, lexical_ranks=None):
+    """Filtra documentos relevantes com base na similaridade e palavras-chave.
+
+    keywords pode ser uma lista ou um KeywordMatcher (src.processing.normalization);
+    o número de palavras-chave de cada chunk vem dos metadados gravados na ingestão.
+
+    Quando os vetores dos documentos já são conhecidos (por exemplo, retornados pelo
+    ChromaDB), eles são reutilizados; caso contrário, são calculados pelo modelo.
+    Se um reranker for informado, ele escolhe os top_k entre os candidatos acima
+    do threshold (ver src.retrieval.reranker).
+
+    Com lexical_ranks (id do chunk -> posição no ranking BM25), os chunks com
+    termos exatos da pergunta também passam pelo filtro, e a ordem final combina
+    os rankings vetorial e léxico por Reciprocal Rank Fusion.
+    """
+    if not documents:
+        return []
+    if reranker is not None:
+        top_k = reranker.top_k
+
+    if question_embedding is None:
+        question_embedding = embeddings.embed_query(question)
+    if doc_embeddings is None or len(doc_embeddings) != len(documents):
+        doc_embeddings = get_document_embeddings(documents, embeddings)
+
+    query_vector = np.asarray(question_embedding, dtype=np.float32)
+    matrix = np.asarray(doc_embeddings, dtype=np.float32)
+    similarities = _cosine_similarities(query_vector, matrix)
+
+    matcher = get_keyword_matcher(keywords)
+    keyword_scores = np.fromiter(
+        (_keyword_hits(doc, matcher) for doc in documents),
+        dtype=np.float32,
+        count=len(documents),
+    )
+    final_scores = similarities + keyword_scores * 0.1
+
+    order = np.argsort(-final_scores, kind="stable")
+    candidate_scores = final_scores
+    if lexical_ranks:
+        lexical_order = sorted(
+            (i for i, doc in enumerate(documents) if doc.id in lexical_ranks),
+            key=lambda i: lexical_ranks[documents[i].id],
+        )
+        fused = reciprocal_rank_fusion([[int(i) for i in order], lexical_order])
+        candidate_scores = np.array([fused.get(i, 0.0) for i in range(len(documents))], dtype=np.float32)
+        candidates = [
+            i for i in np.argsort(-candidate_scores, kind="stable")
+            if final_scores[i] >= threshold or documents[i].id in lexical_ranks
+        ]
+    else:
+        candidates = [i for i in order if final_scores[i] >= threshold]
+    if not candidates:
+        return documents[:top_k]
+
+    if reranker is not None:
+        selected = reranker.rerank(
+            question,
+            query_vector,
+            [documents[i] for i in candidates],
+            matrix[candidates],
+            candidate_scores[candidates],
+            fast=fast,
+        )
+        candidates = [candidates[i] for i in selected]
+    return [documents[i] for i in candidates[:top_k]]
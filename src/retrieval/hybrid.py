@@ -0,0 +1,43 @@
+import numpy as np
+from langchain_core.documents import Document
+
+from src.retrieval.vector_store import similarity_search_with_vectors
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Combina rankings (listas de ids, do melhor para o pior) por Reciprocal Rank Fusion."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return scores
+
+def _get_by_ids(db, ids):
+    """Busca chunks e seus vetores armazenados no ChromaDB pelos ids."""
+    if not ids:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    results = db._collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+    documents = [
+        Document(id=doc_id, page_content=text or "", metadata=metadata or {})
+        for doc_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+    ]
+    embeddings = results["embeddings"] if results.get("embeddings") is not None else []
+    return documents, np.asarray(embeddings, dtype=np.float32).reshape(len(documents), -1)
+
+def hybrid_search_with_vectors(db, bm25_index, question, query_embedding, k=30, lexical_k=30):
+    """Primeiro estágio híbrido: união dos candidatos vetoriais e BM25.
+
+    Retorna (documentos, vetores, ranks_lexicos), onde ranks_lexicos mapeia o
+    id de cada chunk encontrado pelo BM25 para sua posição no ranking léxico.
+    Os chunks encontrados só pelo BM25 são lidos do ChromaDB junto com seus vetores.
+    """
+    documents, vectors = similarity_search_with_vectors(db, query_embedding, k)
+    lexical_hits = bm25_index.search(question, lexical_k) if bm25_index is not None else []
+    lexical_ranks = {doc_id: rank for rank, (doc_id, _) in enumerate(lexical_hits)}
+
+    known = {doc.id for doc in documents}
+    missing = [doc_id for doc_id, _ in lexical_hits if doc_id not in known]
+    extra_documents, extra_vectors = _get_by_ids(db, missing)
+    if extra_documents:
+        documents = documents + extra_documents
+        vectors = np.vstack([vectors, extra_vectors]) if len(vectors) else extra_vectors
+    return documents, vectors, lexical_ranks
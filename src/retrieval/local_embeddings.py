@@ -0,0 +1,131 @@
+import os
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Arquivos necessários para rodar um modelo exportado para ONNX
+_ONNX_FILES = ("tokenizer.json", "model.onnx", "onnx/model.onnx")
+
+def _resolve_model_dir(model):
+    """Diretório local do modelo; baixa do Hugging Face Hub só o tokenizer e o ONNX, se necessário."""
+    if os.path.isdir(model):
+        return model
+    try:
+        from huggingface_hub import snapshot_download
+    except ImportError as e:
+        raise ImportError(f"Modelo '{model}' não encontrado localmente e huggingface_hub não está instalado.") from e
+    return snapshot_download(model, allow_patterns=list(_ONNX_FILES))
+
+class OnnxEncoder:
+    """Executa um modelo de embeddings exportado para ONNX com onnxruntime e tokenizers.
+
+    Os textos são ordenados por tamanho antes de formar os lotes, para reduzir
+    o padding; a saída é a média dos tokens (ou o vetor da frase, se o modelo
+    já o exportar), normalizada.
+    """
+
+    def __init__(self, model, max_length=512, threads=0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_dir = _resolve_model_dir(model)
+        onnx_path = next(
+            (os.path.join(model_dir, name) for name in ("model.onnx", "onnx/model.onnx")
+             if os.path.exists(os.path.join(model_dir, name))),
+            None,
+        )
+        if onnx_path is None:
+            raise FileNotFoundError(f"Nenhum model.onnx em {model_dir}")
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        if self.tokenizer.padding is None:
+            pad_token = next((token for token in ("<pad>", "[PAD]") if self.tokenizer.token_to_id(token) is not None), None)
+            pad_id = self.tokenizer.token_to_id(pad_token) if pad_token else 0
+            self.tokenizer.enable_padding(pad_id=pad_id, pad_token=pad_token or "[PAD]")
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+    def _run(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        output = self.session.run(None, {name: value for name, value in feed.items() if name in self.input_names})[0]
+        if output.ndim == 3:
+            weights = mask[:, :, None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return output
+
+    def encode(self, texts, batch_size):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            for i, vector in zip(batch, self._run([texts[i] for i in batch])):
+                vectors[i] = vector
+        matrix = np.vstack(vectors).astype(np.float32)
+        return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+class SentenceTransformerEncoder:
+    """Executa um modelo do sentence-transformers na CPU."""
+
+    def __init__(self, model, max_length=512, threads=0):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Instale sentence-transformers para usar local_embedding_runtime = 'sentence_transformers'.") from e
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model, device="cpu")
+        self.model.max_seq_length = max_length
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size):
+        with self._lock:
+            return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True)
+
+_RUNTIMES = {"onnx": OnnxEncoder, "sentence_transformers": SentenceTransformerEncoder}
+
+class LocalEmbeddings(Embeddings):
+    """Embeddings calculados localmente na CPU, em lotes, sem chamadas de rede.
+
+    O modelo é carregado no primeiro uso (em cada worker, depois do fork). Os
+    prefixos de pergunta e documento são os esperados por modelos da família
+    E5 ("query: " / "passage: ").
+    """
+
+    def __init__(self, model, runtime="onnx", batch_size=32, query_prefix="", document_prefix="",
+                 max_length=512, threads=0):
+        if runtime not in _RUNTIMES:
+            raise ValueError(f"Runtime de embeddings locais desconhecido: {runtime} (opções: {', '.join(_RUNTIMES)})")
+        self.model = model
+        self.runtime = runtime
+        self.batch_size = max(1, batch_size)
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+        self.max_length = max_length
+        self.threads = threads
+        self._encoder = None
+        self._load_lock = threading.Lock()
+
+    def _get_encoder(self):
+        if self._encoder is None:
+            with self._load_lock:
+                if self._encoder is None:
+                    self._encoder = _RUNTIMES[self.runtime](self.model, self.max_length, self.threads)
+        return self._encoder
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        vectors = self._get_encoder().encode([self.document_prefix + text for text in texts], self.batch_size)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self._get_encoder().encode([self.query_prefix + text], 1)[0].tolist()
@@ -0,0 +1,91 @@
+import time
+import numpy as np
+
+RERANK_METHODS = ("none", "mmr", "cross_encoder")
+
+class Reranker:
+    """Segundo estágio da recuperação: reordena os candidatos do ChromaDB e escolhe os top_k.
+
+    Métodos:
+    - "none": mantém a ordem pela pontuação de similaridade + palavras-chave;
+    - "mmr": Maximal Marginal Relevance sobre os vetores já recuperados, que evita
+      chunks quase repetidos (ex.: sobreposição do chunk_overlap);
+    - "cross_encoder": modelo local (sentence-transformers) que pontua os pares
+      pergunta/chunk, limitado a budget_ms; os candidatos não pontuados dentro do
+      orçamento mantêm a ordem original.
+    """
+
+    def __init__(self, method="mmr", top_k=5, mmr_lambda=0.7, cross_encoder_model=None, budget_ms=200):
+        if method not in RERANK_METHODS:
+            raise ValueError(f"Método de reranking desconhecido: {method}")
+        self.method = method
+        self.top_k = top_k
+        self.mmr_lambda = mmr_lambda
+        self.budget_ms = budget_ms
+        self._cross_encoder = None
+        if method == "cross_encoder":
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError(
+                    "O reranking por cross-encoder requer o pacote sentence-transformers "
+                    "(pip install sentence-transformers)."
+                ) from e
+            self._cross_encoder = CrossEncoder(cross_encoder_model, device="cpu")
+
+    def rerank(self, question, query_vector, documents, vectors, scores, fast=False):
+        """Retorna os índices (em documents) dos top_k candidatos, na ordem final.
+
+        Os candidatos devem vir ordenados por score. Com fast=True (ex.: o
+        primeiro estágio estourou seu orçamento) o cross-encoder é ignorado.
+        """
+        if self.method == "none" or len(documents) <= 1:
+            return list(range(min(self.top_k, len(documents))))
+        if self.method == "mmr":
+            return self._mmr(vectors, scores)
+        if fast:
+            return list(range(min(self.top_k, len(documents))))
+        return self._cross_encode(question, documents)
+
+    def _mmr(self, vectors, scores):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        pairwise = matrix @ matrix.T
+        # Normaliza a relevância para [0, 1], comparável à similaridade entre chunks
+        relevance = np.asarray(scores, dtype=np.float32)
+        spread = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+
+        selected = [0]
+        remaining = list(range(1, len(relevance)))
+        while remaining and len(selected) < self.top_k:
+            redundancy = pairwise[np.ix_(remaining, selected)].max(axis=1)
+            mmr = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = remaining[int(np.argmax(mmr))]
+            selected.append(best)
+            remaining.remove(best)
+        return selected
+
+    def _cross_encode(self, question, documents, batch_size=8):
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        scored = []
+        for start in range(0, len(documents), batch_size):
+            if scored and time.perf_counter() > deadline:
+                break
+            batch = documents[start:start + batch_size]
+            batch_scores = self._cross_encoder.predict([(question, doc.page_content) for doc in batch])
+            scored.extend(zip(range(start, start + len(batch)), batch_scores))
+
+        ranked = [i for i, _ in sorted(scored, key=lambda item: item[1], reverse=True)]
+        ranked.extend(range(len(scored), len(documents)))
+        return ranked[:self.top_k]
+
+def get_reranker(config):
+    """Cria o reranker do segundo estágio a partir da configuração."""
+    return Reranker(
+        method=config["rerank_method"],
+        top_k=config["retrieval_final_k"],
+        mmr_lambda=config["rerank_mmr_lambda"],
+        cross_encoder_model=config["rerank_cross_encoder_model"],
+        budget_ms=config["rerank_budget_ms"],
+    )
@@ -1,17 +1,51 @@
+import logging
 import os
-from langchain_community.vectorstores import Chroma
-
-def initialize_vector_store(texts, embeddings, db_path="./chroma_db"):
-    """Inicializa ou carrega o banco de dados vetorial."""
-    print("Inicializando/Carregando ChromaDB...")
-
-    if os.path.exists(db_path) and os.listdir(db_path):
-        print("Carregando base de conhecimento do ChromaDB...")
-        db = Chroma(persist_directory=db_path, embedding_function=embeddings)
-    else:
-        print("Criando base de conhecimento no ChromaDB...")
-        db = Chroma.from_documents(texts, embeddings, persist_directory=db_path)
-        print(f"{db._collection.count()} documentos indexados no ChromaDB.")
-
-    print("Base de conhecimento pronta.")
-    return db
\ No newline at end of file
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+def initialize_vector_store(embeddings, db_path="./chroma_db"):
+    """Abre (ou cria vazio) o banco de dados vetorial.
+
+    A indexação dos documentos é feita por src.ingestion, que mantém o índice
+    sincronizado com a pasta de documentos.
+    """
+    from langchain_community.vectorstores import Chroma
+
+    logger.info("Carregando base de conhecimento do ChromaDB...")
+    os.makedirs(db_path, exist_ok=True)
+    db = Chroma(persist_directory=db_path, embedding_function=embeddings)
+    logger.info("Base de conhecimento pronta: %d chunks no ChromaDB.", db._collection.count())
+    return db
+
+def similarity_search_with_vectors(db, query_embedding, k=4):
+    """Busca os k chunks mais próximos e retorna também os vetores já armazenados no ChromaDB.
+
+    Evita recalcular os embeddings dos chunks recuperados: a mesma consulta ao
+    ChromaDB devolve documentos, metadados e vetores.
+    """
+    results = db._collection.query(
+        query_embeddings=[list(query_embedding)],
+        n_results=max(1, k),
+        include=["documents", "metadatas", "embeddings"],
+    )
+    ids = results["ids"][0]
+    documents = [
+        Document(id=doc_id, page_content=text or "", metadata=metadata or {})
+        for doc_id, text, metadata in zip(ids, results["documents"][0], results["metadatas"][0])
+    ]
+    embeddings = results["embeddings"][0] if results.get("embeddings") is not None else []
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(documents), -1)
+    return documents, vectors
+
+def warm_up_vector_store(db):
+    """Carrega o índice HNSW do ChromaDB em memória com uma consulta usando um vetor já armazenado.
+
+    Não chama o endpoint de embeddings; retorna False se a coleção estiver vazia.
+    """
+    sample = db._collection.get(limit=1, include=["embeddings"])
+    if sample.get("embeddings") is None or not len(sample["embeddings"]):
+        return False
+    similarity_search_with_vectors(db, sample["embeddings"][0], k=1)
+    return True
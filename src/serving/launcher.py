@@ -0,0 +1,156 @@
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+import warnings
+
+from src.config.settings import load_config
+from src.observability.setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Módulos pesados importados uma vez no processo principal e herdados pelos workers
+PRELOAD_MODULES = (
+    "numpy",
+    "chromadb",
+    "langchain.prompts",
+    "langchain_community.vectorstores",
+    "langchain_community.chat_models",
+    "langchain_community.embeddings",
+    "chainlit",
+    "chainlit.cli",
+)
+# Intervalo mínimo entre reinícios de um worker que caiu
+RESPAWN_BACKOFF_SECONDS = 2.0
+
+def preload(config):
+    """Importa os módulos pesados e abre o snapshot BM25 antes do fork.
+
+    As páginas já carregadas (código Python, bibliotecas nativas e o snapshot
+    mapeado com mmap) ficam compartilhadas entre os workers por copy-on-write.
+    O ChromaDB não é aberto aqui: o cliente mantém threads e conexões SQLite
+    que não podem atravessar um fork, então cada worker abre o seu.
+    """
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Módulo %s indisponível para pré-carregamento", name)
+    from src.ingestion.versions import index_config
+    from src.retrieval.bm25 import get_bm25_index
+    get_bm25_index(index_config(config)["bm25_index_path"])
+
+def _run_worker(app_path, host, port):
+    """Executa um worker do Chainlit no processo filho (não retorna)."""
+    gc.enable()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # A ingestão já foi feita pelo processo principal; os workers só leem o índice
+    os.environ["COTIN_INGEST_ON_STARTUP"] = "0"
+    code = 0
+    try:
+        from chainlit.cli import cli
+        cli.main(["run", app_path, "--headless", "--host", host, "--port", str(port)],
+                 prog_name="chainlit", standalone_mode=False)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        logger.exception("Worker na porta %d encerrado com erro", port)
+        code = 1
+    os._exit(code)
+
+def _spawn(app_path, host, port):
+    pid = os.fork()
+    if pid == 0:
+        _run_worker(app_path, host, port)
+    logger.info("Worker %d iniciado na porta %d", pid, port)
+    return pid
+
+def serve(config, workers, host, base_port, app_path="app.py", ingest=None):
+    """Sobe um worker do Chainlit por porta (base_port, base_port + 1, ...) e os mantém no ar.
+
+    A ingestão roda uma vez antes dos workers, em um processo separado, para
+    que todos abram o mesmo índice já pronto. Workers que caem são reiniciados;
+    SIGTERM/SIGINT encerram todos.
+    """
+    if ingest is None:
+        ingest = config["ingest_on_startup"]
+    if ingest:
+        result = subprocess.run([sys.executable, "-m", "src.ingestion"])
+        if result.returncode:
+            from src.ingestion.versions import active_version, has_vector_store
+            if not has_vector_store(config, active_version(config)):
+                raise SystemExit(f"Ingestão falhou (código {result.returncode}) e não há índice para servir.")
+            # Ex.: nova versão reprovada na verificação; a versão em uso continua íntegra
+            logger.error("Ingestão falhou (código %d); servindo a versão atual do índice.", result.returncode)
+    if workers > 1 and config["memory_backend"] != "sqlite":
+        logger.warning("Com vários workers, use COTIN_MEMORY_BACKEND=sqlite e sessões fixas no balanceador.")
+
+    gc.disable()
+    preload(config)
+    # Objetos pré-carregados saem do coletor de lixo, que senão tocaria nas páginas compartilhadas
+    gc.freeze()
+
+    children = {_spawn(app_path, host, base_port + i): base_port + i for i in range(workers)}
+    stopping = False
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    last_start = {port: time.monotonic() for port in children.values()}
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        port = children.pop(pid, None)
+        if port is None or stopping:
+            continue
+        logger.warning("Worker %d (porta %d) terminou com status %d; reiniciando", pid, port,
+                       os.waitstatus_to_exitcode(status))
+        delay = RESPAWN_BACKOFF_SECONDS - (time.monotonic() - last_start[port])
+        if delay > 0:
+            time.sleep(delay)
+        if stopping:
+            break
+        last_start[port] = time.monotonic()
+        children[_spawn(app_path, host, port)] = port
+
+def main(argv=None):
+    """Ponto de entrada do modo de vários workers."""
+    config = load_config()
+    parser = argparse.ArgumentParser(
+        prog="python -m src.serving",
+        description="Sobe vários workers do Chainlit compartilhando os índices somente leitura.",
+    )
+    parser.add_argument("--workers", type=int, default=config["serve_workers"],
+                        help="número de workers (padrão: um por núcleo)")
+    parser.add_argument("--host", default=config["serve_host"])
+    parser.add_argument("--base-port", type=int, default=config["serve_base_port"],
+                        help="porta do primeiro worker; os demais usam as seguintes")
+    parser.add_argument("--app", default="app.py", help="aplicação Chainlit")
+    parser.add_argument("--skip-ingest", action="store_true",
+                        help="não sincroniza o índice antes de subir os workers")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    configure_logging(config["log_level"])
+    serve(config, max(1, args.workers), args.host, args.base_port, args.app,
+          ingest=False if args.skip_ingest else None)
+
+if __name__ == "__main__":
+    main()
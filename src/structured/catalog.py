@@ -0,0 +1,272 @@
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from src.loaders.tabular import sniff_csv_dialect
+from src.processing.normalization import fold_text
+
+logger = logging.getLogger(__name__)
+
+# Linhas usadas para inferir o tipo de cada coluna de um CSV
+TYPE_SAMPLE_ROWS = 1000
+# Linhas inseridas por transação ao importar um CSV
+INSERT_BATCH_SIZE = 5000
+# Linhas de exemplo de cada tabela mostradas ao LLM junto com o esquema
+EXAMPLE_ROWS = 3
+
+_IDENTIFIER = re.compile(r"[^a-z0-9_]+")
+_TERM = re.compile(r"[a-z]+")
+# Palavras menores que isso (ex.: "id", "ano") são genéricas demais para indicar uma tabela
+MIN_TERM_LENGTH = 4
+
+def sql_identifier(name):
+    """Converte um nome livre (arquivo, coluna) em identificador SQL simples."""
+    identifier = _IDENTIFIER.sub("_", fold_text(name)).strip("_") or "coluna"
+    return f"t_{identifier}" if identifier[0].isdigit() else identifier
+
+def text_terms(text):
+    """Palavras do texto, sem acentos e sem o "s" final, para comparar perguntas com nomes de tabelas e colunas."""
+    return {
+        word[:-1] if len(word) > MIN_TERM_LENGTH and word.endswith("s") else word
+        for word in _TERM.findall(fold_text(text)) if len(word) >= MIN_TERM_LENGTH
+    }
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def _parse_number(value):
+    """Lê números no formato brasileiro ("1.234,56") ou internacional ("1234.56")."""
+    text = value.strip()
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    return float(text)
+
+def _infer_type(values):
+    kind = "INTEGER"
+    for value in values:
+        if not value.strip():
+            continue
+        try:
+            number = _parse_number(value)
+        except ValueError:
+            return "TEXT"
+        if kind == "INTEGER" and (not number.is_integer() or "," in value or "." in value):
+            kind = "REAL"
+    return kind
+
+def _convert(value, kind):
+    if not value.strip():
+        return None
+    if kind == "TEXT":
+        return value
+    try:
+        number = _parse_number(value)
+    except ValueError:
+        return value
+    return int(number) if kind == "INTEGER" else number
+
+class SchemaCatalog:
+    """Catálogo das tabelas consultáveis por SQL nas fontes da pasta de documentos.
+
+    Bancos SQLite são anexados em modo somente leitura (alias "db_<arquivo>").
+    CSVs são importados pela ingestão (build_cache), com tipos inferidos, para
+    um banco de cache (alias "csv"), e reimportados só quando o arquivo muda;
+    os servidores apenas leem esse banco. O esquema em texto (tabelas, colunas,
+    tipos e linhas de exemplo) é recalculado apenas quando algum banco muda, e
+    é o que o LLM recebe para escrever a consulta.
+    """
+
+    def __init__(self, docs_dir, cache_path, max_attached=8):
+        self.docs_dir = docs_dir
+        self.cache_path = cache_path
+        self.max_attached = max_attached
+        self._lock = threading.Lock()
+        self._signature = None
+        self._databases = {}  # alias -> caminho
+        self._tables = []  # (nome qualificado, [(coluna, tipo)])
+        self._schema_text = ""
+        self._terms = frozenset()  # palavras dos nomes de tabelas e colunas
+
+    def _source_files(self):
+        files = {".db": [], ".csv": []}
+        cache_path = os.path.abspath(self.cache_path)
+        for root, _, filenames in os.walk(self.docs_dir):
+            for filename in filenames:
+                extension = os.path.splitext(filename)[1].lower()
+                path = os.path.join(root, filename)
+                if extension in files and os.path.abspath(path) != cache_path:
+                    files[extension].append(path)
+        return sorted(files[".db"]), sorted(files[".csv"])
+
+    def build_cache(self):
+        """Importa para o banco de cache os CSVs novos ou modificados e remove os que saíram da pasta.
+
+        Roda na ingestão, fora do caminho das perguntas. Cada CSV é importado em
+        uma tabela temporária que substitui a anterior com um rename, na mesma
+        transação: quem consulta o cache vê a tabela antiga ou a nova, nunca vazia.
+        """
+        _, csv_paths = self._source_files()
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        # Transações explícitas (BEGIN/COMMIT), para que o DDL também fique dentro delas
+        conn = sqlite3.connect(self.cache_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _catalog_files "
+                "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, table_name TEXT)"
+            )
+            known = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime_ns, table_name FROM _catalog_files")}
+            used_names = {row[2] for row in known.values()}
+            imported = 0
+            for path in csv_paths:
+                stat = os.stat(path)
+                previous = known.pop(path, None)
+                if previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                table = previous[2] if previous else sql_identifier(os.path.splitext(os.path.basename(path))[0])
+                while not previous and table in used_names:
+                    table += "_"
+                used_names.add(table)
+                staging = quote_identifier(f"_import_{table}")
+                try:
+                    conn.execute("BEGIN")
+                    conn.execute(f"DROP TABLE IF EXISTS {staging}")
+                    created = self._import_csv(conn, path, staging)
+                    conn.execute("COMMIT")
+                except (OSError, csv.Error, sqlite3.Error):
+                    conn.execute("ROLLBACK")
+                    logger.exception("Erro ao importar %s para consultas estruturadas", path)
+                    continue
+                if not created:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+                conn.execute(f"ALTER TABLE {staging} RENAME TO {quote_identifier(table)}")
+                conn.execute("INSERT OR REPLACE INTO _catalog_files VALUES (?, ?, ?, ?)",
+                             (path, stat.st_size, stat.st_mtime_ns, table))
+                conn.execute("COMMIT")
+                imported += 1
+            conn.execute("BEGIN IMMEDIATE")
+            for path, (_, _, table) in known.items():
+                conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(table)}")
+                conn.execute("DELETE FROM _catalog_files WHERE path = ?", (path,))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        if imported or known:
+            logger.info("Cache de consultas estruturadas: %d CSV(s) importado(s), %d removido(s)", imported, len(known))
+
+    def _import_csv(self, conn, path, quoted):
+        """Importa um CSV para a tabela informada (já entre aspas), lendo as linhas em fluxo e inserindo em lotes.
+
+        Retorna False se o arquivo estiver vazio (nenhuma tabela é criada).
+        """
+        dialect = sniff_csv_dialect(path)
+        with open(path, "r", encoding="utf-8", errors="replace", newline="") as f:
+            reader = csv.reader(f, dialect)
+            header = next(reader, None)
+            if header is None:
+                return False
+            columns = []
+            for name in header:
+                column = sql_identifier(name)
+                while column in columns:
+                    column += "_"
+                columns.append(column)
+            sample = []
+            for row in reader:
+                sample.append(row)
+                if len(sample) >= TYPE_SAMPLE_ROWS:
+                    break
+            kinds = [_infer_type(row[i] for row in sample if i < len(row)) for i in range(len(columns))]
+
+            def converted(rows):
+                for row in rows:
+                    if not any(value.strip() for value in row):
+                        continue
+                    row = (row + [""] * len(columns))[:len(columns)]
+                    yield tuple(_convert(value, kind) for value, kind in zip(row, kinds))
+
+            conn.execute(f"CREATE TABLE {quoted} ({', '.join(f'{quote_identifier(c)} {k}' for c, k in zip(columns, kinds))})")
+            insert = f"INSERT INTO {quoted} VALUES ({', '.join('?' * len(columns))})"
+            conn.executemany(insert, converted(sample))
+            batch = []
+            for row in converted(reader):
+                batch.append(row)
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    conn.executemany(insert, batch)
+                    batch = []
+            conn.executemany(insert, batch)
+        return True
+
+    def _describe(self, conn):
+        tables = []
+        lines = []
+        terms = set()
+        for alias in self._databases:
+            names = [row[0] for row in conn.execute(
+                f"SELECT name FROM {alias}.sqlite_master WHERE type IN ('table', 'view') "
+                "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '\\_%' ESCAPE '\\' ORDER BY name"
+            )]
+            for name in names:
+                qualified = f"{alias}.{quote_identifier(name)}"
+                columns = [(row[1], row[2] or "") for row in conn.execute(f"PRAGMA {alias}.table_info({quote_identifier(name)})")]
+                tables.append((qualified, columns))
+                terms.update(text_terms(name))
+                for column, _ in columns:
+                    terms.update(text_terms(column))
+                lines.append(f"Tabela {qualified} ({', '.join(f'{column} {kind}'.strip() for column, kind in columns)})")
+                examples = conn.execute(f"SELECT * FROM {qualified} LIMIT {EXAMPLE_ROWS}").fetchall()
+                for example in examples:
+                    lines.append("  exemplo: " + " | ".join(" ".join(str(value).split())[:60] if value is not None else "" for value in example))
+        return tables, "\n".join(lines), frozenset(terms)
+
+    def refresh(self):
+        """Atualiza o catálogo se o banco de cache dos CSVs ou algum banco SQLite da pasta mudou.
+
+        Só lê: não importa CSVs (ver build_cache), então pode rodar em vários workers.
+        """
+        db_paths, _ = self._source_files()
+        has_cache = os.path.exists(self.cache_path)
+        paths = db_paths + [self.cache_path] if has_cache else db_paths
+        signature = tuple((path, os.stat(path).st_mtime_ns) for path in paths)
+        with self._lock:
+            if signature == self._signature:
+                return
+            databases = {"csv": self.cache_path} if has_cache else {}
+            for path in db_paths[:self.max_attached]:
+                alias = "db_" + sql_identifier(os.path.splitext(os.path.basename(path))[0])
+                while alias in databases:
+                    alias += "_"
+                databases[alias] = path
+            if len(db_paths) > self.max_attached:
+                logger.warning("Apenas %d bancos SQLite ficam disponíveis para consultas estruturadas", self.max_attached)
+            self._databases = databases
+            conn = self.connect()
+            try:
+                self._tables, self._schema_text, self._terms = self._describe(conn)
+            finally:
+                conn.close()
+            self._signature = signature
+            logger.info("Catálogo de consultas estruturadas: %d tabela(s)", len(self._tables))
+
+    def connect(self):
+        """Abre uma conexão em memória com todas as fontes anexadas em modo somente leitura."""
+        conn = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+        for alias, path in self._databases.items():
+            conn.execute("ATTACH DATABASE ? AS " + alias, (f"file:{os.path.abspath(path)}?mode=ro",))
+        return conn
+
+    @property
+    def tables(self):
+        return self._tables
+
+    @property
+    def schema_text(self):
+        return self._schema_text
+
+    @property
+    def terms(self):
+        return self._terms
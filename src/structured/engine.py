@@ -0,0 +1,99 @@
+import logging
+import re
+from langchain_core.documents import Document
+
+from src.llm.prompts import get_sql_prompt_template
+from src.observability.metrics import increment
+from src.processing.normalization import fold_text
+from src.structured.catalog import SchemaCatalog, text_terms
+from src.structured.executor import QueryError, format_result, run_readonly_query
+
+logger = logging.getLogger(__name__)
+
+# Indícios de perguntas de contagem, soma, ranking ou filtro sobre dados tabulares (texto sem acentos)
+STRUCTURED_CUES = re.compile(
+    r"\b(quant[oa]s|qual o total|total|soma|somatorio|media|valor medio|maior(es)?|menor(es)?|maximo|minimo|"
+    r"ranking|top \d+|contar|conte|liste|listar|por ano|por mes|por orgao|percentual|porcentagem)\b"
+)
+
+_SQL_FENCE = re.compile(r"```(?:sql)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+def _extract_sql(text):
+    """Extrai o SQL da resposta do LLM (com ou sem bloco de código)."""
+    match = _SQL_FENCE.search(text)
+    return (match.group(1) if match else text).strip()
+
+class StructuredQueryEngine:
+    """Responde perguntas tabulares com uma consulta SQL somente leitura sobre as fontes SQLite e CSV.
+
+    Perguntas com indícios de agregação (contagens, totais, rankings) que citam
+    uma tabela ou coluna do catálogo são roteadas para cá: o LLM escreve o SQL a partir do catálogo de esquemas, a
+    consulta roda com tempo limite e limite de linhas, e o resultado exato entra
+    no prompt junto com os documentos recuperados.
+    """
+
+    def __init__(self, catalog, timeout_ms=2000, max_rows=50):
+        self.catalog = catalog
+        self.timeout_ms = timeout_ms
+        self.max_rows = max_rows
+        self.sql_prompt = get_sql_prompt_template()
+
+    def should_route(self, question):
+        """Indica se a pergunta pede um cálculo sobre uma das tabelas do catálogo.
+
+        Além de um indício de agregação, a pergunta precisa citar o nome de uma
+        tabela ou coluna (fora as próprias palavras do indício): sem isso,
+        perguntas comuns com "total" ou "maior" pagariam a chamada extra ao LLM
+        que escreve o SQL. Pode ler o catálogo em disco, então não deve rodar no
+        event loop.
+        """
+        text = fold_text(question)
+        if not STRUCTURED_CUES.search(text):
+            return False
+        self.catalog.refresh()
+        return bool(text_terms(STRUCTURED_CUES.sub(" ", text)) & self.catalog.terms)
+
+    def answer(self, question, llm):
+        """Gera e executa a consulta; retorna um Document com o resultado, ou None.
+
+        Qualquer falha (sem tabelas, LLM sem SQL, consulta recusada ou com erro)
+        resulta em None, e a pergunta segue apenas com a recuperação de documentos.
+        """
+        self.catalog.refresh()
+        if not self.catalog.tables:
+            return None
+        response = llm.invoke(self.sql_prompt.format(schema=self.catalog.schema_text, question=question))
+        sql = _extract_sql(getattr(response, "content", str(response)))
+        if not sql or sql.upper().startswith("NENHUMA"):
+            return None
+        conn = self.catalog.connect()
+        try:
+            columns, rows, truncated = run_readonly_query(conn, sql, self.timeout_ms, self.max_rows)
+        except QueryError as e:
+            increment("structured_query_errors_total")
+            logger.info("Consulta estruturada descartada (%s): %s", e, sql)
+            return None
+        finally:
+            conn.close()
+        increment("structured_queries_total")
+        logger.debug("Consulta estruturada: %s (%d linha(s))", sql, len(rows))
+        return Document(
+            page_content=format_result(columns, rows, truncated),
+            metadata={"source": "Consulta SQL", "source_type": "sql", "sql": sql},
+        )
+
+def build_structured_cache(config):
+    """Importa os CSVs da pasta de documentos para o banco de consultas estruturadas (feito pela ingestão)."""
+    if config["structured_query_enabled"]:
+        SchemaCatalog(config["docs_dir"], config["structured_cache_path"]).build_cache()
+
+def get_structured_engine(config):
+    """Cria o motor de consultas estruturadas, ou None se estiver desativado."""
+    if not config["structured_query_enabled"]:
+        return None
+    catalog = SchemaCatalog(config["docs_dir"], config["structured_cache_path"])
+    return StructuredQueryEngine(
+        catalog,
+        timeout_ms=config["structured_query_timeout_ms"],
+        max_rows=config["structured_query_max_rows"],
+    )
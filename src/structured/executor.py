@@ -0,0 +1,62 @@
+import re
+import sqlite3
+import time
+
+# Operações permitidas pelo autorizador do SQLite: apenas leitura
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# Instruções SQLite executadas a cada verificação do tempo limite
+_PROGRESS_STEPS = 10000
+
+_LEADING_COMMENTS = re.compile(r"^\s*(--[^\n]*\n\s*|/\*.*?\*/\s*)*", re.DOTALL)
+
+class QueryError(Exception):
+    """Consulta recusada pelas proteções ou que falhou ao executar."""
+
+def validate_sql(sql):
+    """Aceita apenas uma única consulta SELECT/WITH; retorna o SQL sem ";" final."""
+    sql = sql.strip().rstrip(";").strip()
+    body = _LEADING_COMMENTS.sub("", sql)
+    if not re.match(r"(select|with)\b", body, re.IGNORECASE):
+        raise QueryError("Apenas consultas SELECT são permitidas.")
+    if ";" in body:
+        raise QueryError("Apenas uma consulta por vez é permitida.")
+    return sql
+
+def _authorizer(action, *_):
+    return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+def run_readonly_query(conn, sql, timeout_ms=2000, max_rows=50):
+    """Executa uma consulta com proteções: somente leitura, tempo limite e limite de linhas.
+
+    As fontes já estão anexadas em modo somente leitura; o autorizador do SQLite
+    recusa ainda qualquer operação que não seja leitura (PRAGMA, ATTACH, escrita).
+    Retorna (colunas, linhas, truncado).
+    """
+    sql = validate_sql(sql)
+    deadline = time.monotonic() + timeout_ms / 1000
+    conn.set_authorizer(_authorizer)
+    conn.set_progress_handler(lambda: int(time.monotonic() > deadline), _PROGRESS_STEPS)
+    try:
+        cursor = conn.execute(sql)
+        rows = cursor.fetchmany(max_rows + 1)
+    except sqlite3.OperationalError as e:
+        if time.monotonic() > deadline:
+            raise QueryError(f"Consulta excedeu o tempo limite de {timeout_ms} ms.") from e
+        raise QueryError(str(e)) from e
+    except sqlite3.DatabaseError as e:
+        raise QueryError(str(e)) from e
+    finally:
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+    columns = [column[0] for column in cursor.description or ()]
+    return columns, rows[:max_rows], len(rows) > max_rows
+
+def format_result(columns, rows, truncated=False):
+    """Formata o resultado como tabela de texto para o prompt."""
+    lines = [" | ".join(columns)]
+    lines += [" | ".join("" if value is None else str(value) for value in row) for row in rows]
+    if not rows:
+        lines.append("(nenhuma linha)")
+    if truncated:
+        lines.append(f"(resultado limitado às primeiras {len(rows)} linhas)")
+    return "\n".join(lines)
@@ -1,14 +1,28 @@
+import asyncio
+import logging
 import chainlit as cl
+from src.llm.limiter import RequestQueueFullError
+from src.observability.metrics import increment
+from src.processing.dedup import document_sources
 
-async def start_chat(memory):
+logger = logging.getLogger(__name__)
+
+async def start_chat(memory_store):
     """Inicializa o chat e envia mensagem de boas-vindas."""
-    memory.clear()
+    # Limpa apenas o histórico desta sessão
+    await asyncio.to_thread(memory_store.clear, cl.user_session.get("id"))
     await cl.Message(
         content="Olá! Sou o Cotin IA, pronto para ajudar com dados abertos de compras públicas.\nDigite sua pergunta!"
     ).send()
 
-async def handle_message(msg, ask_question_func, retriever, llm_chain, embeddings, keywords, threshold):
-    """Processa a mensagem do usuário e retorna a resposta com fontes e feedback."""
+async def handle_message(msg, ask_question_func, retriever, llm, prompt_template, embeddings, keywords, threshold,
+                         limiter, memory_store):
+    """Processa a mensagem do usuário e retorna a resposta com fontes e feedback.
+
+    ask_question_func deve ser assíncrona (ex.: aask_question), o limiter
+    controla quantas perguntas o worker processa ao mesmo tempo e o
+    memory_store guarda o histórico de cada sessão.
+    """
     user_text = msg.content if hasattr(msg, "content") else str(msg)
     if not isinstance(user_text, str):
         user_text = str(user_text)
@@ -16,42 +30,72 @@ async def handle_message(msg, ask_question_func, retriever, llm_chain, embedding
     # 1) Cria uma mensagem "placeholder" para sinalizar que o bot está pensando.
     placeholder = await cl.Message(content="Processando, por favor aguarde...").send()
 
-    # 2) Gera a resposta pelo LLM e obtém documentos fonte
-    resposta, source_documents = ask_question_func(
-        user_text,
-        retriever,
-        llm_chain,
-        embeddings,
-        keywords,
-        threshold,
-        return_sources=True
-    )
+    # 2) Gera a resposta pelo LLM e obtém documentos fonte, sem bloquear o event loop.
+    #    Os tokens são transmitidos para o placeholder à medida que chegam.
+    streaming_started = False
+
+    async def on_token(token):
+        nonlocal streaming_started
+        if not streaming_started:
+            placeholder.content = ""
+            streaming_started = True
+        await placeholder.stream_token(token)
+
+    session_id = cl.user_session.get("id")
+    chat_history = await asyncio.to_thread(memory_store.get_messages, session_id)
+
+    try:
+        async with limiter.slot():
+            resposta, source_documents = await ask_question_func(
+                user_text,
+                retriever,
+                llm,
+                prompt_template,
+                embeddings,
+                keywords,
+                threshold,
+                return_sources=True,
+                on_token=on_token,
+                chat_history=chat_history
+            )
+    except RequestQueueFullError:
+        increment("requests_rejected_total")
+        placeholder.content = "O Cotin IA está com muitas perguntas no momento. Por favor, tente novamente em instantes."
+        await placeholder.update()
+        return
+
+    await asyncio.to_thread(memory_store.append, session_id, user_text, resposta)
 
     # 3) Prepara as fontes para exibição
     sources = []
     if source_documents:
         for i, doc in enumerate(source_documents[:3]):  # Limita a 3 fontes para não sobrecarregar a UI
-            source = f"{doc.metadata.get('source', 'Desconhecido')}"
+            source = ", ".join(document_sources(doc))
             content_preview = doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content
             sources.append(cl.Text(content=content_preview, name=f"Fonte {i+1}: {source}"))
 
-    # 4) Adiciona botões de feedback - CORRIGIDO para incluir payload
+    # 4) Adiciona botões de feedback; as fontes vão no payload para os relatórios por documento
+    feedback_payload = {
+        "question": user_text,
+        "answer": resposta,
+        "sources": sorted({source for doc in source_documents or [] for source in document_sources(doc)}),
+    }
     actions = [
         cl.Action(
             name="útil",
             value="útil",
             description="Esta resposta foi útil",
-            payload={"question": user_text, "answer": resposta}  # Usando payload em vez de context
+            payload=feedback_payload
         ),
         cl.Action(
             name="não_útil",
             value="não_útil",
             description="Esta resposta não foi útil",
-            payload={"question": user_text, "answer": resposta}  # Usando payload em vez de context
+            payload=feedback_payload
         )
     ]
 
-    # 5) Atualiza a mensagem de placeholder com o conteúdo final, fontes e ações
+    # 5) Ao fim do streaming, atualiza o placeholder com o conteúdo final, fontes e ações
     placeholder.content = resposta
     placeholder.elements = sources
     placeholder.actions = actions
@@ -65,13 +109,16 @@ async def on_useful_feedback(action):
     # Salva o feedback
     try:
         save_feedback(
-            question=action.payload.get("question"),  # Usando payload em vez de context
-            answer=action.payload.get("answer"),      # Usando payload em vez de context
+            cl.user_session.get("feedback_store"),
+            question=action.payload.get("question"),
+            answer=action.payload.get("answer"),
             feedback="positive",
-            user_id=cl.user_session.get("user_id", "anônimo")
+            user_id=cl.user_session.get("user_id", "anônimo"),
+            session_id=cl.user_session.get("id"),
+            sources=action.payload.get("sources"),
         )
-    except Exception as e:
-        print(f"Erro ao salvar feedback: {e}")
+    except Exception:
+        logger.exception("Erro ao salvar feedback")
 
 @cl.action_callback("não_útil")
 async def on_not_useful_feedback(action):
@@ -80,36 +127,24 @@ async def on_not_useful_feedback(action):
     # Salva o feedback
     try:
         save_feedback(
-            question=action.payload.get("question"),  # Usando payload em vez de context
-            answer=action.payload.get("answer"),      # Usando payload em vez de context
+            cl.user_session.get("feedback_store"),
+            question=action.payload.get("question"),
+            answer=action.payload.get("answer"),
             feedback="negative",
-            user_id=cl.user_session.get("user_id", "anônimo")
+            user_id=cl.user_session.get("user_id", "anônimo"),
+            session_id=cl.user_session.get("id"),
+            sources=action.payload.get("sources"),
         )
-    except Exception as e:
-        print(f"Erro ao salvar feedback: {e}")
-
-# Função simples para salvar feedback
-def save_feedback(question, answer, feedback, user_id=None):
-    """Salva o feedback do usuário para análise posterior."""
-    import json
-    import os
-    from datetime import datetime
-
-    feedback_dir = "feedback"
-    os.makedirs(feedback_dir, exist_ok=True)
-
-    feedback_data = {
-        "question": question,
-        "answer": answer,
-        "feedback": feedback,
-        "user_id": user_id,
-        "timestamp": datetime.now().isoformat()
-    }
+    except Exception:
+        logger.exception("Erro ao salvar feedback")
 
-    # Gera um nome de arquivo único
-    filename = f"{feedback_dir}/feedback_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(feedback_data, f, ensure_ascii=False, indent=2)
-
-    return filename
\ No newline at end of file
+def save_feedback(feedback_store, question, answer, feedback, user_id=None, session_id=None, sources=None):
+    """Registra o feedback do usuário para análise posterior (gravado em lote, sem bloquear)."""
+    feedback_store.record(
+        question=question,
+        answer=answer,
+        feedback=feedback,
+        user_id=user_id,
+        session_id=session_id,
+        sources=sources,
+    )
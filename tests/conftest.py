@@ -0,0 +1,20 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.config.settings import load_config
+
+@pytest.fixture
+def ingest_config(tmp_path):
+    """Configuração com todos os caminhos de índice e documentos dentro de tmp_path."""
+    config = load_config()
+    for key, value in config.items():
+        if isinstance(value, str) and value.startswith("./"):
+            config[key] = str(tmp_path / value[2:])
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    config.update(docs_dir=str(docs_dir), embedding_backend="fake", embedding_model="")
+    return config
+
+@pytest.fixture
+def fake_embeddings():
+    return DeterministicFakeEmbedding(size=16)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.llm import answer_cache as answer_cache_module
+from src.llm.answer_cache import AnswerCache, normalize_question, question_numbers
+
+VECTOR = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+CLOSE = np.array([0.99, 0.05, 0.0], dtype=np.float32)
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def _cache(version, **options):
+    return AnswerCache(lambda: version[0], **options)
+
+def test_normalization_and_numbers():
+    assert normalize_question("  Quanto gastou o Órgão 3 ?") == normalize_question("quanto gastou o orgao 3")
+    assert question_numbers("R$ 1.500,00 em 2024") == {"150000", "2024"}
+
+def test_exact_and_semantic_hits():
+    cache = _cache(["v1"])
+    cache.put("Quanto gastou o órgão 3?", VECTOR, "resposta", ["fonte"])
+    assert cache.get_exact("quanto gastou o orgao 3") == ("resposta", ["fonte"])
+    assert cache.get_similar("Quanto o órgão 3 gastou?", CLOSE) == ("resposta", ["fonte"])
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["semantic_hits"] == 1
+
+def test_semantic_hit_requires_same_numbers():
+    cache = _cache(["v1"])
+    cache.put("Qual o total de contratos em 2023?", VECTOR, "total de 2023", [])
+    assert cache.get_similar("Qual o total de contratos em 2024?", VECTOR) is None
+    assert cache.get_similar("Qual o total de contratos no ano de 2023?", CLOSE) == ("total de 2023", [])
+
+def test_version_change_invalidates_entries():
+    version = ["v1"]
+    cache = _cache(version)
+    cache.put("pergunta", VECTOR, "resposta", [])
+    version[0] = "v2"
+    assert cache.get_exact("pergunta") is None
+    assert cache.get_similar("pergunta", VECTOR) is None
+    assert cache.stats()["entries"] == 0
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(answer_cache_module, "time", clock)
+    cache = _cache(["v1"], ttl_seconds=60)
+    cache.put("pergunta", VECTOR, "resposta", [])
+    clock.now += 30
+    assert cache.get_exact("pergunta") == ("resposta", [])
+    clock.now += 61
+    assert cache.get_exact("pergunta") is None
+    assert cache.get_similar("pergunta", VECTOR) is None
+    assert cache.stats()["entries"] == 0
+
+def test_lru_eviction_keeps_recently_used():
+    cache = _cache(["v1"], max_entries=2)
+    cache.put("primeira", VECTOR, "1", [])
+    cache.put("segunda", VECTOR, "2", [])
+    cache.get_exact("primeira")
+    cache.put("terceira", VECTOR, "3", [])
+    assert cache.get_exact("segunda") is None
+    assert cache.get_exact("primeira") == ("1", [])
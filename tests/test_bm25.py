@@ -0,0 +1,69 @@
+import pytest
+
+from src.retrieval import bm25
+from src.retrieval.bm25 import BM25Index, FrozenBM25Index, get_bm25_index, snapshot_path_for
+
+DOCS = {
+    "a": "Contrato de aquisição de computadores pelo órgão 3",
+    "b": "Pregão eletrônico para serviços de limpeza",
+    "c": "Item CATMAT 150 comprado em 2024 por dispensa de licitação",
+    "d": "Contrato de limpeza renovado em 2024",
+    "e": "Lei de acesso à informação e transparência ativa",
+}
+QUERIES = ["contrato limpeza", "catmat 150", "2024", "computadores órgão", "transparência"]
+
+def _index(doc_ids):
+    index = BM25Index()
+    for doc_id in doc_ids:
+        index.add(doc_id, DOCS[doc_id])
+    return index
+
+def _assert_same_results(index, other):
+    for query in QUERIES:
+        expected = index.search(query, k=5)
+        got = other.search(query, k=5)
+        assert [doc_id for doc_id, _ in got] == [doc_id for doc_id, _ in expected]
+        assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+
+def test_remove_matches_index_built_without_removed_docs():
+    index = _index(DOCS)
+    index.remove_many(["b", "c"])
+    _assert_same_results(_index(["a", "d", "e"]), index)
+    assert len(index) == 3
+    assert "catmat" not in index.postings
+
+def test_readd_replaces_previous_text():
+    index = _index(DOCS)
+    index.add("c", DOCS["e"])
+    assert index.search("catmat") == []
+    assert {doc_id for doc_id, _ in index.search("transparência")} == {"c", "e"}
+
+def test_loaded_index_removes_like_fresh_index(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    _index(DOCS).save(path)
+    loaded = BM25Index.load(path)
+    loaded.remove_many(["a"])
+    loaded.add("f", "Contrato emergencial de computadores")
+    fresh = _index(["b", "c", "d", "e"])
+    fresh.add("f", "Contrato emergencial de computadores")
+    _assert_same_results(fresh, loaded)
+
+def test_snapshot_matches_index(tmp_path):
+    index = _index(DOCS)
+    path = str(tmp_path / "bm25.bin")
+    index.save_snapshot(path)
+    frozen = FrozenBM25Index(path)
+    assert len(frozen) == len(index)
+    _assert_same_results(index, frozen)
+    assert frozen.search("inexistente") == []
+
+def test_get_bm25_index_prefers_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25, "_loaded", {})
+    path = str(tmp_path / "bm25.json")
+    assert get_bm25_index(path) is None
+    _index(["a"]).save(path)
+    assert isinstance(get_bm25_index(path), BM25Index)
+    _index(DOCS).save_snapshot(snapshot_path_for(path))
+    index = get_bm25_index(path)
+    assert isinstance(index, FrozenBM25Index) and len(index) == len(DOCS)
+    assert get_bm25_index(path) is index
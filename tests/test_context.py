@@ -0,0 +1,46 @@
+from langchain_core.documents import Document
+
+from src.llm.context import ContextPacker
+from src.observability.tokens import count_tokens
+
+def _doc(text, source="a.pdf"):
+    return Document(page_content=text, metadata={"source": source})
+
+def _text(word, count):
+    return " ".join(f"{word}{i}" for i in range(count))
+
+def test_budget_is_limited_by_window_and_reserved_answer():
+    packer = ContextPacker(max_context_tokens=3000, context_window=4000, max_tokens=1000)
+    assert packer.budget(0) == 3000
+    assert packer.budget(500) == 2500
+    assert packer.budget(5000) == 0
+
+def test_packs_in_relevance_order_within_budget():
+    big, small, medium = _text("grande", 300), _text("pequeno", 20), _text("medio", 60)
+    budget = count_tokens(big) + count_tokens(small) + 5
+    packer = ContextPacker(max_context_tokens=budget)
+    docs = [_doc(big, "a"), _doc(medium, "b"), _doc(small, "c")]
+
+    context, used, tokens = packer.pack(docs)
+
+    # O médio não cabe depois do grande, mas o pequeno, menos relevante, ainda cabe
+    assert used == [docs[0], docs[2]]
+    assert context == big + "\n\n" + small
+    assert tokens <= budget and tokens == count_tokens(big) + count_tokens("\n\n") + count_tokens(small)
+
+def test_truncates_first_chunk_when_nothing_fits():
+    packer = ContextPacker(max_context_tokens=10)
+    context, used, tokens = packer.pack([_doc(_text("palavra", 100))])
+    assert len(used) == 1
+    assert 0 < tokens <= 10 and count_tokens(context) == tokens
+
+def test_drops_near_duplicates_and_trims_overlap():
+    first = _text("termo", 40)
+    overlap = first[-60:]
+    continuation = overlap + " " + _text("novo", 10)
+    docs = [_doc(first), _doc(first + " fim"), _doc(continuation)]
+
+    context, used, _ = ContextPacker(chunk_overlap=200).pack(docs)
+
+    assert used == [docs[0], docs[2]]
+    assert context == first + "\n\n" + _text("novo", 10)
@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.ingestion.dedup_index import DedupIndex
+from src.processing.dedup import content_hash, minhash_signatures
+
+NUM_PERM = 64
+PROSE = ("O pregão eletrônico para contratação de serviços contínuos de limpeza e conservação predial "
+         "foi homologado pela comissão de licitação após análise das propostas apresentadas pelas empresas")
+
+def _chunks(texts, chunk_kind=None, source="docs/a"):
+    chunks = []
+    for text in texts:
+        metadata = {"source": source, "content_hash": content_hash(text)}
+        if chunk_kind:
+            metadata["chunk_kind"] = chunk_kind
+        chunks.append(Document(page_content=text, metadata=metadata))
+    return chunks, minhash_signatures(texts, NUM_PERM)
+
+@pytest.fixture
+def index(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.db"))
+    yield index
+    index.close()
+
+def test_identical_chunk_is_shared_and_released_by_refcount(index):
+    chunks, signatures = _chunks(["texto comum", "texto de a"])
+    ids_a, new_a, _ = index.assign("a.pdf", chunks, ["a-0", "a-1"], signatures)
+    chunks, signatures = _chunks(["texto comum", "texto de b"])
+    ids_b, new_b, shared = index.assign("b.pdf", chunks, ["b-0", "b-1"], signatures)
+
+    assert ids_a == ["a-0", "a-1"] and list(new_a) == [0, 1]
+    assert ids_b == ["a-0", "b-1"] and list(new_b) == [1]
+    assert shared == {"a-0"}
+    assert index.exact_matches == 1
+
+    orphans, still_shared = index.release("a.pdf", ids_a)
+    assert orphans == ["a-1"] and still_shared == ["a-0"]
+    orphans, still_shared = index.release("b.pdf", ids_b)
+    assert sorted(orphans) == ["a-0", "b-1"] and still_shared == []
+
+    # Depois de liberado, o mesmo texto volta a ser um chunk novo
+    chunks, signatures = _chunks(["texto comum"])
+    _, new_c, _ = index.assign("c.pdf", chunks, ["c-0"], signatures)
+    assert list(new_c) == [0]
+
+def test_near_duplicate_prose_is_merged(index):
+    chunks, signatures = _chunks([PROSE])
+    index.assign("a.pdf", chunks, ["a-0"], signatures)
+    chunks, signatures = _chunks([PROSE + " ."])
+    ids, new_positions, _ = index.assign("b.pdf", chunks, ["b-0"], signatures)
+    assert ids == ["a-0"] and list(new_positions) == []
+    assert index.near_matches == 1
+
+def test_table_blocks_are_only_merged_when_identical(index):
+    rows = "Tabela: contratos\nColunas: orgao | ano | valor\n" + "\n".join(f"orgao{i} | 2024 | {i}" for i in range(40))
+    chunks, signatures = _chunks([rows], chunk_kind="table_rows")
+    index.assign("a.csv", chunks, ["a-0"], signatures)
+    chunks, signatures = _chunks([rows.replace("| 39", "| 390")], chunk_kind="table_rows")
+    ids, new_positions, _ = index.assign("b.csv", chunks, ["b-0"], signatures)
+    assert ids == ["b-0"] and list(new_positions) == [0]
+    chunks, signatures = _chunks([rows], chunk_kind="table_rows")
+    ids, _, _ = index.assign("c.csv", chunks, ["c-0"], signatures)
+    assert ids == ["a-0"]
+
+def test_references_survive_reopen(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    index = DedupIndex(path)
+    chunks, signatures = _chunks(["texto comum"], source="docs/a.pdf")
+    index.assign("a.pdf", chunks, ["a-0"], signatures)
+    chunks, signatures = _chunks(["texto comum"], source="docs/b.pdf")
+    index.assign("b.pdf", chunks, ["b-0"], signatures)
+    index.commit()
+    index.close()
+
+    index = DedupIndex(path)
+    assert index.sources("a-0") == ["docs/a.pdf", "docs/b.pdf"]
+    assert index.release("a.pdf", ["a-0"]) == ([], ["a-0"])
+    index.close()
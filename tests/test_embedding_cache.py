@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from src.retrieval.embedding_cache import CachedEmbeddings
+
+class SlowEmbeddings:
+    """Modelo falso que conta as chamadas e pode ficar bloqueado até "release" ser liberado."""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def test_memory_hits_and_key_normalization():
+    base = SlowEmbeddings()
+    cache = CachedEmbeddings(base, model_id="m1")
+    assert cache.embed_documents(["a  b", "c"]) == [[4.0, 1.0], [1.0, 1.0]]
+    assert cache.embed_documents(["a b", "c", "d"]) == [[4.0, 1.0], [1.0, 1.0], [1.0, 1.0]]
+    assert base.calls == [["a  b", "c"], ["d"]]
+    # Perguntas e documentos têm chaves diferentes
+    cache.embed_query("c")
+    assert base.calls[-1] == ["c"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 4
+
+def test_lru_limit():
+    base = SlowEmbeddings()
+    cache = CachedEmbeddings(base, max_entries=2, model_id="m1")
+    cache.embed_documents(["a", "b"])
+    cache.embed_documents(["a", "c"])
+    cache.embed_documents(["b"])
+    assert base.calls == [["a", "b"], ["c"], ["b"]]
+
+def test_sqlite_tier_is_shared_per_model(tmp_path):
+    path = str(tmp_path / "cache.db")
+    CachedEmbeddings(SlowEmbeddings(), path=path, model_id="m1").embed_documents(["a", "b"])
+
+    base = SlowEmbeddings()
+    cache = CachedEmbeddings(base, path=path, model_id="m1")
+    assert cache.embed_documents(["a", "b", "c"]) == [[1.0, 1.0], [1.0, 1.0], [1.0, 1.0]]
+    assert base.calls == [["c"]]
+    assert cache.stats()["disk_hits"] == 2
+
+    other = SlowEmbeddings()
+    CachedEmbeddings(other, path=path, model_id="m2").embed_documents(["a"])
+    assert other.calls == [["a"]]
+
+def _embed_in_threads(cache, base, text):
+    base.release.clear()
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(cache.embed_query(text))
+        except Exception as e:
+            errors.append(e)
+
+    first = threading.Thread(target=run)
+    first.start()
+    assert base.started.wait(5)
+    second = threading.Thread(target=run)
+    second.start()
+    # A segunda chamada encontra o texto em cálculo e aguarda o resultado da primeira
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    base.release.set()
+    first.join(5)
+    second.join(5)
+    return results, errors
+
+def test_concurrent_misses_are_coalesced():
+    base = SlowEmbeddings()
+    cache = CachedEmbeddings(base, model_id="m1")
+    results, errors = _embed_in_threads(cache, base, "pergunta")
+    assert errors == [] and results == [[8.0, 1.0], [8.0, 1.0]]
+    assert base.calls == [["pergunta"]]
+
+def test_coalesced_waiters_receive_the_error():
+    base = SlowEmbeddings(error=RuntimeError("endpoint fora do ar"))
+    cache = CachedEmbeddings(base, model_id="m1")
+    results, errors = _embed_in_threads(cache, base, "pergunta")
+    assert results == [] and len(errors) == 2
+    assert len(base.calls) == 1
+
+    # Depois da falha, o texto não fica preso como pendente
+    base.error = None
+    assert cache.embed_query("pergunta") == [8.0, 1.0]
+    with pytest.raises(RuntimeError):
+        CachedEmbeddings(SlowEmbeddings(error=RuntimeError("x")), model_id="m1").embed_query("y")
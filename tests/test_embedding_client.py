@@ -0,0 +1,81 @@
+import pytest
+
+from src.retrieval.embedding_client import BatchedEmbeddings, EmbeddingCheckpoint, is_transient_error
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class FlakyEmbeddings:
+    """Modelo falso: vetor = [tamanho do texto, 1]; falha conforme fail(batch) decidir."""
+
+    def __init__(self, fail=None):
+        self.fail = fail or (lambda batch: None)
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        error = self.fail(texts)
+        if error is not None:
+            raise error
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+TEXTS = [f"texto {'x' * i}" for i in range(10)]
+EXPECTED = [[float(len(text)), 1.0] for text in TEXTS]
+
+def test_transient_errors():
+    assert is_transient_error(HTTPError(429)) and is_transient_error(HTTPError(503))
+    assert not is_transient_error(HTTPError(400))
+    assert is_transient_error(TimeoutError())
+
+def test_batches_keep_order():
+    base = FlakyEmbeddings()
+    client = BatchedEmbeddings(base, batch_size=3, max_concurrency=2)
+    assert client.embed_documents(TEXTS) == EXPECTED
+    assert sorted(len(batch) for batch in base.calls) == [1, 3, 3, 3]
+
+def test_transient_errors_are_retried():
+    failures = {"left": 2}
+
+    def fail(batch):
+        if failures["left"]:
+            failures["left"] -= 1
+            return HTTPError(429)
+
+    base = FlakyEmbeddings(fail)
+    client = BatchedEmbeddings(base, batch_size=20, max_retries=3, backoff_base=0)
+    assert client.embed_documents(TEXTS) == EXPECTED
+    assert len(base.calls) == 3
+
+def test_permanent_errors_and_exhausted_retries_raise():
+    base = FlakyEmbeddings(lambda batch: HTTPError(400))
+    with pytest.raises(HTTPError):
+        BatchedEmbeddings(base, max_retries=3, backoff_base=0).embed_documents(TEXTS)
+    assert len(base.calls) == 1
+
+    base = FlakyEmbeddings(lambda batch: HTTPError(503))
+    with pytest.raises(HTTPError):
+        BatchedEmbeddings(base, max_retries=2, backoff_base=0).embed_documents(TEXTS)
+    assert len(base.calls) == 3
+
+def test_checkpoint_resumes_interrupted_build(tmp_path):
+    path = str(tmp_path / "checkpoint.db")
+    base = FlakyEmbeddings(lambda batch: HTTPError(400) if TEXTS[9] in batch else None)
+    client = BatchedEmbeddings(base, batch_size=3, max_concurrency=1, checkpoint=EmbeddingCheckpoint(path, "m1"))
+    with pytest.raises(HTTPError):
+        client.embed_documents(TEXTS)
+
+    base = FlakyEmbeddings()
+    client = BatchedEmbeddings(base, batch_size=3, checkpoint=EmbeddingCheckpoint(path, "m1"))
+    assert client.embed_documents(TEXTS) == EXPECTED
+    assert base.calls == [[TEXTS[9]]]
+
+    # Vetores de outro modelo não são reaproveitados, e clear apaga o checkpoint
+    other = EmbeddingCheckpoint(path, "m2")
+    assert other.get_many(TEXTS[:2]) == [None, None]
+    other.clear()
+    assert EmbeddingCheckpoint(path, "m1").get_many(TEXTS[:1]) == [None]
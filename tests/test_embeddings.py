@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.retrieval.embeddings import filter_relevant_documents
+from src.retrieval.vector_store import initialize_vector_store, similarity_search_with_vectors
+
+TEXTS = [
+    "Contrato de aquisição de computadores",
+    "Pregão eletrônico de serviços de limpeza",
+    "Dispensa de licitação para material de escritório",
+    "Ata de registro de preços de combustível",
+]
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings determinísticos que contam os textos enviados ao modelo."""
+
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+@pytest.fixture
+def store(tmp_path):
+    embeddings = CountingEmbeddings(size=16)
+    db = initialize_vector_store(embeddings, str(tmp_path / "chroma"))
+    db.add_texts(TEXTS, ids=[f"c{i}" for i in range(len(TEXTS))])
+    embeddings.embedded = 0
+    return db, embeddings
+
+def test_search_returns_stored_vectors(store):
+    db, embeddings = store
+    query = embeddings.embed_query("computadores")
+    documents, vectors = similarity_search_with_vectors(db, query, k=3)
+    assert len(documents) == 3 and vectors.shape == (3, 16)
+    assert all(doc.id for doc in documents)
+    expected = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    np.testing.assert_allclose(vectors, expected, rtol=1e-5, atol=1e-6)
+
+def test_stored_vectors_give_same_ranking_without_reembedding(store):
+    db, embeddings = store
+    question = "limpeza"
+    query = embeddings.embed_query(question)
+    documents, vectors = similarity_search_with_vectors(db, query, k=len(TEXTS))
+    embeddings.embedded = 0
+
+    reused = filter_relevant_documents(question, documents, embeddings, [], threshold=-1.0,
+                                       question_embedding=query, doc_embeddings=vectors, top_k=4)
+    assert embeddings.embedded == 0
+    baseline = filter_relevant_documents(question, documents, embeddings, [], threshold=-1.0,
+                                         question_embedding=query, top_k=4)
+    assert embeddings.embedded == len(documents)
+    assert [doc.id for doc in reused] == [doc.id for doc in baseline]
+
+def _docs(*metadatas):
+    return [Document(id=f"d{i}", page_content=f"texto {i}", metadata=metadata) for i, metadata in enumerate(metadatas)]
+
+QUERY = np.array([1.0, 0.0], dtype=np.float32)
+VECTORS = np.array([[0.9, 0.44], [0.8, 0.6], [0.1, 0.99]], dtype=np.float32)
+
+def test_keyword_hits_from_metadata_boost_score():
+    documents = _docs({}, {"keyword_hits": 2}, {})
+    result = filter_relevant_documents("q", documents, None, ["catmat"], threshold=0.5,
+                                       question_embedding=QUERY, doc_embeddings=VECTORS)
+    assert [doc.id for doc in result] == ["d1", "d0"]
+
+def test_lexical_ranks_admit_exact_matches_and_fuse_order():
+    documents = _docs({}, {}, {})
+    vector_only = filter_relevant_documents("q", documents, None, [], threshold=0.5,
+                                            question_embedding=QUERY, doc_embeddings=VECTORS)
+    assert [doc.id for doc in vector_only] == ["d0", "d1"]
+
+    fused = filter_relevant_documents("q", documents, None, [], threshold=0.5,
+                                      question_embedding=QUERY, doc_embeddings=VECTORS,
+                                      lexical_ranks={"d2": 0, "d1": 1})
+    # d2 fica abaixo do threshold, mas entra pelo BM25; na fusão, 1º léxico + 3º vetorial supera 2º + 2º
+    assert [doc.id for doc in fused] == ["d2", "d1", "d0"]
@@ -0,0 +1,57 @@
+import json
+import os
+
+from src.ingestion import pipeline
+from src.ingestion.indexer import sync_vector_store
+from src.ingestion.pipeline import load_and_split_file
+
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("\n".join([",".join(header)] + [",".join(row) for row in rows]) + "\n")
+    return os.fspath(path)
+
+TABULAR = {"rows_per_chunk": 5, "max_chunk_chars": 1500, "include_rows": True}
+
+def _rows(prefix, count):
+    return [(f"{prefix}{i}", f"descricao do item {prefix} numero {i}") for i in range(count)]
+
+def test_large_file_parts_are_spilled_and_read_back(tmp_path):
+    path = write_csv(tmp_path / "grande.csv", ["item", "descricao"], _rows("a", 200))
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+
+    _, parts, _ = load_and_split_file(path, tabular=TABULAR, num_perm=16, part_size=7, spill_dir=str(spill_dir))
+
+    assert isinstance(parts, str) and os.path.dirname(parts) == str(spill_dir)
+    read = list(pipeline._read_parts(parts))
+    assert [count for count, _, _ in read] == [7] * 5 + [6]
+    assert sum(len(chunks) for _, chunks, _ in read) == 41
+    assert all(signatures.shape == (len(chunks), 16) for _, chunks, signatures in read)
+    assert not os.listdir(spill_dir)
+
+def test_multi_part_ingestion_records_whole_files(ingest_config, fake_embeddings):
+    docs_dir = ingest_config["docs_dir"]
+    write_csv(os.path.join(docs_dir, "grande.csv"), ["item", "descricao"], _rows("a", 300))
+    write_csv(os.path.join(docs_dir, "pequeno.csv"), ["item", "descricao"], _rows("b", 3))
+    ingest_config.update(ingest_workers=2, ingest_batch_size=8, tabular_rows_per_chunk=5)
+
+    db, manifest = sync_vector_store(ingest_config, fake_embeddings)
+
+    big, small = manifest["files"]["grande.csv"], manifest["files"]["pequeno.csv"]
+    assert (big["documents"], len(big["chunk_ids"])) == (61, 61)
+    assert (small["documents"], len(small["chunk_ids"])) == (2, 2)
+    assert not any(entry.get("partial") for entry in manifest["files"].values())
+    assert db._collection.count() == 63
+    with open(ingest_config["manifest_path"], encoding="utf-8") as f:
+        assert json.load(f)["files"] == manifest["files"]
+
+def test_empty_file_next_to_indexed_file(ingest_config, fake_embeddings):
+    docs_dir = ingest_config["docs_dir"]
+    write_csv(os.path.join(docs_dir, "a.csv"), ["item", "descricao"], _rows("a", 3))
+    sync_vector_store(ingest_config, fake_embeddings)
+    open(os.path.join(docs_dir, "vazio.csv"), "w").close()
+
+    db, manifest = sync_vector_store(ingest_config, fake_embeddings)
+
+    assert manifest["files"]["vazio.csv"]["chunk_ids"] == []
+    assert db._collection.count() == 2
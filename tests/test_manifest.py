@@ -0,0 +1,64 @@
+import os
+
+from src.ingestion.manifest import chunk_ids_for, diff_files, file_sha256, manifest_version, new_manifest
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+def _entry(file_path, **values):
+    stat = os.stat(file_path)
+    entry = {"sha256": file_sha256(file_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+             "documents": 1, "chunk_ids": []}
+    entry.update(values)
+    return entry
+
+def test_diff_files_detects_new_changed_and_removed(tmp_path):
+    same = _write(tmp_path / "same.csv", "a,b\n1,2\n")
+    changed = _write(tmp_path / "changed.csv", "a,b\n1,2\n")
+    manifest = new_manifest({})
+    manifest["files"] = {"same.csv": _entry(same), "changed.csv": _entry(changed), "gone.csv": _entry(same)}
+    _write(tmp_path / "changed.csv", "a,b\n30,40\n")
+    new = _write(tmp_path / "new.csv", "a,b\n5,6\n")
+
+    found, removed = diff_files(manifest, str(tmp_path), [same, changed, new])
+
+    assert sorted(key for key, _, _ in found) == ["changed.csv", "new.csv"]
+    assert removed == ["gone.csv"]
+
+def test_diff_files_skips_touched_file_with_same_content(tmp_path):
+    path = _write(tmp_path / "doc.csv", "a,b\n1,2\n")
+    manifest = new_manifest({})
+    manifest["files"] = {"doc.csv": _entry(path)}
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    found, removed = diff_files(manifest, str(tmp_path), [path])
+
+    assert found == [] and removed == []
+    assert manifest["files"]["doc.csv"]["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+def test_diff_files_reindexes_partial_entry(tmp_path):
+    path = _write(tmp_path / "big.csv", "a,b\n1,2\n")
+    manifest = new_manifest({})
+    manifest["files"] = {"big.csv": _entry(path, partial=True)}
+
+    found, _ = diff_files(manifest, str(tmp_path), [path])
+
+    assert [key for key, _, _ in found] == ["big.csv"]
+
+def test_chunk_ids_are_deterministic_and_continue_from_start():
+    ids = chunk_ids_for("doc.csv", "abc", 5)
+    assert ids == chunk_ids_for("doc.csv", "abc", 5)
+    assert chunk_ids_for("doc.csv", "abc", 3) + chunk_ids_for("doc.csv", "abc", 2, start=3) == ids
+    assert set(ids).isdisjoint(chunk_ids_for("doc.csv", "def", 5))
+
+def test_manifest_version_changes_with_content_only():
+    manifest = new_manifest({"chunk_size": 1500})
+    manifest["files"] = {"doc.csv": {"sha256": "abc", "size": 1, "mtime_ns": 1}}
+    version = manifest_version(manifest)
+    manifest["files"]["doc.csv"]["mtime_ns"] = 2
+    assert manifest_version(manifest) == version
+    manifest["files"]["doc.csv"]["sha256"] = "def"
+    assert manifest_version(manifest) != version
@@ -0,0 +1,52 @@
+import pytest
+
+from src.llm import memory_store as memory_store_module
+from src.llm.memory_store import InMemoryHistoryBackend, SessionMemoryStore, SQLiteHistoryBackend
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        backend = InMemoryHistoryBackend()
+    else:
+        backend = SQLiteHistoryBackend(str(tmp_path / "history.db"))
+    return SessionMemoryStore(backend, window=2)
+
+def _turns(messages):
+    return [(messages[i].content, messages[i + 1].content) for i in range(0, len(messages), 2)]
+
+def test_keeps_only_last_window_turns(store):
+    for i in range(5):
+        store.append("s1", f"pergunta {i}", f"resposta {i}")
+    messages = store.get_messages("s1")
+    assert [message.type for message in messages] == ["human", "ai", "human", "ai"]
+    assert _turns(messages) == [("pergunta 3", "resposta 3"), ("pergunta 4", "resposta 4")]
+
+def test_sessions_are_isolated_and_cleared(store):
+    store.append("s1", "p1", "r1")
+    store.append("s2", "p2", "r2")
+    assert _turns(store.get_messages("s2")) == [("p2", "r2")]
+    store.clear("s1")
+    assert store.get_messages("s1") == []
+    assert _turns(store.get_messages("s2")) == [("p2", "r2")]
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def test_in_memory_backend_evicts_lru_and_expired(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(memory_store_module, "time", clock)
+    store = SessionMemoryStore(InMemoryHistoryBackend(max_sessions=2, ttl_seconds=60), window=2)
+    store.append("s1", "p1", "r1")
+    store.append("s2", "p2", "r2")
+    store.get_messages("s1")
+    store.append("s3", "p3", "r3")
+    assert store.get_messages("s2") == []
+    assert _turns(store.get_messages("s1")) == [("p1", "r1")]
+
+    clock.now += 61
+    assert store.get_messages("s1") == []
+    assert store.get_messages("s3") == []
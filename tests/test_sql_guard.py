@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+
+from src.structured.executor import QueryError, run_readonly_query, validate_sql
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE contratos (orgao TEXT, ano INTEGER, valor REAL)")
+    conn.executemany("INSERT INTO contratos VALUES (?, ?, ?)",
+                     [(f"orgao{i % 3}", 2023 + i % 2, float(i)) for i in range(100)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM contratos",
+    "PRAGMA table_info(contratos)",
+    "ATTACH DATABASE 'x.db' AS x",
+    "SELECT 1; DROP TABLE contratos",
+])
+def test_validate_sql_rejects_non_select(sql):
+    with pytest.raises(QueryError):
+        validate_sql(sql)
+
+def test_validate_sql_accepts_comments_and_trailing_semicolon():
+    assert validate_sql("-- total\nSELECT 1;") == "-- total\nSELECT 1"
+
+@pytest.mark.parametrize("sql", [
+    "WITH x AS (SELECT 1) DELETE FROM contratos",
+    "WITH x AS (SELECT 1) INSERT INTO contratos VALUES ('y', 2020, 1)",
+    "WITH x AS (SELECT 1) UPDATE contratos SET valor = 0",
+])
+def test_authorizer_blocks_writes_hidden_behind_with(conn, sql):
+    with pytest.raises(QueryError):
+        run_readonly_query(conn, sql)
+    assert conn.execute("SELECT COUNT(*), SUM(valor) FROM contratos").fetchone() == (100, 4950.0)
+
+def test_select_returns_columns_and_truncates(conn):
+    columns, rows, truncated = run_readonly_query(conn, "SELECT orgao, valor FROM contratos ORDER BY valor", max_rows=10)
+    assert columns == ["orgao", "valor"]
+    assert len(rows) == 10 and truncated
+    _, rows, truncated = run_readonly_query(conn, "SELECT ano, COUNT(*) FROM contratos GROUP BY ano")
+    assert rows == [(2023, 50), (2024, 50)] and not truncated
+
+def test_long_query_hits_timeout(conn):
+    sql = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT MAX(i) FROM n"
+    with pytest.raises(QueryError, match="tempo limite"):
+        run_readonly_query(conn, sql, timeout_ms=50)
+    # As proteções são removidas depois da consulta
+    conn.execute("INSERT INTO contratos VALUES ('z', 2025, 1)")
@@ -0,0 +1,39 @@
+from src.loaders.tabular import load_csv_table, table_documents
+
+HEADER = ["orgao", "descricao"]
+
+def _rows(count, width=10):
+    return [(f"orgao{i}", "x" * width) for i in range(count)]
+
+def _blocks(documents):
+    return [doc for doc in documents if doc.metadata["chunk_kind"] == "table_rows"]
+
+def test_blocks_respect_row_limit_and_keep_header():
+    documents = list(table_documents(_rows(12), HEADER, "contratos", {"source": "c.csv"}, rows_per_chunk=5))
+    blocks = _blocks(documents)
+    assert [(doc.metadata["row_start"], doc.metadata["row_end"]) for doc in blocks] == [(1, 5), (6, 10), (11, 12)]
+    assert all(doc.page_content.startswith("Tabela: contratos\nColunas: orgao | descricao\n") for doc in blocks)
+    summary = documents[-1]
+    assert summary.metadata["chunk_kind"] == "table_summary" and summary.metadata["rows"] == 12
+
+def test_blocks_respect_char_limit():
+    blocks = _blocks(table_documents(_rows(30, width=40), HEADER, "t", {}, rows_per_chunk=50, max_chunk_chars=300))
+    assert len(blocks) > 1
+    assert all(len(doc.page_content) <= 300 for doc in blocks)
+    assert blocks[0].metadata["row_start"] == 1 and blocks[-1].metadata["row_end"] == 30
+
+def test_oversized_row_is_split_into_several_blocks():
+    rows = _rows(2) + [("longo", "y" * 1000)] + _rows(2)
+    blocks = _blocks(table_documents(rows, HEADER, "t", {}, rows_per_chunk=50, max_chunk_chars=300))
+    assert all(len(doc.page_content) <= 300 for doc in blocks)
+    pieces = [doc for doc in blocks if doc.metadata["row_start"] == doc.metadata["row_end"] == 3]
+    assert len(pieces) >= 4
+    assert "".join(doc.page_content.split("\n", 2)[2] for doc in pieces) == "longo | " + "y" * 1000
+    assert [(doc.metadata["row_start"], doc.metadata["row_end"]) for doc in blocks if doc not in pieces] == [(1, 2), (4, 5)]
+
+def test_summary_only_mode_and_empty_csv(tmp_path):
+    documents = list(table_documents(_rows(5), HEADER, "t", {}, include_rows=False))
+    assert [doc.metadata["chunk_kind"] for doc in documents] == ["table_summary"]
+    empty = tmp_path / "vazio.csv"
+    empty.write_text("")
+    assert list(load_csv_table(str(empty))) == []
@@ -0,0 +1,129 @@
+import os
+
+import pytest
+
+from src.ingestion.indexer import sync_vector_store
+from src.ingestion.versions import (
+    LEGACY_VERSION, VERSION_INFO_FILE, VERSIONS_DIR, _read_json, _write_json, active_version, index_config,
+    list_versions, promote, prune_versions, read_current, rollback, sync_active_version, version_dir,
+)
+from src.retrieval.bm25 import snapshot_path_for
+
+@pytest.fixture
+def config(tmp_path):
+    db_path = str(tmp_path / "chroma_db")
+    return {
+        "db_path": db_path,
+        "manifest_path": os.path.join(db_path, "ingest_manifest.json"),
+        "bm25_index_path": os.path.join(db_path, "bm25_index.json"),
+        "embedding_checkpoint_path": os.path.join(db_path, "embedding_checkpoint.db"),
+        "dedup_index_path": os.path.join(db_path, "dedup.db"),
+    }
+
+def _built(config, version):
+    _write_json(os.path.join(version_dir(config, version), VERSION_INFO_FILE), {"status": "built"})
+    return version
+
+def _status(config, version):
+    return _read_json(os.path.join(version_dir(config, version), VERSION_INFO_FILE))["status"]
+
+def test_without_pointer_the_legacy_index_is_active(config):
+    assert active_version(config) == LEGACY_VERSION
+    assert index_config(config) == config
+
+def test_index_config_points_to_version_directory(config):
+    versioned = index_config(config, "v1")
+    directory = version_dir(config, "v1")
+    assert versioned["db_path"] == directory
+    for key in ("manifest_path", "bm25_index_path", "embedding_checkpoint_path", "dedup_index_path"):
+        assert os.path.dirname(versioned[key]) == directory
+
+def test_promote_and_rollback(config):
+    promote(config, _built(config, "v1"))
+    promote(config, _built(config, "v2"))
+    assert active_version(config) == "v2"
+    assert read_current(config)["history"] == [LEGACY_VERSION, "v1"]
+    assert _status(config, "v1") == "previous"
+
+    assert rollback(config) == "v1"
+    assert active_version(config) == "v1"
+    assert _status(config, "v1") == "active" and _status(config, "v2") == "rolled_back"
+
+def test_promote_unknown_version_fails(config):
+    with pytest.raises(ValueError):
+        promote(config, "inexistente")
+    assert read_current(config) is None
+
+def test_rollback_returns_to_legacy_then_fails(config):
+    promote(config, _built(config, "v1"))
+    assert rollback(config) == LEGACY_VERSION
+    assert active_version(config) == LEGACY_VERSION
+    with pytest.raises(ValueError):
+        rollback(config)
+
+def test_prune_keeps_active_and_newest(config):
+    for version in ("v1", "v2", "v3", "v4"):
+        _built(config, version)
+    promote(config, "v1")
+    assert prune_versions(config, keep=2) == ["v2"]
+    assert active_version(config) == "v1"
+    assert [os.path.isdir(version_dir(config, v)) for v in ("v1", "v2", "v3", "v4")] == [True, False, True, True]
+
+def _write_docs(config, *names):
+    for name in names:
+        with open(os.path.join(config["docs_dir"], name), "w", encoding="utf-8") as f:
+            f.write("item,descricao\n" + "\n".join(f"{name}{i},descricao {name} {i}" for i in range(3)) + "\n")
+
+def _chunk_count(config, version, embeddings):
+    from src.retrieval.vector_store import initialize_vector_store
+
+    return initialize_vector_store(embeddings, index_config(config, version)["db_path"])._collection.count()
+
+@pytest.fixture
+def sync_config(ingest_config, tmp_path):
+    ingest_config["index_smoke_queries_path"] = str(tmp_path / "sem_consultas.json")
+    return ingest_config
+
+def test_sync_never_writes_the_active_version(sync_config, fake_embeddings):
+    _write_docs(sync_config, "a.csv")
+    assert sync_active_version(sync_config, fake_embeddings)
+    first = active_version(sync_config)
+    assert first != LEGACY_VERSION
+    bm25_path = snapshot_path_for(index_config(sync_config, first)["bm25_index_path"])
+    bm25_mtime = os.stat(bm25_path).st_mtime_ns
+
+    # Sem mudanças na pasta, nenhuma versão nova é criada
+    assert sync_active_version(sync_config, fake_embeddings)
+    assert active_version(sync_config) == first and len(list_versions(sync_config)) == 1
+
+    _write_docs(sync_config, "b.csv")
+    assert sync_active_version(sync_config, fake_embeddings)
+    second = active_version(sync_config)
+    assert second != first
+    assert _chunk_count(sync_config, first, fake_embeddings) == 2
+    assert _chunk_count(sync_config, second, fake_embeddings) == 4
+    assert os.stat(bm25_path).st_mtime_ns == bm25_mtime
+    assert read_current(sync_config)["history"] == [LEGACY_VERSION, first]
+
+def test_sync_copies_legacy_index_without_other_versions(sync_config, fake_embeddings):
+    _write_docs(sync_config, "a.csv")
+    sync_vector_store(sync_config, fake_embeddings)
+    _write_docs(sync_config, "b.csv")
+
+    assert sync_active_version(sync_config, fake_embeddings)
+    version = active_version(sync_config)
+    assert _chunk_count(sync_config, LEGACY_VERSION, fake_embeddings) == 2
+    assert _chunk_count(sync_config, version, fake_embeddings) == 4
+    assert not os.path.exists(os.path.join(version_dir(sync_config, version), VERSIONS_DIR))
+
+def test_rejected_update_keeps_active_version(sync_config, fake_embeddings):
+    _write_docs(sync_config, "a.csv", "b.csv", "c.csv")
+    assert sync_active_version(sync_config, fake_embeddings)
+    first = active_version(sync_config)
+    for name in ("b.csv", "c.csv"):
+        os.remove(os.path.join(sync_config["docs_dir"], name))
+
+    # Sobrariam 2 de 6 chunks, abaixo de index_smoke_min_chunk_ratio
+    assert not sync_active_version(sync_config, fake_embeddings)
+    assert active_version(sync_config) == first
+    assert _chunk_count(sync_config, first, fake_embeddings) == 6